@@ -0,0 +1,41 @@
+"""
+Offline check that every game in the saved state still holds exactly the cards it started with.
+
+Usage:
+python bot/audit.py [path/to/game_state.json] [--decklist path/to/decklist.txt]
+
+Without a state file, every server's saved games are audited.
+"""
+import argparse
+import sys
+
+from constants import DECKLIST_FILE
+from lib.audit import find_conservation_violations
+from lib.game_state import load_game_state, load_game_state_file
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Audit saved One with Death games for lost or duplicated cards")
+    parser.add_argument("game_state_file", nargs="?")
+    parser.add_argument("--decklist", default=DECKLIST_FILE)
+    args = parser.parse_args()
+
+    games = load_game_state_file(args.game_state_file) if args.game_state_file else load_game_state()
+
+    num_games_with_violations = 0
+    for game in games:
+        violations = find_conservation_violations(game, args.decklist)
+        if violations:
+            num_games_with_violations += 1
+            print(f"{game.id}: {len(violations)} violation{'s' if len(violations) > 1 else ''}")
+            for violation in violations:
+                print(f"    {violation}")
+        else:
+            print(f"{game.id}: ok")
+
+    print(f"Audited {len(games)} games, {num_games_with_violations} with violations")
+    return 1 if num_games_with_violations else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,276 @@
+"""
+Offline benchmark of what sending card images costs, in latency, bytes uploaded, attachments and image file opens,
+for each way of serving card images.
+
+The bot's own !draw and !hand commands are run against a local fake of the Discord HTTP API, so no token or network access
+is needed. Sizes a command wouldn't take (e.g. drawing more cards than !draw allows at once) are skipped for it.
+
+Usage:
+python bot/benchmark.py [--iterations 20] [--sizes 1 3 5 10 20 30] [--modes original preview ...]
+"""
+import argparse
+import asyncio
+import builtins
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager, redirect_stdout
+from dataclasses import dataclass, field
+from io import StringIO
+from statistics import quantiles
+from typing import Iterator
+from unittest.mock import patch
+
+import disnake
+from disnake.http import Route
+
+import engine.actions as engine
+import lib.contact_sheet
+import lib.game_state
+import lib.outbox
+from constants import CARD_IMAGE_CACHE_FOLDER, CARD_IMAGES_FOLDER, MAX_COMMAND_CARDS
+from lib.asset_bundle import build_asset_bundle, get_bundle_location, load_asset_bundle
+from lib.attachments import ATTACHMENT_REGISTRY
+from lib.card_image import use_asset_bundle, use_image_derivatives
+from lib.image_cache import IMAGE_CACHE
+from lib.image_derivatives import build_image_derivatives
+from lib.outbox import wait_for_background_deliveries
+from lib.send_scheduler import SendScheduler
+from models import MemberInfo
+
+# the fake Discord is shared with the tests, from the repo's root
+sys.path.append(os.path.realpath(os.path.join(os.path.dirname(__file__), '..')))
+from tests.fake_discord import ClientContext, FakeDiscord
+
+
+BENCHMARK_QUALITY = 'preview'
+PLAYER_ID = 1
+GAME_CHANNEL_ID = 100
+VOICE_CHANNEL_ID = 101
+# the most files Discord takes on one message
+MAX_MESSAGE_ATTACHMENTS = 10
+
+
+@dataclass
+class ImageMode:
+    name: str
+    description: str
+    derivatives: bool = False
+    bundle: bool = False
+    contact_sheets: bool = False
+    reuse_urls: bool = False
+
+
+IMAGE_MODES = [
+    ImageMode('original', "source PNGs, one per card"),
+    ImageMode('preview', "WebP derivatives, one per card", derivatives=True),
+    ImageMode('bundle', "derivatives served from the memory-mapped bundle", derivatives=True, bundle=True),
+    ImageMode('contact_sheet', "bundle, with several cards shown as one contact sheet", derivatives=True, bundle=True, contact_sheets=True),
+    ImageMode('attachment_urls', "contact sheets, with images already uploaded linked by URL", derivatives=True, bundle=True, contact_sheets=True, reuse_urls=True),
+]
+
+
+@dataclass
+class Measurements:
+    latencies: list[float] = field(default_factory=lambda: [])
+    bytes_sent: float = 0
+    attachments: float = 0
+    file_opens: float = 0
+
+
+class FileOpenCounter:
+    """
+    Counts every card image file opened while it's in use, by wrapping the built-in open until it's done with
+    """
+    def __init__(self, folders: list[str]):
+        self.folders = tuple(os.path.realpath(folder) for folder in folders)
+        self.num_opens = 0
+
+    def __enter__(self) -> 'FileOpenCounter':
+        self._open = builtins.open
+
+        def open_counted(file, *args, **kwargs):
+            if isinstance(file, str) and os.path.realpath(file).startswith(self.folders):
+                self.num_opens += 1
+            return self._open(file, *args, **kwargs)
+
+        builtins.open = open_counted
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        builtins.open = self._open
+
+
+def use_image_mode(mode: ImageMode, derivatives: dict[str, str]):
+    use_image_derivatives(derivatives if mode.derivatives else {})
+    use_asset_bundle(load_asset_bundle(BENCHMARK_QUALITY) if mode.bundle else None)
+    lib.contact_sheet.clear_rendered_sheets()
+    IMAGE_CACHE.clear()
+    ATTACHMENT_REGISTRY.urls = {}
+
+
+@contextmanager
+def benchmarking(state_folder: str) -> Iterator:
+    """
+    Imports the bot to run its commands, with its state kept in the given folder and its sends unlimited, putting back
+    everything that was swapped out once it's done
+    """
+    # the bot reads its API key from the folder it's run from when it's imported
+    with open(os.path.join(state_folder, 'api_key.txt'), 'w') as f:
+        f.write('benchmark')
+    cwd = os.getcwd()
+    os.chdir(state_folder)
+    try:
+        import bot
+    finally:
+        os.chdir(cwd)
+
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(bot, 'RUNNING_GAMES', []))
+        stack.enter_context(patch.object(lib.game_state, 'GAME_STATE_FILE', os.path.join(state_folder, 'game_state.json')))
+        stack.enter_context(patch.object(lib.game_state, 'GAME_STATE_FOLDER', os.path.join(state_folder, 'games')))
+        stack.enter_context(patch.object(ATTACHMENT_REGISTRY, 'urls_file', os.path.join(state_folder, 'attachment_urls.json')))
+        stack.enter_context(patch.object(ATTACHMENT_REGISTRY, 'urls', {}))
+        # the fake Discord has no rate limits, and waiting on them would only hide what the images cost
+        stack.enter_context(patch.object(lib.outbox, 'SEND_SCHEDULER', SendScheduler(bucket_capacity=None, global_capacity=sys.maxsize)))
+        stack.callback(use_image_derivatives, {})
+        stack.callback(use_asset_bundle, None)
+        yield bot
+
+
+def start_game(bot, num_cards_in_hand: int=0):
+    """
+    Starts the benchmark's game for a single player, as the only game the bot is running
+    """
+    member = MemberInfo(id=PLAYER_ID, name='player', mention=f"<@{PLAYER_ID}>")
+    game = engine.start_game('owd-benchmark', [member], GAME_CHANNEL_ID, VOICE_CHANNEL_ID)
+    if num_cards_in_hand:
+        engine.draw(game, member, num_cards_in_hand)
+    bot.RUNNING_GAMES = [game]
+
+
+async def run_draw(bot, client: disnake.Client, num_cards: int):
+    """
+    Draws cards in a new game with the !draw command
+    """
+    start_game(bot)
+    await bot.bot.get_command('draw').callback(ClientContext(client, 'draw', author_id=PLAYER_ID, channel_id=GAME_CHANNEL_ID), str(num_cards))
+    await wait_for_background_deliveries()
+
+
+async def run_hand(bot, client: disnake.Client, num_cards: int):
+    """
+    Sends the images of a hand of cards in one message with the !hand command, the way the read-only commands do
+    """
+    start_game(bot, num_cards_in_hand=num_cards)
+    await bot.bot.get_command('hand').callback(ClientContext(client, 'hand', author_id=PLAYER_ID))
+
+
+# named after the command each one runs
+SCENARIOS = {
+    'draw': run_draw,
+    'hand': run_hand,
+}
+
+
+def get_max_cards(scenario_name: str, mode: ImageMode) -> int:
+    """
+    The most cards a scenario can run with: as many as its command takes at once, and for !hand, which sends its cards on a
+    single message, as many as fit on one without contact sheets
+    """
+    max_cards = MAX_COMMAND_CARDS.get(scenario_name, sys.maxsize)
+    if scenario_name == 'hand' and not mode.contact_sheets:
+        max_cards = min(max_cards, MAX_MESSAGE_ATTACHMENTS)
+    return max_cards
+
+
+async def run_scenario(scenario, mode: ImageMode, bot, client: disnake.Client, num_cards: int, seed: int):
+    # every mode is shuffled the same way, so they're all measured sending the same cards
+    random.seed(seed)
+    if not mode.reuse_urls:
+        ATTACHMENT_REGISTRY.urls = {}
+    # the bot's own logging (e.g. about cards without an image) would get in the way of the results
+    with redirect_stdout(StringIO()):
+        await scenario(bot, client, num_cards)
+
+
+async def measure(scenario, mode: ImageMode, bot, client: disnake.Client, fake_discord: FakeDiscord, file_opens: FileOpenCounter, num_cards: int, iterations: int) -> Measurements:
+    measurements = Measurements()
+    # one untimed run first (with cards none of the timed runs get), so every mode is measured with whatever it keeps in memory already warm
+    await run_scenario(scenario, mode, bot, client, num_cards, seed=iterations)
+
+    bytes_before, attachments_before, opens_before = fake_discord.bytes_received, fake_discord.attachments_received, file_opens.num_opens
+    for i in range(iterations):
+        start = time.perf_counter()
+        await run_scenario(scenario, mode, bot, client, num_cards, seed=i)
+        measurements.latencies.append(time.perf_counter() - start)
+
+    measurements.bytes_sent = (fake_discord.bytes_received - bytes_before) / iterations
+    measurements.attachments = (fake_discord.attachments_received - attachments_before) / iterations
+    measurements.file_opens = (file_opens.num_opens - opens_before) / iterations
+    return measurements
+
+
+def get_percentile(latencies: list[float], percentile: int) -> float:
+    if len(latencies) == 1:
+        return latencies[0]
+    return quantiles(latencies, n=100, method='inclusive')[percentile - 1]
+
+
+async def run_benchmark(modes: list[ImageMode], sizes: list[int], iterations: int):
+    derivatives = build_image_derivatives(BENCHMARK_QUALITY)
+    bundle_path = get_bundle_location(BENCHMARK_QUALITY)
+    if not os.path.exists(bundle_path):
+        build_asset_bundle(list(derivatives.values()), bundle_path)
+
+    fake_discord = FakeDiscord()
+    api_url = await fake_discord.start()
+    client = disnake.Client(intents=disnake.Intents.none())
+
+    try:
+        with ExitStack() as stack:
+            stack.enter_context(patch.object(Route, 'BASE', api_url))
+            bot = stack.enter_context(benchmarking(stack.enter_context(tempfile.TemporaryDirectory())))
+            file_opens = stack.enter_context(FileOpenCounter([CARD_IMAGES_FOLDER, CARD_IMAGE_CACHE_FOLDER]))
+            await client.login('benchmark')
+
+            print(f"{'scenario':<12} {'mode':<16} {'cards':>5} {'p50 ms':>8} {'p99 ms':>8} {'KB sent':>9} {'attached':>8} {'opens':>6}")
+            for scenario_name, scenario in SCENARIOS.items():
+                for mode in modes:
+                    use_image_mode(mode, derivatives)
+                    # without contact sheets, every card is sent as an image of its own however many there are
+                    min_contact_sheet_cards = lib.contact_sheet.CONTACT_SHEET_MIN_CARDS if mode.contact_sheets else sys.maxsize
+                    with patch.object(lib.contact_sheet, 'CONTACT_SHEET_MIN_CARDS', min_contact_sheet_cards):
+                        for num_cards in [num_cards for num_cards in sizes if num_cards <= get_max_cards(scenario_name, mode)]:
+                            measurements = await measure(scenario, mode, bot, client, fake_discord, file_opens, num_cards, iterations)
+                            print(
+                                f"{scenario_name:<12} {mode.name:<16} {num_cards:>5} "
+                                f"{get_percentile(measurements.latencies, 50) * 1000:>8.1f} {get_percentile(measurements.latencies, 99) * 1000:>8.1f} "
+                                f"{measurements.bytes_sent / 1024:>9.1f} {measurements.attachments:>8.1f} {measurements.file_opens:>6.1f}"
+                            )
+
+            # saved to the benchmark's state folder, before it's swapped back for the bot's own
+            await ATTACHMENT_REGISTRY.wait_for_save()
+    finally:
+        await client.close()
+        await fake_discord.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sending card images against a local fake of Discord")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--sizes", type=int, nargs='+', default=[1, 3, 5, 10, 20, 30])
+    parser.add_argument("--modes", nargs='+', choices=[mode.name for mode in IMAGE_MODES], default=[mode.name for mode in IMAGE_MODES])
+    args = parser.parse_args()
+
+    for mode in IMAGE_MODES:
+        if mode.name in args.modes:
+            print(f"{mode.name}: {mode.description}")
+    print()
+
+    asyncio.run(run_benchmark([mode for mode in IMAGE_MODES if mode.name in args.modes], args.sizes, args.iterations))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,49 @@
-import random
+import argparse
+import asyncio
+import os
 import sys
-from copy import deepcopy
 from traceback import print_exception
-from typing import Optional, Union
+from typing import Awaitable, Callable, Optional, Union
 
 import disnake
 from disnake.channel import TextChannel, VoiceChannel
 from disnake.ext import commands
 from disnake.ext.commands.context import Context
+from disnake.interactions import ApplicationCommandInteraction
 from disnake.member import Member
 from disnake.user import User
 from disnake.utils import find
 
-from constants import DECKLIST_FILE, MAX_AUX_HAND_SIZE
-from errors import CardMissingBuybackError, CardMissingFlashbackError, CardNotFoundError, ImageNotFoundError
-from lib.card_image import get_image_file_location, get_card_images
-from lib.deck import Deck
-from lib.discord import message_is_in_game_channel, message_is_in_server
-from lib.formatting import format_card_list
-from lib.game_state import load_game_state, save_game_state
+import engine.actions as engine
+from constants import ASSET_CHANNEL_ID, DECKLIST_FILE, IMAGE_QUALITY, LEAN_GATEWAY, LIST_DELIMITER, MAX_BATCH_ACTIONS, SHARD_COUNT, WORKER_PROCESSES
+from engine.events import Event
+from errors import ImageNotFoundError, InvalidCommandError
+from lib.admission import ADMISSION_CONTROLLER, CommandRejectedError, check_num_cards
+from lib.asset_bundle import load_asset_bundle
+from lib.asset_manifest import find_asset_problems, get_asset_manifest
+from lib.attachments import ATTACHMENT_REGISTRY
+from lib.card_image import get_all_image_file_locations, get_card_image, get_decklist_image_file_locations, is_bundled, use_asset_bundle, use_image_derivatives
+from lib.card_lists import read_card_lists
+from lib.channel_pool import CHANNEL_POOL
+from lib.contact_sheet import get_card_attachments
+from lib.deck import get_decklist, get_shuffled_cards
+from lib.discord import message_is_in_game_channel, message_is_in_server, to_member_info
+from lib.event_messages import send_events
+from lib.executors import run_cpu_bound, run_disk_io, shutdown_executors
+from lib.formatting import format_card_list, split_message
+from lib.game_actor import discard_game_actor, get_game_actor
+from lib.game_state import load_game_state
+from lib.gateway import get_gateway_options
+from lib.image_cache import IMAGE_CACHE
+from lib.image_derivatives import build_image_derivatives, get_image_derivatives
+from lib.interactions import InteractionContext, get_private_destination
+from lib.loop_monitor import LOOP_LAG_MONITOR
+from lib.member_cache import MEMBER_CACHE, PLAYER_CACHE
 from lib.messages import send_game_channel_warning_message
-from models import MemberInfo, OneWithDeathGame
+from lib.sharding import ShardSupervisor, get_recommended_shard_count, has_unmigrated_games, migrate_game_state
+from lib.stats import STATS_LOGGER
+from lib.transaction import GameTransaction
+from models import OneWithDeathGame
 
 
 with open("api_key.txt", "r") as f:
@@ -28,24 +51,58 @@ with open("api_key.txt", "r") as f:
 
 
 # TODO: refactor this into separate modules for different commands
-    
+
 # TODO: figure out how to reduce game finding/checking boilerplate
 
 
 # TODO: refactor this into a singleton or something -- in-memory data layer? SQLite?
 RUNNING_GAMES: list[OneWithDeathGame] = []
 
-intents = disnake.Intents.default()
-intents.message_content = True
-intents.members = True
-
-bot = commands.Bot(command_prefix="!", intents=intents)
+# which shards this process runs is set once it knows whether it's one of several worker processes
+bot = commands.AutoShardedBot(command_prefix="!", **get_gateway_options(LEAN_GATEWAY))
 
 
 def find_game_by_member_id(member_id: str) -> Optional[OneWithDeathGame]:
     return find(lambda g: find(lambda m: m.id == member_id, g.members), RUNNING_GAMES)
 
 
+async def run_game_command(ctx: Context, game: OneWithDeathGame, command: Callable[[], Awaitable[None]]):
+    """
+    Runs a command which changes a game on that game's actor, so it can't interleave with any other command for the same game
+    """
+    async def run_if_game_is_running():
+        # the game could have ended while the command was waiting its turn
+        if not any(running_game is game for running_game in RUNNING_GAMES):
+            await ctx.send("That game has already ended")
+            return
+        await command()
+
+    if ctx.guild:
+        # the command's messages are staged for its players without waiting on anything, so they need to be at hand
+        await PLAYER_CACHE.fetch_players(ctx.guild, game)
+    await get_game_actor(game.id).run(run_if_game_is_running)
+
+
+async def apply_game_action(ctx: Context, game: OneWithDeathGame, action: Callable[..., list[Event]], *args):
+    """
+    Applies an engine action to a game in its own transaction, then sends the messages for whatever happened
+    """
+    async def apply():
+        async with GameTransaction(ctx, RUNNING_GAMES, game) as tx:
+            send_events(tx, game, action(game, *args))
+
+    await run_game_command(ctx, game, apply)
+
+
+def parse_num_cards(num_cards: str, command_name: str) -> int:
+    try:
+        num_cards = int(num_cards)
+    except ValueError:
+        raise InvalidCommandError(f"Received invalid non-number argument for {command_name}: {num_cards}")
+    check_num_cards(num_cards, command_name)
+    return num_cards
+
+
 @bot.command()
 async def startgame(ctx: Context, *member_names_for_game):
     if not message_is_in_server(ctx):
@@ -55,17 +112,20 @@ async def startgame(ctx: Context, *member_names_for_game):
     print(f"Starting new game for member {ctx.author.mention}")
     game_members: list[Member] = [ctx.author]
 
-    # find game members
-    for member_name in member_names_for_game:
-        members = await ctx.guild.search_members(member_name)
-
-        if not any(members):
+    # find game members, all at once
+    found_members = await asyncio.gather(*(MEMBER_CACHE.find(ctx.guild, member_name) for member_name in member_names_for_game))
+    for member_name, member in zip(member_names_for_game, found_members):
+        if not member:
             await ctx.send(
                 f'ERROR: Could not find member {member_name} in the server. Was there a typo, or were quotes (") forgotten around a name with spaces?'
             )
             return
 
-        game_members.append(members[0])
+        game_members.append(member)
+
+    # so the game's first command doesn't have to fetch its players again
+    for member in game_members:
+        PLAYER_CACHE.add(member)
 
     # TODO: stop people from starting game if member is already in a game
 
@@ -84,49 +144,65 @@ async def startgame(ctx: Context, *member_names_for_game):
         overwrites[admin_role] = disnake.PermissionOverwrite(view_channel=True)
 
     text_channel_name = f"{ctx.author}-one-with-death"
-    print(f"Creating text channel {text_channel_name}")
-    text_channel: TextChannel = await ctx.guild.create_text_channel(
-        text_channel_name, overwrites=overwrites
-    )
-
     voice_channel_name = f"{ctx.author}-one-with-death-vc"
-    print(f"Creating voice channel {voice_channel_name}")
-    voice_channel: VoiceChannel = await ctx.guild.create_voice_channel(
-        voice_channel_name, overwrites=overwrites
-    )
 
-    await ctx.send(
-        f"New channels have been created for a One with Death game hosted by {ctx.author.mention}, including the players {', '.join([member.mention for member in game_members[:-1]])} and {game_members[-1].mention}"
-    )
+    pooled_channels = CHANNEL_POOL.claim(ctx.guild)
+    if pooled_channels:
+        text_channel, voice_channel = pooled_channels
+        print(f"Claiming pooled channels {text_channel.name} and {voice_channel.name} as {text_channel_name} and {voice_channel_name}")
+        try:
+            await asyncio.gather(
+                text_channel.edit(name=text_channel_name, overwrites=overwrites),
+                voice_channel.edit(name=voice_channel_name, overwrites=overwrites),
+            )
+        except disnake.HTTPException as e:
+            # e.g. someone deleted the pooled channels by hand, so fall back to creating new ones
+            print(f"Failed to claim pooled channels: {e}")
+            pooled_channels = None
+
+    if not pooled_channels:
+        print(f"Creating text channel {text_channel_name}")
+        text_channel: TextChannel = await ctx.guild.create_text_channel(
+            text_channel_name, overwrites=overwrites
+        )
+
+        print(f"Creating voice channel {voice_channel_name}")
+        voice_channel: VoiceChannel = await ctx.guild.create_voice_channel(
+            voice_channel_name, overwrites=overwrites
+        )
 
     # initialize and save game state
-    game_state = OneWithDeathGame(
-        id=f"owd-{ctx.author}",
-        members=[
-            MemberInfo(id=member.id, name=member.name, mention=member.mention)
-            for member in game_members
-        ],
-        deck=Deck.from_file(decklist_file=DECKLIST_FILE, member_ids=[member.id for member in game_members]),
+    game_state = engine.start_game(
+        game_id=f"owd-{ctx.author}",
+        members=[to_member_info(member) for member in game_members],
         text_channel=text_channel.id,
-        voice_channel=voice_channel.id
+        voice_channel=voice_channel.id,
+        text_channel_name=text_channel_name,
+        voice_channel_name=voice_channel_name,
+        guild_id=ctx.guild.id,
     )
 
-    RUNNING_GAMES.append(game_state)
-    save_game_state(RUNNING_GAMES)
+    async with GameTransaction(ctx, RUNNING_GAMES) as tx:
+        RUNNING_GAMES.append(game_state)
 
-    # send welcome messages
-    for member in game_members:
-        # TODO: iron out what this specifically should say w/john and danny
-        # TODO: include nix image as attachment on this message
-        # TODO: include rules description here, or a link to it
-        content=f"""Welcome to One with Death!
+        tx.send(
+            ctx,
+            f"New channels have been created for a One with Death game hosted by {ctx.author.mention}, including the players {', '.join([member.mention for member in game_members[:-1]])} and {game_members[-1].mention}"
+        )
+
+        # send welcome messages
+        for member in game_members:
+            # TODO: iron out what this specifically should say w/john and danny
+            # TODO: include nix image as attachment on this message
+            # TODO: include rules description here, or a link to it
+            content=f"""Welcome to One with Death!
 
 I'll be letting you know in this chat what cards you draw. Any non-private commands should be sent in {text_channel.mention} in {ctx.guild.name}, though!
 
 The main important commands are:
 `!rules` - Show the rules of One with Death.
 
-`!draw [num_cards=1]` - Draw cards from the Deck of Death. If no number of cards is provided, one card is drawn by default. 
+`!draw [num_cards=1]` - Draw cards from the Deck of Death. If no number of cards is provided, one card is drawn by default.
 
 `!play card_name` - Play a card which you've previously drawn from the Deck of Death
 
@@ -137,81 +213,38 @@ The main important commands are:
 `!help` - See a full list of available commands, or get more detailed help for a command (e.g. !help scry)
 
 You start with a Nix card automatically!"""
-        await member.send(content, file=disnake.File(get_image_file_location("Nix")))
+            tx.send(member, content, file=get_card_image("Nix"))
 
 
 @bot.command()
 async def endgame(ctx: Context, game_id: Optional[str]=None):
     """
-    End the game you are currently in, deleting the game state and channels
+    End the game you are currently in, deleting the game state and closing its channels
     """
     # TODO: allow admins to manually specify game id, but only admins
-    if not game_id:
-        game = find_game_by_member_id(ctx.author.id)
-        if not game:
-            await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
-            return
-        else:
-            game_id = game.id
+    game = find_game_by_member_id(ctx.author.id)
+    if not game:
+        await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
+        return
 
     if not message_is_in_game_channel(ctx, game):
         await send_game_channel_warning_message(ctx, game)
         return
 
-    game_index_list = [i for i, g in enumerate(RUNNING_GAMES) if g.id == game_id]
-
-    if not game_index_list:
-        await ctx.send(f"Game with id {game_id} was not found")
-    else:
-        game_index = game_index_list[0]
-        game = RUNNING_GAMES[0]
-        del RUNNING_GAMES[game_index]
-        save_game_state(RUNNING_GAMES)
-
-        await ctx.guild.get_channel(game.text_channel).delete()
-        await ctx.guild.get_channel(game.voice_channel).delete()
-        
-        for member in game.members:
-            await ctx.guild.get_member(member.id).send(f"The game {game.id} has ended!")
-
-
-async def handle_draw(ctx: Context, game: OneWithDeathGame, member: Union[User, Member], num_cards: int):
-    drawn_cards = game.deck.draw(member_id=member.id, num_cards=num_cards)
-    save_game_state(RUNNING_GAMES)
-    
-    # TODO: include card picture as attachment once I get them from danny
-    drawn_cards_display = format_card_list(drawn_cards)
-    content = f"You drew {'these' if num_cards > 1 else 'this'} {num_cards} card{'s' if num_cards > 1 else ''}: {drawn_cards_display}"
-    failed_to_load_images = False
-
-    card_images = []
-    try:
-        card_images = [disnake.File(get_image_file_location(card_name)) for card_name in drawn_cards]
-    except Exception as e:
-        print(f"Failed to load card images for card list: {drawn_cards}")
-        print_exception(
-            type(e), e, e.__traceback__, file=sys.stderr
-        )
-        failed_to_load_images = True
-        # intentionally eat the error so we still at least send the drawn cards
-
-    await member.send(content, files=card_images)
-    if failed_to_load_images:
-        await member.send("Sorry, I had some trouble loading the images for this draw.")
+    # only the game the command came from can be ended, since no one is checked for being an admin
+    if game_id and game_id != game.id:
+        await ctx.send(f"You can only end the game you're playing in, which is {game.id}")
+        return
 
-    game_channel = ctx.guild.get_channel(game.text_channel)
-    if game_channel != ctx.channel:
-        await game_channel.send(f"{member.mention} drew {num_cards} cards")
+    async def end():
+        async with GameTransaction(ctx, RUNNING_GAMES, game) as tx:
+            send_events(tx, game, engine.end_game(RUNNING_GAMES, game.id))
 
-    drawn_owds = [True for c in drawn_cards if c == 'One with Death']
-    if any(drawn_owds):
-        card_image = disnake.File(get_image_file_location("One with Death"))
-        await game_channel.send(f"{member.mention} drew {len(drawn_owds)} One with Death card{'s' if len(drawn_owds) > 1 else ''}!", file=card_image)
-        await member.send(f"You got {'{}'.format(len(drawn_owds)) if len(drawn_owds) > 1 else 'a'} Charon's Obol{'s' if len(drawn_owds) > 1 else ''}!", file=disnake.File(get_image_file_location("Charon's Obol"))) 
+            tx.defer(CHANNEL_POOL.release, ctx.guild, ctx.guild.get_channel(game.text_channel), ctx.guild.get_channel(game.voice_channel))
 
-    hand = game.deck.get_hand(member.id)
-    if len(hand) > MAX_AUX_HAND_SIZE:
-        await member.send(f"Your hand size of {len(hand)} is over the limit of {MAX_AUX_HAND_SIZE} cards!")
+    await run_game_command(ctx, game, end)
+    discard_game_actor(game.id)
+    PLAYER_CACHE.keep_only(RUNNING_GAMES)
 
 
 @bot.command()
@@ -227,18 +260,12 @@ async def draw(ctx: Context, num_cards: str="1"):
     if not game:
         await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
         return
-    
+
     if not message_is_in_game_channel(ctx, game):
         await send_game_channel_warning_message(ctx, game)
         return
 
-    try:
-        num_cards = int(num_cards)
-    except:
-        await ctx.send(f"Received invalid non-number argument for draw: {num_cards}")
-        return
-
-    await handle_draw(ctx, game, ctx.author, num_cards)
+    await apply_game_action(ctx, game, engine.draw, to_member_info(ctx.author), parse_num_cards(num_cards, 'draw'))
 
 
 @bot.command()
@@ -249,24 +276,24 @@ async def drawall(ctx: Context, num_cards: str="1"):
     Cards drawn will be DM'd to each player with images of the cards included.
 
     If a One with Death is drawn, it is automatically put into the resolution stack and the fact it was drawn is sent to the game channel.
-    """ 
+    """
     game = find_game_by_member_id(ctx.author.id)
     if not game:
         await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
         return
-    
+
     if not message_is_in_game_channel(ctx, game):
         await send_game_channel_warning_message(ctx, game)
         return
 
-    try:
-        num_cards = int(num_cards)
-    except:
-        await ctx.send(f"Received invalid non-number argument for draw: {num_cards}")
-        return
-    
-    for member in game.members:
-        await handle_draw(ctx, game, ctx.guild.get_member(member.id), num_cards)
+    num_cards = parse_num_cards(num_cards, 'draw')
+
+    async def draw_for_all():
+        async with GameTransaction(ctx, RUNNING_GAMES, game) as tx:
+            for member in game.members:
+                send_events(tx, game, engine.draw(game, member, num_cards))
+
+    await run_game_command(ctx, game, draw_for_all)
 
 
 @bot.command()
@@ -282,22 +309,22 @@ async def drawother(ctx: Context, num_cards: str="1"):
     if not game:
         await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
         return
-    
+
     if not message_is_in_game_channel(ctx, game):
         await send_game_channel_warning_message(ctx, game)
         return
-    
-    try:
-        num_cards = int(num_cards)
-    except:
-        await ctx.send(f"Received invalid non-number argument for draw: {num_cards}")
-        return
-    
-    for member in game.members:
-        if member.id == ctx.author.id:
-            # don't draw for the person submitting the command
-            continue
-        await handle_draw(ctx, game, ctx.guild.get_member(member.id), num_cards)
+
+    num_cards = parse_num_cards(num_cards, 'draw')
+
+    async def draw_for_others():
+        async with GameTransaction(ctx, RUNNING_GAMES, game) as tx:
+            for member in game.members:
+                if member.id == ctx.author.id:
+                    # don't draw for the person submitting the command
+                    continue
+                send_events(tx, game, engine.draw(game, member, num_cards))
+
+    await run_game_command(ctx, game, draw_for_others)
 
 
 @bot.command()
@@ -309,21 +336,12 @@ async def redrawexile(ctx: Context):
     if not game:
         await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
         return
-    
+
     if not message_is_in_game_channel(ctx, game):
         await send_game_channel_warning_message(ctx, game)
         return
 
-    # discard hand, toss the discarded cards into the exile list, then re-draw
-    exiled_hand = game.deck.discard_hand(ctx.author.id)
-    num_cards = len(exiled_hand)
-    
-    game.exile.extend(exiled_hand)
-    
-    await handle_draw(ctx, game, num_cards)
-    save_game_state(RUNNING_GAMES)
-
-    await ctx.send(f"{ctx.author.mention} exiled and re-drew {num_cards} cards")
+    await apply_game_action(ctx, game, engine.redraw_exile, to_member_info(ctx.author))
 
 
 @bot.command()
@@ -340,79 +358,21 @@ async def redrawall(ctx: Context):
         await send_game_channel_warning_message(ctx, game)
         return
 
-    member_num_cards: dict[int, int] = {}
-
-    for member in game.members:
-        discarded_cards = game.deck.discard_hand(member.id)
-        game.deck.add_to_deck(*discarded_cards)
-        member_num_cards[member.id] = len(discarded_cards)
-
-    game.deck.shuffle()
-    
-    for member in game.members:
-        await handle_draw(ctx, game, ctx.guild.get_member(member.id), member_num_cards[member.id])
-    
-    game_channel = ctx.guild.get_channel(game.text_channel)
-    await game_channel.send(f"{ctx.author.mention} triggered a re-draw for all players")
+    await apply_game_action(ctx, game, engine.redraw_all, to_member_info(ctx.author))
 
 
-async def peek_for_order(ctx: Context, num_cards: str, follow_up_action: Optional[str]=None, action_word="peek"):
+async def peek_for_order(ctx: Context, num_cards: str, command_name: str, follow_up_action: Optional[str]=None):
     game = find_game_by_member_id(ctx.author.id)
     if not game:
         await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
         return
-    
+
     if not message_is_in_game_channel(ctx, game):
         await send_game_channel_warning_message(ctx, game)
         return
-    
-    if game.waiting_for_response_from:
-        await ctx.send(f"Currently waiting to resolve an action ({game.waiting_for_response_action}) from {game.waiting_for_response_from.name}, so no other actions can be taken")
-        return
 
-    try:
-        num_cards = int(num_cards)
-    except:
-        await ctx.send(f"Received invalid non-number argument for draw: {num_cards}")
-        return
-
-    print(f"Scrying {num_cards} cards for {ctx.author} in game {game.id}")
-    peeked_cards = game.deck.peek(num_cards)
-    
-    # TODO: where do I get card pictures from?
-    numbered_cards = [f"`{i + 1}. {peeked_cards[i]}`" for i in range(len(peeked_cards))]
-    cards_display = '\n'.join(numbered_cards)
-
-    card_images = []
-    for card in peeked_cards:
-        try:
-            card_image = disnake.File(get_image_file_location(card))
-            card_images.append(card_image)
-        except ImageNotFoundError:
-            print(f"Error retrieving image for {card}")
-
-    content = f"You {action_word}ed these {num_cards} cards:\n{cards_display}\n"
-    await ctx.author.send(content, files=card_images)
-
-    input_directions = 'Respond to me with a `!reorder` command with the re-ordered card numbers, separated by spaces'
-    if follow_up_action == "reorder:scry":
-        input_directions = ", grouped by top/bottom as a prefixing word.\n\nFor example, for a `!scry 3` you might write: `!reorder top 1 2 bottom 3`."
-    elif follow_up_action == "reorder:rearrange":
-        input_directions = ".\n\nFor example, for a `!rearrange 3` you might write: `!reorder 3 1 2`."
-
-    if follow_up_action:
-        await ctx.author.send(f"{input_directions}")
-        game.waiting_for_response_from = MemberInfo(ctx.author.id, ctx.author.display_name, ctx.author.mention)
-        game.waiting_for_response_action = follow_up_action
-        game.waiting_for_response_number = num_cards
-
-        save_game_state(RUNNING_GAMES)
-
-    # if this was run outside the game channel, notify the game channel it happened
-    game_channel = ctx.guild.get_channel(game.text_channel)
-    
-    if game_channel != ctx.channel:
-        await game_channel.send(f"{ctx.author.mention} peeked at {num_cards} cards")
+    print(f"Peeking at {num_cards} cards for {ctx.author} in game {game.id}")
+    await apply_game_action(ctx, game, engine.peek, to_member_info(ctx.author), parse_num_cards(num_cards, command_name), follow_up_action)
 
 
 @bot.command()
@@ -424,7 +384,7 @@ async def scry(ctx: Context, num_cards: str):
     A !reorder for a scry is in the format: !reorder top 1 2 bottom 3
     In which the numbers align from top->bottom for the card numbers specified in the message from the bot.
     """
-    await peek_for_order(ctx, num_cards, "reorder:scry")
+    await peek_for_order(ctx, num_cards, 'scry', engine.REORDER_SCRY)
 
 
 @bot.command()
@@ -433,10 +393,10 @@ async def fix(ctx: Context, num_cards: str):
     Peek at the top cards of the Deck of Death, then gain the ability to re-arrange those cards as desired on the top and bottom of the deck.
 
     Must be followed by a !reorder command to re-order the scried cards.
-    A !reorder for a fix is in the format: !reorder 3 1 2 
+    A !reorder for a fix is in the format: !reorder 3 1 2
     In which the numbers align from top->bottom for the card numbers specified in the message from the bot.
     """
-    await peek_for_order(ctx, num_cards, "reorder:rearrange")
+    await peek_for_order(ctx, num_cards, 'fix', engine.REORDER_REARRANGE)
 
 
 @bot.command()
@@ -444,7 +404,7 @@ async def peek(ctx: Context, num_cards: str):
     """
     Peek at the top cards of the deck. The cards you see will be sent to you in a DM.
     """
-    await peek_for_order(ctx, num_cards)
+    await peek_for_order(ctx, num_cards, 'peek')
 
 
 @bot.command()
@@ -455,7 +415,7 @@ async def order(ctx: Context, *new_card_indexes):
     If no argument is given, the re-order will resolve without changing the card order.
 
     Examples:
-    
+
     For a scry                     -> !order top 1 2 bottom 3
     For a scry where all go on top -> !order top 1 2
     For a rearrange                -> !order 1 2 3
@@ -465,74 +425,7 @@ async def order(ctx: Context, *new_card_indexes):
         await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
         return
 
-    if game.waiting_for_response_from.id and game.waiting_for_response_from.id != ctx.author.id:
-        await ctx.send(f"I'm currently waiting to resolve an action ({game.waiting_for_response_action}) from player {game.waiting_for_response_from}, so no other actions can be taken")
-        return
-
-    if game.waiting_for_response_action not in ["reorder:scry", "reorder:rearrange"]:
-        await ctx.send(f"I'm currently waiting to resolve a non-order action {game.waiting_for_response_action} from you, so an order is not valid")
-        return
-
-    non_specifier_inputs = [i for i in new_card_indexes if i.lower() != "top" and i.lower() != "bottom"]
-    if game.waiting_for_response_number != len(non_specifier_inputs):
-        await ctx.send(f"I expected to be re-ordering {game.waiting_for_response_number} cards, but instead I got {len(new_card_indexes)} ({new_card_indexes}).")
-
-    # At this point, we know it's the right player making a valid action type
-    converted_new_card_indexes = []
-    for item in new_card_indexes:
-        if item.lower() == 'top' or item.lower() == 'bottom':
-            converted_new_card_indexes.append(item.lower())
-        else:
-            try:
-                index = int(item)
-                converted_new_card_indexes.append(index)
-            except:
-                await ctx.send(f"It looks like I got an invalid argument: {item}. Only numbers and the words 'top' and 'bottom' are valid arguments for re-ordering.")
-                return
-
-
-    indexes_only = [i for i in converted_new_card_indexes if isinstance(i, int)]
-
-    expected_indexes = [i + 1 for i in range(len(indexes_only))]
-    if sorted(indexes_only) != expected_indexes:
-        await ctx.send(f"Invalid card indexes for rearrange re-ordering provided: {[i for i in indexes_only if i not in expected_indexes]}")
-        return
-
-    if game.waiting_for_response_action == "reorder:scry":
-        new_top_cards, new_bottom_cards = [], []
-        top_specifier_index = converted_new_card_indexes.index("top") if "top" in converted_new_card_indexes else -1
-        bottom_specifier_index = converted_new_card_indexes.index("bottom") if "bottom" in converted_new_card_indexes else -1
-
-        if top_specifier_index >= 0 and bottom_specifier_index >= 0:
-            # bottom and top both present, figure out which indexes go to which side
-            if top_specifier_index > bottom_specifier_index:
-                new_top_cards = indexes_only[top_specifier_index - 1:]
-                new_bottom_cards = indexes_only[:top_specifier_index - 1]
-            else:
-                new_top_cards = indexes_only[:bottom_specifier_index - 1]
-                new_bottom_cards = indexes_only[bottom_specifier_index - 1:]
-        elif top_specifier_index < 0 and bottom_specifier_index >= 0:
-            # only bottom
-            new_top_cards = []
-            new_bottom_cards = indexes_only
-        else:
-            # top only
-            # this is top only regardless of whether we have a top specifier
-            # because w/no specifier the default is also top only
-            new_top_cards = indexes_only
-            new_bottom_cards = []
-
-        game.deck.reorder_scry(new_top_cards, new_bottom_cards)
-    elif game.waiting_for_response_action == "reorder:rearrange":
-        game.deck.reorder_rearrange(indexes_only)
-    else:
-        await ctx.send(f"Uh-oh, I don't know how to deal with the action {game.waiting_for_response_action}. Reach out to @snowydark to get this fixed, because it shouldn't happen.")
-    
-    await ctx.send("Cards successfully re-ordered")
-    game.waiting_for_response_action = None
-    game.waiting_for_response_from = None
-    game.waiting_for_response_number = None
-    save_game_state(RUNNING_GAMES)
+    await apply_game_action(ctx, game, engine.order, to_member_info(ctx.author), list(new_card_indexes))
 
 
 @bot.command()
@@ -553,28 +446,7 @@ async def play(ctx: Context, *card_words):
         await send_game_channel_warning_message(ctx, game)
         return
 
-    card_name = ' '.join(card_words)
-
-    actual_card_name = ''
-    try:
-        actual_card_name = game.deck.play(card_name, member_id=ctx.author.id)
-    except ValueError as e:
-        await ctx.send(e)
-        return
-    
-    print(f"Playing {actual_card_name} in game {game.id}")
-    game.graveyard.insert(actual_card_name)
-    save_game_state(RUNNING_GAMES)
-
-    # notify the game channel this happened
-    card_image = None
-    try:
-        card_image = disnake.File(get_image_file_location(actual_card_name))
-    except ImageNotFoundError:
-        print(f"Error retrieving image for {actual_card_name}")
-
-    game_channel = ctx.guild.get_channel(game.text_channel)
-    await game_channel.send(f"{ctx.author.mention} played {actual_card_name}", file=card_image)
+    await apply_game_action(ctx, game, engine.play, to_member_info(ctx.author), ' '.join(card_words))
 
 
 @bot.command()
@@ -591,28 +463,7 @@ async def discard(ctx: Context, *card_words):
         await send_game_channel_warning_message(ctx, game)
         return
 
-    card_name = ' '.join(card_words)
-
-    actual_card_name = ''
-    try:
-        actual_card_name = game.deck.discard(card_name, member_id=ctx.author.id)
-    except ValueError as e:
-        await ctx.send(e)
-        return
-    
-    print(f"Discarding {actual_card_name} in game {game.id}")
-    game.graveyard.insert(actual_card_name)
-    save_game_state(RUNNING_GAMES)
-
-    # notify the game channel this happened
-    card_image = None
-    try:
-        card_image = disnake.File(get_image_file_location(actual_card_name))
-    except ImageNotFoundError:
-        print(f"Error retrieving image for {actual_card_name}")
-
-    game_channel = ctx.guild.get_channel(game.text_channel)
-    await game_channel.send(f"{ctx.author.mention} discarded {actual_card_name}", file=card_image)
+    await apply_game_action(ctx, game, engine.discard, to_member_info(ctx.author), ' '.join(card_words))
 
 
 @bot.command()
@@ -629,20 +480,7 @@ async def discardall(ctx: Context):
         await send_game_channel_warning_message(ctx, game)
         return
 
-    print(f"Discarding hand of {ctx.author.mention} in game {game.id}")    
-    discarded_cards = []
-    hand = deepcopy(game.deck.get_hand(ctx.author.id))
-    print(f"Hand: {hand}")
-    for card_name in hand:
-        actual_card_name = game.deck.discard(card_name, member_id=ctx.author.id)
-        game.graveyard.insert(actual_card_name)
-        discarded_cards.append(card_name)
-
-    save_game_state(RUNNING_GAMES)
-
-    # notify the game channel this happened
-    game_channel = ctx.guild.get_channel(game.text_channel)
-    await game_channel.send(f"{ctx.author.mention} discarded {', '.join(discarded_cards)}")
+    await apply_game_action(ctx, game, engine.discard_hand, to_member_info(ctx.author))
 
 
 @bot.command()
@@ -654,30 +492,12 @@ async def buyback(ctx: Context, *card_words):
     if not game:
         await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
         return
-    
+
     if not message_is_in_game_channel(ctx, game):
         await send_game_channel_warning_message(ctx, game)
         return
 
-    card_name = ' '.join(card_words)
-    
-    if not game.deck.is_buyback_valid(card_name):
-        await ctx.send(f"You can't buy back a card that wasn't the card most recently played from the Deck of Death. \n\nThe most recently played card is: {game.deck._last_card_played}")
-        return
-
-    try:
-        actual_card = game.graveyard.buyback(card_name)
-        game.deck.buyback(card=actual_card, member_id=ctx.author.id)
-    except CardNotFoundError:
-        await ctx.send(f"The card {card_name} was not found in the graveyard")
-        return
-    except CardMissingBuybackError:
-        await ctx.send(f"The card {card_name} does not have buyback")
-        return
-
-    save_game_state(RUNNING_GAMES)
-    game_channel = ctx.guild.get_channel(game.text_channel)
-    await game_channel.send(f"{ctx.author.mention} bought back {actual_card}")
+    await apply_game_action(ctx, game, engine.buyback, to_member_info(ctx.author), ' '.join(card_words))
 
 
 @bot.command()
@@ -696,29 +516,7 @@ async def flashback(ctx: Context, *card_words):
         await send_game_channel_warning_message(ctx, game)
         return
 
-    card_name = ' '.join(card_words)
-
-    try:
-        actual_card_name = game.graveyard.flashback(card_name)
-    except CardNotFoundError:
-        await ctx.send(f"The card {card_name} was not found in the graveyard")
-        return
-    except CardMissingFlashbackError:
-        await ctx.send(f"The card {card_name} does not have flashback")
-        return
-
-    game.exile.append(actual_card_name)
-    save_game_state(RUNNING_GAMES)
-
-    game_channel = ctx.guild.get_channel(game.text_channel)
-
-    card_image = None
-    try:
-        card_image = disnake.File(get_image_file_location(actual_card_name))
-    except ImageNotFoundError:
-        print(f"Error retrieving image for {actual_card_name}")
-
-    await game_channel.send(f"{actual_card_name} has been flashbacked by {ctx.author.mention} and is now exiled", file=card_image)
+    await apply_game_action(ctx, game, engine.flashback, to_member_info(ctx.author), ' '.join(card_words))
 
 
 @bot.command()
@@ -727,29 +525,12 @@ async def mill(ctx: Context, num_cards: str):
     if not game:
         await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
         return
-    
+
     if not message_is_in_game_channel(ctx, game):
         await send_game_channel_warning_message(ctx, game)
         return
 
-    try:
-        num_cards_int = int(num_cards)
-    except:
-        await ctx.send(f"Received invalid non-number argument for draw: {num_cards}")
-        return
-
-    milled_cards, was_owd_milled = game.deck.mill(num_cards_int)
-    game.graveyard.cards.extend(milled_cards)
-
-    card_images = get_card_images(milled_cards)
-
-    save_game_state(RUNNING_GAMES)
-    
-    game_channel = ctx.guild.get_channel(game.text_channel)
-    if was_owd_milled:
-        await game_channel.send(f"{ctx.author.mention} milled {num_cards} cards, including a One with Death! The deck was shuffled because the One with Deaths were shuffled back in after being milled.", files=card_images)
-    else:
-        await game_channel.send(f"{ctx.author.mention} milled {num_cards} cards", files=card_images)
+    await apply_game_action(ctx, game, engine.mill, to_member_info(ctx.author), parse_num_cards(num_cards, 'mill'))
 
 
 @bot.command()
@@ -768,11 +549,11 @@ async def escape(ctx: Context, *card_words):
     else:
         card_image = None
         try:
-            card_image = disnake.File(get_image_file_location(actual_card_name))
+            card_image = get_card_image(actual_card_name)
         except ImageNotFoundError:
             print(f"Error retrieving image for {actual_card_name}")
         
-        await game_channel.send(f"{ctx.author.mention} escaped {actual_card_name}", file=card_image)
+        await ATTACHMENT_REGISTRY.send(game_channel, f"{ctx.author.mention} escaped {actual_card_name}", file=card_image)
 
 
 @bot.command()
@@ -782,12 +563,29 @@ async def shuffle(ctx: Context):
         await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
         return
 
+    async def apply():
+        # shuffled on a worker thread, so however big the deck is it can't hold up the event loop
+        shuffled_cards = await run_cpu_bound(get_shuffled_cards, game.deck.cards)
+        async with GameTransaction(ctx, RUNNING_GAMES, game) as tx:
+            send_events(tx, game, engine.shuffle(game, to_member_info(ctx.author), shuffled_cards))
 
-    game.deck.shuffle()
-    save_game_state(RUNNING_GAMES)
+    await run_game_command(ctx, game, apply)
 
-    game_channel = ctx.guild.get_channel(game.text_channel)
-    await game_channel.send(f"{ctx.author.mention} shuffled the Deck of Death.")
+
+def parse_resolve_args(card_words: tuple[str]) -> tuple[str, int]:
+    """
+    Splits the arguments for a resolve into the card name and the number of copies to resolve
+    """
+    if not card_words:
+        raise InvalidCommandError("You must provide either a number of cards to resolve from the stack, or the name of the card to resolve, or a card name then a number of cards to resolve")
+
+    # if the last word is a number, take that as the num of copies to resolve
+    num_cards_to_resolve = 1
+    if card_words[-1].isdigit():
+        num_cards_to_resolve = int(card_words[-1])
+        card_words = card_words[:-1]
+
+    return ' '.join(card_words), num_cards_to_resolve
 
 
 @bot.command()
@@ -802,36 +600,26 @@ async def resolve(ctx: Context, *card_words):
         await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
         return
 
-    if not card_words:
-        await ctx.send(f"You must provide either a number of cards to resolve from the stack, or the name of the card to resolve, or a card name then a number of cards to resolve")
-        return
+    await apply_game_action(ctx, game, engine.resolve, *parse_resolve_args(card_words))
 
-    # if the last word is a number, take that as the num of copies to resolve 
-    num_cards_to_resolve = 1
-    if card_words[-1].isdigit():
-        num_cards_to_resolve = int(card_words[-1])
-        card_words = card_words[:-1]
 
-    card_name = ' '.join(card_words)
+@bot.command()
+async def resolveall(ctx: Context, *card_words):
+    """
+    Resolve every card in the game's resolution stack at once, or every copy of a specific card.
 
-    resolved_cards = []
-    for _ in range(num_cards_to_resolve):
-        actual_card_name = ''
-        try:
-            actual_card_name = game.deck.resolve(card_name)
-            resolved_cards.append(actual_card_name)
-        except ValueError:
-            await ctx.send(f"{card_name} is not in the resolution stack")
-            break
+    All the One with Deaths go back into the deck together, with a single shuffle.
 
-        if actual_card_name != "One with Death":
-            game.graveyard.insert(actual_card_name)
+    Examples:
+    !resolveall
+    !resolveall one with death
+    """
+    game = find_game_by_member_id(ctx.author.id)
+    if not game:
+        await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
+        return
 
-    if resolved_cards:
-        save_game_state(RUNNING_GAMES)
-        
-        game_channel = ctx.guild.get_channel(game.text_channel)
-        await game_channel.send(f"Resolved {'a' if len(resolved_cards) == 1 else str(num_cards_to_resolve)} card{'s' if len(resolved_cards) > 1 else ''}: {format_card_list(resolved_cards)} The resolution stack is now {':' + format_card_list(game.deck._waiting_to_resolve) if game.deck._waiting_to_resolve else 'empty'}")
+    await apply_game_action(ctx, game, engine.resolve_all, ' '.join(card_words))
 
 
 @bot.command()
@@ -844,12 +632,10 @@ async def stack(ctx: Context, *card_words):
         await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
         return
 
-    save_game_state(RUNNING_GAMES)
-    
     game_channel = ctx.guild.get_channel(game.text_channel)
     if game.deck._waiting_to_resolve:
-        card_images = get_card_images(game.deck._waiting_to_resolve)
-        await game_channel.send(f"The resolution stack is: {format_card_list(game.deck._waiting_to_resolve)}", files=card_images)
+        card_images = await get_card_attachments(game.deck._waiting_to_resolve)
+        await ATTACHMENT_REGISTRY.send(game_channel, f"The resolution stack is: {format_card_list(game.deck._waiting_to_resolve)}", files=card_images)
     else:
         await game_channel.send(f"The resolution stack is empty!")    
 
@@ -860,17 +646,7 @@ async def resolvetop(ctx: Context, *card_words):
         await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
         return
 
-    card_name = ' '.join(card_words)
-
-    try:
-        actual_card_name = game.deck.resolve(card_name, resolve_to_top=True)
-    except ValueError:
-        await ctx.send(f"{card_name} is not in the resolution stack")
-    
-    save_game_state(RUNNING_GAMES)
-    
-    game_channel = ctx.guild.get_channel(game.text_channel)
-    await game_channel.send(f"Resolved a copy of {actual_card_name}. The resolution stack is now: {game.deck._waiting_to_resolve}")
+    await apply_game_action(ctx, game, engine.resolve_to_top, ' '.join(card_words))
 
 
 @bot.command()
@@ -886,14 +662,7 @@ async def pull(ctx: Context, *card_words):
         await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
         return
 
-    card_name = ' '.join(card_words)
-    actual_card_name = game.graveyard.pull_card_by_name(card_name)
-    game.deck.add_card_to_hand(ctx.author.id, actual_card_name)
-    save_game_state(RUNNING_GAMES)
-
-    
-    game_channel = ctx.guild.get_channel(game.text_channel)
-    await game_channel.send(f"{ctx.author.mention} pulled {actual_card_name} from the grave")
+    await apply_game_action(ctx, game, engine.pull, to_member_info(ctx.author), ' '.join(card_words))
 
 
 @bot.command()
@@ -903,23 +672,11 @@ async def exilegrave(ctx: Context, *card_indexes):
         await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
         return
 
-    card_index_list = [int(card_index) for card_index in card_indexes]
-
-    out_of_bounds_indexes = [i for i in card_index_list if i > len(game.graveyard) or i < 1]
-    if any(out_of_bounds_indexes):
-        await ctx.send(f"That `!exilegrave` command was invalid, because some indexes were out of bounds. An index for the graveyard should be no less than 1 and no more than the size of the graveyard ({len(graveyard)}). The offending indexes were: {', '.join(out_of_bounds_indexes)}")
+    if not all(card_index.isdigit() for card_index in card_indexes):
+        await ctx.send("Must provide the numbers of the graveyard cards to exile to use the !exilegrave command")
         return
 
-    cards_exiled = []
-
-    for card_index in card_index_list:
-        card_name = game.graveyard.pull_card_by_index(card_index - 1)
-        game.exile.append(card_name)
-        cards_exiled.append(card_name)
-
-    game_channel = ctx.guild.get_channel(game.text_channel)
-    cards_str = '\n'.join(cards_exiled)
-    await game_channel.send(f"{ctx.author.mention} exiled these cards from the graveyard:\n```\n{cards_str}\n```")
+    await apply_game_action(ctx, game, engine.exile_from_graveyard, to_member_info(ctx.author), [int(card_index) for card_index in card_indexes])
 
 
 @bot.command()
@@ -933,21 +690,7 @@ async def exilegraverandom(ctx: Context, num_cards_to_exile):
         await ctx.send("Must provide a number of cards to exile to use the !exilegraverandom command")
         return
 
-    if num_cards_to_exile > len(game.graveyard):
-        await ctx.send(f"You tried to exile {num_cards_to_exile} from the graveyard, but there are only {len(game.graveyard)} cards there. You cannot exile more cards from the grave than exist.") 
-        return
-
-    card_index_list = random.choices(range(len(game.graveyard)), k=int(num_cards_to_exile))
-
-    cards_exiled = []
-
-    for card_index in card_index_list:
-        card_name = game.graveyard.pull_card_by_index(card_index)
-        game.exile.append(card_name)
-        cards_exiled.append(card_name)
-
-    game_channel = ctx.guild.get_channel(game.text_channel)
-    await game_channel.send(f"{ctx.author.mention} exiled these cards from the graveyard: {format_card_list(cards_exiled)}")
+    await apply_game_action(ctx, game, engine.exile_random_from_graveyard, to_member_info(ctx.author), parse_num_cards(num_cards_to_exile, 'exilegraverandom'))
 
 
 @bot.command()
@@ -955,36 +698,42 @@ async def hand(ctx: Context, show_to: str=None):
     """
     Get a view of your current Deck of Death hand, or show it to someone else.
 
-    If no argument is provided, the hand is sent in a DM to you. If you want to show someone else, give their name as an argument.
+    If no argument is provided, the hand is sent in a DM to you (or only shown to you, for /hand). If you want to show someone else, give their name as an argument.
     """
     game = find_game_by_member_id(ctx.author.id)
     if not game:
         await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
         return
     
-    recipient = ctx.author
+    recipient = get_private_destination(ctx)
+    shown_to_author = True
     if show_to:
         if not message_is_in_game_channel(ctx, game):
             await ctx.send(f"To show someone else your hand, you must post the `!hand <member>` command from the channel of the game")
             return
-        enriched_members = [ctx.guild.get_member(m.id) for m in game.members]
-        found_members = [m for m in enriched_members if m.name.lower() == show_to.lower() or m.display_name.lower() == show_to.lower()]
+        # the game stores its players' names, so only the player being shown the hand needs looking up
+        found_members = [m for m in game.members if show_to.lower() in [m.name.lower(), (m.username or '').lower()]]
+        if not found_members:
+            # they might have changed their name since the game started
+            cached_member = MEMBER_CACHE.get(ctx.guild.id, show_to)
+            found_members = [m for m in game.members if cached_member and m.id == cached_member.id]
         if not found_members:
             await ctx.send(f"I couldn't find {show_to} to show the hand to")
             return
-        else:
-            recipient = found_members[0]
+        elif found_members[0].id != ctx.author.id:
+            recipient = await PLAYER_CACHE.fetch(ctx.guild, found_members[0].id)
+            shown_to_author = False
 
     hand = game.deck.get_hand(member_id=ctx.author.id)
     if hand:
-        card_images = get_card_images(hand)        
+        card_images = await get_card_attachments(hand)
 
-        if recipient.id == ctx.author.id:
-            await recipient.send(f"The cards in your hand are:\n{format_card_list(hand)}", files=card_images)
+        if shown_to_author:
+            await ATTACHMENT_REGISTRY.send(recipient, f"The cards in your hand are:\n{format_card_list(hand)}", files=card_images)
         else:
-            await recipient.send(f"The cards in {ctx.author.display_name}'s hand are:\n{format_card_list(hand)}", files=card_images)
+            await ATTACHMENT_REGISTRY.send(recipient, f"The cards in {ctx.author.display_name}'s hand are:\n{format_card_list(hand)}", files=card_images)
     else:
-        if recipient.id == ctx.author.id:
+        if shown_to_author:
             await recipient.send(f"Your hand is empty!")
         else:
             await recipient.send(f"{ctx.author.display_name}'s hand is empty!")
@@ -1006,7 +755,8 @@ async def graveyard(ctx: Context):
         content += "```\n"
         content += "\n".join(game.graveyard.cards)
         content += "\n```"
-        await ctx.send(content)
+        for message in split_message(content):
+            await ctx.send(message)
     else:
         await ctx.send("The graveyard for the Deck of Death is empty")
 
@@ -1026,7 +776,8 @@ async def exile(ctx: Context):
         content += "```\n"
         content += "\n".join(game.exile)
         content += "\n```"
-        await ctx.send(content)
+        for message in split_message(content):
+            await ctx.send(message)
     else:
         await ctx.send("The exile pile for the Deck of Death is empty")
 
@@ -1045,7 +796,8 @@ async def recur(ctx: Context):
         content += "```\n"
         content += "\n".join(recurrable_cards)
         content += "\n```"
-        await ctx.send(content)
+        for message in split_message(content):
+            await ctx.send(message)
     else:
         await ctx.send("There are no recurrable cards in the graveyard")
         
@@ -1074,7 +826,7 @@ async def card(ctx: Context, *card_words):
     card_image: disnake.File = None
     try:
         card_name = ' '.join(card_words)
-        card_image = disnake.File(get_image_file_location(card_name))
+        card_image = get_card_image(card_name)
     except ImageNotFoundError:
         await ctx.send(f"Sorry, I couldn't find an image for {card_name}")
         return
@@ -1082,7 +834,7 @@ async def card(ctx: Context, *card_words):
         await ctx.send(f"Sorry, I ran into an unexpected error while loading the image for {card_name}")
         return
 
-    await ctx.send(file=card_image)
+    await ATTACHMENT_REGISTRY.send(ctx, file=card_image)
 
 
 @bot.command()
@@ -1096,6 +848,122 @@ async def rules(ctx: Context):
     await ctx.send("These still need to be defined :)")
 
 
+# actions which can be chained together with !do, mapped to their engine function and the kind of argument they take
+BATCH_ACTIONS: dict[str, tuple[Callable[..., list[Event]], Optional[str]]] = {
+    'draw': (engine.draw, 'number'),
+    'mill': (engine.mill, 'number'),
+    'peek': (engine.peek, 'number'),
+    'scry': (engine.scry, 'number'),
+    'fix': (engine.fix, 'number'),
+    'play': (engine.play, 'card'),
+    'discard': (engine.discard, 'card'),
+    'buyback': (engine.buyback, 'card'),
+    'flashback': (engine.flashback, 'card'),
+    'resolve': (lambda game, member, card_name, num_cards: engine.resolve(game, card_name, num_cards), 'resolve'),
+    'resolveall': (lambda game, member, card_name: engine.resolve_all(game, card_name), 'words'),
+    'shuffle': (engine.shuffle, None),
+}
+BATCH_ACTION_ALIASES = {
+    'd': 'draw',
+    'p': 'play',
+    'dis': 'discard',
+    'r': 'resolve',
+}
+
+
+def parse_batch_action(action: str) -> Callable[[OneWithDeathGame, Union[User, Member]], list[Event]]:
+    """
+    Parses a single action of a !do command, e.g. "draw 2" or "play Think Twice", into a function which applies it to a game
+    """
+    words = action.split()
+    if not words:
+        raise InvalidCommandError("One of the actions given was empty")
+
+    action_name = words[0].lstrip('!').lower()
+    action_name = BATCH_ACTION_ALIASES.get(action_name, action_name)
+    args = words[1:]
+
+    if action_name not in BATCH_ACTIONS:
+        raise InvalidCommandError(f"`{action}` can't be used with `!do`. The actions which can be chained are: {', '.join(BATCH_ACTIONS)}")
+
+    engine_action, arg_kind = BATCH_ACTIONS[action_name]
+
+    if arg_kind == 'number':
+        if len(args) > 1 or (args and not args[0].isdigit()):
+            raise InvalidCommandError(f"`{action}` should be given a single number of cards")
+        num_cards = int(args[0]) if args else 1
+        check_num_cards(num_cards, action_name)
+        return lambda game, member: engine_action(game, member, num_cards)
+    elif arg_kind == 'card':
+        if not args:
+            raise InvalidCommandError(f"`{action}` is missing the name of the card")
+        card_name = ' '.join(args)
+        return lambda game, member: engine_action(game, member, card_name)
+    elif arg_kind == 'resolve':
+        card_name, num_cards = parse_resolve_args(tuple(args))
+        return lambda game, member: engine_action(game, member, card_name, num_cards)
+    elif arg_kind == 'words':
+        card_name = ' '.join(args)
+        return lambda game, member: engine_action(game, member, card_name)
+    else:
+        if args:
+            raise InvalidCommandError(f"`{action}` doesn't take any arguments")
+        return lambda game, member: engine_action(game, member)
+
+
+@bot.command()
+async def do(ctx: Context, *action_words):
+    """
+    Run several actions as one command, separated by semicolons (;).
+
+    Every action is checked before any of them are applied. If one of them fails, none of them are applied.
+    You get one DM and the game channel gets one message for the whole batch.
+    An action waiting on a follow-up (!scry or !fix) can only be the last one.
+
+    Examples:
+    !do draw 2; play Think Twice; flashback Think Twice; scry 2
+    """
+    game = find_game_by_member_id(ctx.author.id)
+    if not game:
+        await ctx.send(f"Sorry, I couldn't find any games that {ctx.author.mention} is currently playing in")
+        return
+
+    if not message_is_in_game_channel(ctx, game):
+        await send_game_channel_warning_message(ctx, game)
+        return
+
+    actions = [action.strip() for action in ' '.join(action_words).split(LIST_DELIMITER) if action.strip()]
+    if not actions:
+        await ctx.send(f"You must provide a list of actions separated by `{LIST_DELIMITER}`, e.g. `!do draw 2; play Think Twice`")
+        return
+    if len(actions) > MAX_BATCH_ACTIONS:
+        await ctx.send(f"`!do` can only chain up to {MAX_BATCH_ACTIONS} actions at a time")
+        return
+
+    try:
+        parsed_actions = [parse_batch_action(action) for action in actions]
+    except InvalidCommandError as e:
+        await ctx.send(str(e))
+        return
+
+    follow_up_actions = [action for action in actions[:-1] if action.split()[0].lstrip('!').lower() in ['scry', 'fix']]
+    if follow_up_actions:
+        await ctx.send(f"`{follow_up_actions[0]}` needs a follow-up `!order`, so it can only be the last action")
+        return
+
+    member = to_member_info(ctx.author)
+
+    async def apply_all():
+        async with GameTransaction(ctx, RUNNING_GAMES, game) as tx:
+            for action, apply_action in zip(actions, parsed_actions):
+                try:
+                    send_events(tx, game, apply_action(game, member))
+                except InvalidCommandError as e:
+                    raise InvalidCommandError(f"`{action}` failed, so none of the actions were applied: {e}")
+
+    await run_game_command(ctx, game, apply_all)
+
+
 # Extra aliases
 @bot.command()
 async def d(ctx: Context, num_cards: str="1"):
@@ -1127,8 +995,183 @@ async def r(ctx: Context, *card_words):
     await resolve(ctx, *card_words)
 
 
+def admit_author(author_id: int) -> Optional[str]:
+    """
+    Lets in or turns away a command, prefix or slash, taking a token from its author and, if they're playing, from their game.
+    Returns None if the command was let in, otherwise the reply for it
+    """
+    game = find_game_by_member_id(author_id)
+    return ADMISSION_CONTROLLER.admit(author_id, game.id if game else None)
+
+
+async def run_slash_command(inter: ApplicationCommandInteraction, command: commands.Command, *args):
+    """
+    Runs a prefix command for a slash command, with its replies sent as ephemeral follow-ups to the interaction
+    """
+    rejection_reply = admit_author(inter.author.id)
+    if rejection_reply is not None:
+        # every interaction needs a response, so this one gets the reply even if the player was already told
+        await inter.response.send_message(rejection_reply, ephemeral=True)
+        return
+
+    ctx = InteractionContext(inter)
+    await ctx.defer()
+    try:
+        await command(ctx, *args)
+    except InvalidCommandError as e:
+        await ctx.send(str(e))
+    except Exception as e:
+        print_exception(
+            type(e), e, e.__traceback__, file=sys.stderr
+        )
+        print(f"Author: {ctx.author.name}, Command: /{ctx.command}, Error: {e}")
+        await ctx.send("Sorry, I ran into an unexpected error running that command")
+    await ctx.finish()
+
+
+@bot.slash_command(name="draw")
+async def slash_draw(inter: ApplicationCommandInteraction, num_cards: int=1):
+    """
+    Draw cards from the Deck of Death, shown only to you
+
+    Parameters
+    ----------
+    num_cards: How many cards to draw
+    """
+    await run_slash_command(inter, draw, str(num_cards))
+
+
+@bot.slash_command(name="play")
+async def slash_play(inter: ApplicationCommandInteraction, card: str):
+    """
+    Play a card from your hand, sending it to the graveyard
+
+    Parameters
+    ----------
+    card: The name of the card to play
+    """
+    await run_slash_command(inter, play, *card.split())
+
+
+@bot.slash_command(name="hand")
+async def slash_hand(inter: ApplicationCommandInteraction, show_to: Optional[str]=None):
+    """
+    See your Deck of Death hand, or show it to another player
+
+    Parameters
+    ----------
+    show_to: The name of the player to show your hand to, if not yourself
+    """
+    await run_slash_command(inter, hand, show_to)
+
+
+@bot.slash_command(name="scry")
+async def slash_scry(inter: ApplicationCommandInteraction, num_cards: int):
+    """
+    Look at the top cards of the Deck of Death, then put them back on top or bottom with /order
+
+    Parameters
+    ----------
+    num_cards: How many cards to scry
+    """
+    await run_slash_command(inter, scry, str(num_cards))
+
+
+@bot.slash_command(name="order")
+async def slash_order(inter: ApplicationCommandInteraction, new_order: str=""):
+    """
+    Re-order the cards you just scried or fixed, e.g. "top 1 2 bottom 3"
+
+    Parameters
+    ----------
+    new_order: The card numbers in their new order, e.g. "top 1 2 bottom 3" for a scry or "3 1 2" for a fix
+    """
+    await run_slash_command(inter, order, *new_order.split())
+
+
+@bot.slash_command(name="deck")
+async def slash_deck(inter: ApplicationCommandInteraction):
+    """
+    Get basic stats about the Deck of Death
+    """
+    await run_slash_command(inter, deck)
+
+
+@bot.event
+async def on_ready():
+    LOOP_LAG_MONITOR.start()
+    STATS_LOGGER.start()
+
+    # read once up front, so starting a game or playing a card never waits on the disk for them
+    await run_disk_io(get_decklist, DECKLIST_FILE)
+    await run_disk_io(read_card_lists)
+
+    # bundled images are already served from memory, so only the rest need warming
+    IMAGE_CACHE.start_warmup([image_file_location for image_file_location in get_decklist_image_file_locations() if not is_bundled(image_file_location)])
+
+    for guild in bot.guilds:
+        CHANNEL_POOL.adopt(guild)
+        CHANNEL_POOL.refill_in_background(guild)
+
+    if ASSET_CHANNEL_ID:
+        ATTACHMENT_REGISTRY.asset_channel = bot.get_channel(ASSET_CHANNEL_ID)
+        await ATTACHMENT_REGISTRY.upload_missing(get_all_image_file_locations())
+
+
+@bot.event
+async def on_guild_join(guild: disnake.Guild):
+    CHANNEL_POOL.refill_in_background(guild)
+
+
+@bot.event
+async def on_member_update(before: Member, after: Member):
+    if before.name != after.name or before.display_name != after.display_name:
+        MEMBER_CACHE.forget(after.guild.id, after.id)
+
+
+@bot.event
+async def on_raw_member_update(member: Member):
+    # with a lean gateway, members aren't cached so on_member_update never fires for them
+    if LEAN_GATEWAY:
+        MEMBER_CACHE.forget(member.guild.id, member.id)
+    PLAYER_CACHE.update(member)
+
+
+@bot.event
+async def on_raw_member_remove(payload: disnake.RawGuildMemberRemoveEvent):
+    MEMBER_CACHE.forget(payload.guild_id, payload.user.id)
+    PLAYER_CACHE.forget(payload.guild_id, payload.user.id)
+
+
+@bot.event
+async def on_user_update(before: User, after: User):
+    if before.name != after.name or before.display_name != after.display_name:
+        MEMBER_CACHE.forget_user(after)
+
+
+@bot.check
+async def admit_command(ctx: Context) -> bool:
+    """
+    Turns away commands from players or games sending them faster than the admission controller lets in,
+    before anything is done for them
+    """
+    rejection_reply = admit_author(ctx.author.id)
+    if rejection_reply is None:
+        return True
+    if ADMISSION_CONTROLLER.should_reply(ctx.author.id):
+        await ctx.send(rejection_reply)
+    raise CommandRejectedError()
+
+
 @bot.event
 async def on_command_error(ctx: Context, e: commands.errors.CommandError):
+    if isinstance(e, CommandRejectedError):
+        return
+
+    if isinstance(e, commands.errors.CommandInvokeError) and isinstance(e.original, InvalidCommandError):
+        await ctx.send(str(e.original))
+        return
+
     print_exception(
         type(e), e, e.__traceback__, file=sys.stderr
     )
@@ -1137,12 +1180,87 @@ async def on_command_error(ctx: Context, e: commands.errors.CommandError):
     if isinstance(e, commands.errors.MissingRequiredArgument):
         await ctx.send(f"Looks like there are missing arguments from that command. You can use `!help {ctx.command}` to get instructions and examples of how to use the command.\n\nThe error I got for this was: `{e}`")
 
-def main():
+
+def get_worker_command(shard_ids: list[int], shard_count: int) -> list[str]:
+    return [sys.executable, os.path.abspath(__file__), '--shard-ids', *map(str, shard_ids), '--shard-count', str(shard_count)]
+
+
+async def prepare_shards() -> int:
+    """
+    Moves any games saved before their server was stored into their server's file, so whichever worker process ends up with
+    that server has them, and works out how many shards to run.
+
+    Only logs in to Discord if there are games to move or the shard count isn't set
+    """
+    needs_migration = has_unmigrated_games()
+    if SHARD_COUNT and not needs_migration:
+        return SHARD_COUNT
+
+    client = disnake.Client(intents=disnake.Intents.none())
+    await client.login(TOKEN)
+    try:
+        if needs_migration:
+            await migrate_game_state(client)
+        return SHARD_COUNT or await get_recommended_shard_count(client)
+    finally:
+        await client.close()
+
+
+def run_worker(shard_ids: Optional[list[int]], shard_count: Optional[int]):
+    """
+    Runs the bot for some of its shards (or all of them), with only the games of the servers on those shards
+    """
     global RUNNING_GAMES
-    RUNNING_GAMES = load_game_state()
+    RUNNING_GAMES = load_game_state(shard_ids, shard_count)
+
+    # check all the card images up front, rather than finding out about a missing one when someone draws it
+    for problem in find_asset_problems(get_asset_manifest()):
+        print(f"Card asset problem: {problem}")
+    if shard_ids is None:
+        use_image_derivatives(build_image_derivatives())
+    else:
+        # the supervisor built them before starting any workers, and workers building them too would race each other
+        use_image_derivatives(get_image_derivatives())
+        ATTACHMENT_REGISTRY.use_worker_file(f"shards-{shard_ids[0]}-{shard_ids[-1]}")
+    use_asset_bundle(load_asset_bundle(IMAGE_QUALITY))
+
+    bot.shard_ids = shard_ids
+    bot.shard_count = shard_count
+    if shard_count is None:
+        print("Running bot with as many shards as Discord recommends...")
+    elif shard_ids is None:
+        print(f"Running bot with {shard_count} shard{'s' if shard_count > 1 else ''}...")
+    else:
+        print(f"Running bot for shards {shard_ids[0]}-{shard_ids[-1]} of {shard_count}...")
+    try:
+        bot.run(TOKEN)
+    finally:
+        shutdown_executors()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the One with Death bot")
+    parser.add_argument("--shard-ids", type=int, nargs="+", help="Only run these shards, as one of several worker processes")
+    parser.add_argument("--shard-count", type=int, help="How many shards there are across every worker process")
+    args = parser.parse_args()
 
-    print("Running bot...")
-    bot.run(TOKEN)
+    if args.shard_ids is not None:
+        run_worker(args.shard_ids, args.shard_count)
+        return
+
+    if WORKER_PROCESSES <= 1:
+        # the one process loads every server's games wherever they were saved, and disnake works out the shard count itself
+        run_worker(None, SHARD_COUNT)
+        return
+
+    shard_count = bot.loop.run_until_complete(prepare_shards())
+    build_image_derivatives()
+    supervisor = ShardSupervisor(get_worker_command, shard_count, WORKER_PROCESSES)
+    print(f"Running bot with {shard_count} shards across {len(supervisor.shard_ranges)} worker processes...")
+    try:
+        bot.loop.run_until_complete(supervisor.run())
+    except KeyboardInterrupt:
+        bot.loop.run_until_complete(supervisor.stop())
 
 
 if __name__ == '__main__':
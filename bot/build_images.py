@@ -0,0 +1,32 @@
+"""
+Builds the scaled down card image derivatives ahead of time, so the bot doesn't have to at startup,
+then packs the images sent at that quality into a single bundle for the bot to memory-map.
+Only the "original" tier bundles the source images, since every other tier sends its derivatives instead.
+
+Usage:
+python bot/build_images.py [--quality preview]
+"""
+import argparse
+
+from constants import IMAGE_QUALITY, IMAGE_QUALITY_TIERS
+from lib.asset_bundle import build_asset_bundle, get_bundle_location
+from lib.asset_manifest import get_asset_manifest
+from lib.image_derivatives import build_image_derivatives
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the card image derivatives uploaded to Discord")
+    parser.add_argument("--quality", choices=list(IMAGE_QUALITY_TIERS), default=IMAGE_QUALITY)
+    args = parser.parse_args()
+
+    derivatives = build_image_derivatives(args.quality)
+
+    if derivatives:
+        file_paths = list(derivatives.values())
+    else:
+        file_paths = [asset.path for asset in get_asset_manifest().values()]
+    build_asset_bundle(file_paths, get_bundle_location(args.quality))
+
+
+if __name__ == '__main__':
+    main()
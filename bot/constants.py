@@ -7,15 +7,107 @@ def _get_filepath_relative_to_this_file(rel_filepath: str) -> str:
 
 DECKLIST_FILE = _get_filepath_relative_to_this_file("../resources/decklist.txt")
 GAME_STATE_FILE = _get_filepath_relative_to_this_file("../state/game_state.json")
+GAME_STATE_FOLDER = _get_filepath_relative_to_this_file("../state/games/")
+ATTACHMENT_URLS_FILE = _get_filepath_relative_to_this_file("../state/attachment_urls.json")
 RESOURCES_FOLDER = _get_filepath_relative_to_this_file("../resources/")
 CARD_IMAGES_FOLDER = os.path.join(RESOURCES_FOLDER, 'card_images')
+CARD_IMAGE_CACHE_FOLDER = _get_filepath_relative_to_this_file("../cache/card_images/")
 
 CARD_LIST_FILE_TEMPLATE = os.path.join(RESOURCES_FOLDER, '{category}_cards.txt')
 
 GAME_TIMEOUT = timedelta(weeks=1)
 
+# how many hidden channel pairs each server keeps ready for new games. 0 creates and deletes them with every game
+CHANNEL_POOL_SIZE = 2
+
+# whether only the players of running games are cached, rather than every member of every server
+LEAN_GATEWAY = True
+
+# how long a member found by name is remembered, unless the gateway says they changed their name or left first
+MEMBER_CACHE_TTL = timedelta(hours=1)
+
+# how many worker processes the bot's shards are split between. 1 runs every shard in this process
+WORKER_PROCESSES = 1
+# how many shards the bot's servers are split between. None uses however many Discord recommends
+SHARD_COUNT = None
+# how long before a dead worker is restarted, doubling each time it dies soon after starting
+WORKER_RESTART_DELAY = timedelta(seconds=5)
+WORKER_MAX_RESTART_DELAY = timedelta(minutes=5)
+
 LIST_DELIMITER = ';'
 
 MAX_AUX_HAND_SIZE = 3
 
+# the most cards one command can take at once. commands asking for more are turned away
+MAX_COMMAND_CARDS = {
+    'draw': 15,
+    'mill': 20,
+    'peek': 10,
+    'scry': 10,
+    'fix': 10,
+    'exilegraverandom': 20,
+}
+# the most actions one !do can chain
+MAX_BATCH_ACTIONS = 10
+# how many commands each player can send in a burst, refilled evenly over the period
+USER_COMMAND_BURST = 8
+USER_COMMAND_PERIOD = timedelta(seconds=10)
+# the same for all the players of a game together
+GAME_COMMAND_BURST = 24
+GAME_COMMAND_PERIOD = timedelta(seconds=10)
+
+# Discord's limits on a single message
+MAX_MESSAGE_LENGTH = 2000
+MAX_MESSAGE_ATTACHMENTS = 10
+
+# whether a command's text goes out first, with its card images following in separate messages
+PROGRESSIVE_IMAGE_DELIVERY = True
+# how long a message with card images gets to send before it's given up on
+IMAGE_MESSAGE_TIMEOUT = timedelta(seconds=20)
+# whether a command's messages to the same channel or player are merged into as few as possible
+COALESCE_MESSAGES = True
+# how many messages the bot sends at once. each channel or player still gets theirs in order
+MAX_CONCURRENT_SENDS = 8
+# each channel's rate limit is left to disnake unless one is given here
+CHANNEL_RATE_LIMIT = None
+CHANNEL_RATE_LIMIT_PERIOD = timedelta(seconds=5)
+GLOBAL_RATE_LIMIT = 50
+GLOBAL_RATE_LIMIT_PERIOD = timedelta(seconds=1)
+
+# (max width, max height) and WebP quality of each tier of card images. "original" uploads the source PNGs untouched
+IMAGE_QUALITY_TIERS = {
+    'original': None,
+    'high': ((745, 1040), 90),
+    'preview': ((400, 560), 80),
+    'low': ((250, 350), 70),
+}
+IMAGE_QUALITY = 'preview'
+
+# how much memory the card images served from memory can take up
+IMAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# messages showing at least this many cards get one contact sheet image of them all instead of an image per card
+CONTACT_SHEET_MIN_CARDS = 2
+CONTACT_SHEET_COLUMNS = 5
+CONTACT_SHEET_CARD_SIZE = (200, 280)
+CONTACT_SHEET_QUALITY = 80
+CONTACT_SHEET_CACHE_SIZE = 128
+# more cards than this are split across several contact sheets
+CONTACT_SHEET_MAX_CARDS = 10
+
+# how many cards from the top of the deck get their images readied after each command
+PREFETCH_DEPTH = 10
+
+# how many threads blocking file I/O and image rendering run on
+DISK_IO_THREADS = 4
+# how long the event loop can be stalled before whatever is stalling it gets logged
+LOOP_LAG_THRESHOLD = timedelta(milliseconds=250)
+# how often the stats kept by the caches, queues and rate limiters are logged. None never logs them
+STATS_LOG_INTERVAL = timedelta(minutes=10)
+
+# private channel card images are uploaded to once for messages to link to. None uploads them with the first message instead
+ASSET_CHANNEL_ID = None
+# how long before a Discord attachment URL expires to stop using it and upload the image again
+ATTACHMENT_URL_EXPIRY_MARGIN = timedelta(hours=1)
+
 SERVER_USE_ONLY_COMMANDS = []
@@ -0,0 +1,388 @@
+"""
+The rules of a One with Death game, without any dependency on Discord.
+
+Every action takes the game to change and returns the events it produced. Invalid actions raise InvalidCommandError
+without having changed the game, except where noted, so a caller wanting all-or-nothing behaviour across several actions
+should snapshot the game first (see lib.transaction.GameTransaction).
+"""
+import random
+from typing import Optional
+
+from constants import DECKLIST_FILE, MAX_AUX_HAND_SIZE
+from errors import CardMissingBuybackError, CardMissingFlashbackError, CardNotFoundError, InvalidCommandError
+from engine.events import (
+    CardBoughtBack,
+    CardFlashbacked,
+    CardPlayed,
+    CardPulled,
+    CardsDiscarded,
+    CardsDrawn,
+    CardsExiled,
+    CardsMilled,
+    CardsPeeked,
+    CardsReordered,
+    CardsResolved,
+    DeckShuffled,
+    Event,
+    GameEnded,
+    HandExiledAndRedrawn,
+    HandLimitExceeded,
+    OneWithDeathDrawn,
+    RedrawAllTriggered,
+)
+from lib.deck import Deck
+from models import MemberInfo, OneWithDeathGame
+
+
+REORDER_SCRY = "reorder:scry"
+REORDER_REARRANGE = "reorder:rearrange"
+
+
+def start_game(
+    game_id: str,
+    members: list[MemberInfo],
+    text_channel: int,
+    voice_channel: int,
+    text_channel_name: Optional[str]=None,
+    voice_channel_name: Optional[str]=None,
+    guild_id: Optional[int]=None,
+    decklist_file: str=DECKLIST_FILE,
+    shuffle: bool=True,
+) -> OneWithDeathGame:
+    return OneWithDeathGame(
+        id=game_id,
+        members=members,
+        deck=Deck.from_file(decklist_file=decklist_file, member_ids=[member.id for member in members], shuffle=shuffle),
+        text_channel=text_channel,
+        voice_channel=voice_channel,
+        text_channel_name=text_channel_name,
+        voice_channel_name=voice_channel_name,
+        guild_id=guild_id,
+    )
+
+
+def end_game(games: list[OneWithDeathGame], game_id: str) -> list[Event]:
+    game_indexes = [i for i, g in enumerate(games) if g.id == game_id]
+    if not game_indexes:
+        raise InvalidCommandError(f"Game with id {game_id} was not found")
+
+    game = games.pop(game_indexes[0])
+    return [GameEnded(game_id=game.id, members=game.members)]
+
+
+def draw(game: OneWithDeathGame, member: MemberInfo, num_cards: int=1) -> list[Event]:
+    drawn_cards = game.deck.draw(member_id=member.id, num_cards=num_cards)
+    events: list[Event] = [CardsDrawn(member=member, cards=drawn_cards, num_requested=num_cards)]
+
+    num_drawn_owds = len([c for c in drawn_cards if c == 'One with Death'])
+    if num_drawn_owds:
+        events.append(OneWithDeathDrawn(member=member, count=num_drawn_owds))
+
+    hand = game.deck.get_hand(member.id)
+    if len(hand) > MAX_AUX_HAND_SIZE:
+        events.append(HandLimitExceeded(member=member, hand_size=len(hand), limit=MAX_AUX_HAND_SIZE))
+
+    return events
+
+
+def redraw_exile(game: OneWithDeathGame, member: MemberInfo) -> list[Event]:
+    """
+    Exiles a player's whole hand, then draws them the same number of cards
+    """
+    exiled_hand = game.deck.discard_hand(member.id)
+    game.exile_cards(*exiled_hand)
+
+    return [
+        *draw(game, member, len(exiled_hand)),
+        HandExiledAndRedrawn(member=member, num_cards=len(exiled_hand)),
+    ]
+
+
+def redraw_all(game: OneWithDeathGame, member: MemberInfo) -> list[Event]:
+    """
+    Shuffles every player's hand back into the deck, then re-draws each of them to their original hand size
+    """
+    member_num_cards: dict[int, int] = {}
+
+    for game_member in game.members:
+        discarded_cards = game.deck.discard_hand(game_member.id)
+        game.deck.add_to_deck(*discarded_cards)
+        member_num_cards[game_member.id] = len(discarded_cards)
+
+    game.deck.shuffle()
+
+    events = []
+    for game_member in game.members:
+        events.extend(draw(game, game_member, member_num_cards[game_member.id]))
+    events.append(RedrawAllTriggered(member=member))
+
+    return events
+
+
+def peek(game: OneWithDeathGame, member: MemberInfo, num_cards: int, follow_up_action: Optional[str]=None) -> list[Event]:
+    """
+    Looks at the top cards of the deck. With a follow-up action, the game then waits for that member to !order those cards.
+    """
+    if game.waiting_for_response_from:
+        raise InvalidCommandError(f"Currently waiting to resolve an action ({game.waiting_for_response_action}) from {game.waiting_for_response_from.name}, so no other actions can be taken")
+
+    peeked_cards = list(game.deck.peek(num_cards))
+
+    if follow_up_action:
+        game.waiting_for_response_from = member
+        game.waiting_for_response_action = follow_up_action
+        game.waiting_for_response_number = num_cards
+
+    return [CardsPeeked(member=member, cards=peeked_cards, num_requested=num_cards, follow_up_action=follow_up_action)]
+
+
+def scry(game: OneWithDeathGame, member: MemberInfo, num_cards: int) -> list[Event]:
+    return peek(game, member, num_cards, REORDER_SCRY)
+
+
+def fix(game: OneWithDeathGame, member: MemberInfo, num_cards: int) -> list[Event]:
+    return peek(game, member, num_cards, REORDER_REARRANGE)
+
+
+def order(game: OneWithDeathGame, member: MemberInfo, order_args: list[str]) -> list[Event]:
+    """
+    Re-orders the cards from the member's last !scry or !fix.
+
+    For a scry the arguments are card numbers grouped by "top"/"bottom" (e.g. top 1 2 bottom 3), for a fix they're just card numbers.
+    """
+    if not game.waiting_for_response_from:
+        raise InvalidCommandError("There's no scry or fix waiting to be re-ordered")
+
+    if game.waiting_for_response_from.id != member.id:
+        raise InvalidCommandError(f"I'm currently waiting to resolve an action ({game.waiting_for_response_action}) from player {game.waiting_for_response_from.name}, so no other actions can be taken")
+
+    if game.waiting_for_response_action not in [REORDER_SCRY, REORDER_REARRANGE]:
+        raise InvalidCommandError(f"I'm currently waiting to resolve a non-order action {game.waiting_for_response_action} from you, so an order is not valid")
+
+    # At this point, we know it's the right player making a valid action type
+    converted_new_card_indexes = []
+    for item in order_args:
+        if item.lower() == 'top' or item.lower() == 'bottom':
+            converted_new_card_indexes.append(item.lower())
+        else:
+            try:
+                converted_new_card_indexes.append(int(item))
+            except ValueError:
+                raise InvalidCommandError(f"It looks like I got an invalid argument: {item}. Only numbers and the words 'top' and 'bottom' are valid arguments for re-ordering.")
+
+    indexes_only = [i for i in converted_new_card_indexes if isinstance(i, int)]
+
+    expected_indexes = [i + 1 for i in range(len(indexes_only))]
+    if sorted(indexes_only) != expected_indexes:
+        raise InvalidCommandError(f"Invalid card indexes for rearrange re-ordering provided: {[i for i in indexes_only if i not in expected_indexes]}")
+
+    if game.waiting_for_response_action == REORDER_SCRY:
+        top_specifier_index = converted_new_card_indexes.index("top") if "top" in converted_new_card_indexes else -1
+        bottom_specifier_index = converted_new_card_indexes.index("bottom") if "bottom" in converted_new_card_indexes else -1
+
+        if top_specifier_index >= 0 and bottom_specifier_index >= 0:
+            # bottom and top both present, figure out which indexes go to which side
+            if top_specifier_index > bottom_specifier_index:
+                new_top_cards = indexes_only[top_specifier_index - 1:]
+                new_bottom_cards = indexes_only[:top_specifier_index - 1]
+            else:
+                new_top_cards = indexes_only[:bottom_specifier_index - 1]
+                new_bottom_cards = indexes_only[bottom_specifier_index - 1:]
+        elif top_specifier_index < 0 and bottom_specifier_index >= 0:
+            # only bottom
+            new_top_cards = []
+            new_bottom_cards = indexes_only
+        else:
+            # top only
+            # this is top only regardless of whether we have a top specifier
+            # because w/no specifier the default is also top only
+            new_top_cards = indexes_only
+            new_bottom_cards = []
+
+        top_cards = [game.deck.cards[i - 1] for i in new_top_cards]
+        bottom_cards = [game.deck.cards[i - 1] for i in new_bottom_cards]
+        game.deck.reorder_scry(new_top_cards, new_bottom_cards)
+    else:
+        top_cards = [game.deck.cards[i - 1] for i in indexes_only]
+        bottom_cards = []
+        game.deck.reorder_rearrange(indexes_only)
+
+    game.waiting_for_response_action = None
+    game.waiting_for_response_from = None
+    game.waiting_for_response_number = None
+
+    return [CardsReordered(member=member, top_cards=top_cards, bottom_cards=bottom_cards)]
+
+
+def play(game: OneWithDeathGame, member: MemberInfo, card_name: str) -> list[Event]:
+    try:
+        actual_card_name = game.deck.play(card_name, member_id=member.id)
+    except ValueError as e:
+        raise InvalidCommandError(str(e))
+
+    game.graveyard.insert(actual_card_name)
+
+    return [CardPlayed(member=member, card=actual_card_name)]
+
+
+def discard(game: OneWithDeathGame, member: MemberInfo, card_name: str) -> list[Event]:
+    try:
+        actual_card_name = game.deck.discard(card_name, member_id=member.id)
+    except ValueError as e:
+        raise InvalidCommandError(str(e))
+
+    game.graveyard.insert(actual_card_name)
+
+    return [CardsDiscarded(member=member, cards=[actual_card_name])]
+
+
+def discard_hand(game: OneWithDeathGame, member: MemberInfo) -> list[Event]:
+    discarded_cards = game.deck.discard_hand(member.id)
+    for card in discarded_cards:
+        game.graveyard.insert(card)
+
+    return [CardsDiscarded(member=member, cards=discarded_cards, whole_hand=True)]
+
+
+def buyback(game: OneWithDeathGame, member: MemberInfo, card_name: str) -> list[Event]:
+    if not game.deck.is_buyback_valid(card_name):
+        raise InvalidCommandError(f"You can't buy back a card that wasn't the card most recently played from the Deck of Death. \n\nThe most recently played card is: {game.deck._last_card_played}")
+
+    try:
+        actual_card = game.graveyard.buyback(card_name)
+    except CardNotFoundError:
+        raise InvalidCommandError(f"The card {card_name} was not found in the graveyard")
+    except CardMissingBuybackError:
+        raise InvalidCommandError(f"The card {card_name} does not have buyback")
+
+    game.deck.buyback(card=actual_card, member_id=member.id)
+
+    return [CardBoughtBack(member=member, card=actual_card)]
+
+
+def flashback(game: OneWithDeathGame, member: MemberInfo, card_name: str) -> list[Event]:
+    try:
+        actual_card_name = game.graveyard.flashback(card_name)
+    except CardNotFoundError:
+        raise InvalidCommandError(f"The card {card_name} was not found in the graveyard")
+    except CardMissingFlashbackError:
+        raise InvalidCommandError(f"The card {card_name} does not have flashback")
+
+    game.exile_cards(actual_card_name)
+
+    return [CardFlashbacked(member=member, card=actual_card_name)]
+
+
+def mill(game: OneWithDeathGame, member: MemberInfo, num_cards: int) -> list[Event]:
+    milled_cards, was_owd_milled = game.deck.mill(num_cards)
+    for milled_card in milled_cards:
+        game.graveyard.insert(milled_card)
+
+    return [CardsMilled(member=member, cards=milled_cards, num_requested=num_cards, one_with_death_milled=was_owd_milled)]
+
+
+def resolve(game: OneWithDeathGame, card_name: str='', num_cards: int=1) -> list[Event]:
+    """
+    Resolves cards from the resolution stack, sending anything other than One with Death to the graveyard
+    """
+    try:
+        resolved_cards = game.deck.resolve_many(card_name, num_cards=num_cards)
+    except ValueError:
+        raise InvalidCommandError(f"{card_name} is not in the resolution stack")
+
+    return _finish_resolving(game, resolved_cards, card_name=card_name, num_requested=num_cards)
+
+
+def resolve_all(game: OneWithDeathGame, card_name: str='') -> list[Event]:
+    """
+    Resolves every card on the resolution stack (or every copy of one card), with a single shuffle for all the One with Deaths
+    """
+    try:
+        resolved_cards = game.deck.resolve_many(card_name)
+    except ValueError:
+        raise InvalidCommandError(f"{card_name} is not in the resolution stack")
+
+    if not resolved_cards:
+        raise InvalidCommandError("The resolution stack is already empty!")
+
+    return _finish_resolving(game, resolved_cards, card_name=card_name)
+
+
+def resolve_to_top(game: OneWithDeathGame, card_name: str='') -> list[Event]:
+    """
+    Resolves a card from the resolution stack, putting a One with Death on top of the deck rather than shuffling it in
+    """
+    try:
+        resolved_cards = game.deck.resolve_many(card_name, num_cards=1, resolve_to_top=True)
+    except ValueError:
+        raise InvalidCommandError(f"{card_name} is not in the resolution stack")
+
+    if not resolved_cards:
+        raise InvalidCommandError("The resolution stack is empty!")
+
+    return _finish_resolving(game, resolved_cards, card_name=card_name, to_top=True)
+
+
+def _finish_resolving(game: OneWithDeathGame, resolved_cards: list[str], **event_fields) -> list[Event]:
+    for resolved_card in resolved_cards:
+        if resolved_card != "One with Death":
+            game.graveyard.insert(resolved_card)
+
+    return [CardsResolved(cards=resolved_cards, remaining=list(game.deck._waiting_to_resolve), **event_fields)]
+
+
+def shuffle(game: OneWithDeathGame, member: MemberInfo, shuffled_cards: Optional[list[str]]=None) -> list[Event]:
+    """
+    Shuffles the deck, or swaps in the given shuffled copy of it, e.g. one shuffled off the event loop
+    """
+    if shuffled_cards is None:
+        game.deck.shuffle()
+    else:
+        game.deck.cards[:] = shuffled_cards
+
+    return [DeckShuffled(member=member)]
+
+
+def pull(game: OneWithDeathGame, member: MemberInfo, card_name: str) -> list[Event]:
+    """
+    Pulls a card out of the graveyard into the member's hand
+    """
+    try:
+        actual_card_name = game.graveyard.pull_card_by_name(card_name)
+    except CardNotFoundError as e:
+        raise InvalidCommandError(str(e))
+
+    game.deck.add_card_to_hand(member.id, actual_card_name)
+
+    return [CardPulled(member=member, card=actual_card_name)]
+
+
+def exile_from_graveyard(game: OneWithDeathGame, member: MemberInfo, card_indexes: list[int]) -> list[Event]:
+    """
+    Exiles cards from the graveyard by their 1-based position in it
+    """
+    card_indexes = list(dict.fromkeys(card_indexes))
+
+    out_of_bounds_indexes = [i for i in card_indexes if i > len(game.graveyard) or i < 1]
+    if out_of_bounds_indexes:
+        raise InvalidCommandError(f"That `!exilegrave` command was invalid, because some indexes were out of bounds. An index for the graveyard should be no less than 1 and no more than the size of the graveyard ({len(game.graveyard)}). The offending indexes were: {', '.join(str(i) for i in out_of_bounds_indexes)}")
+
+    return _exile_graveyard_cards(game, member, [i - 1 for i in card_indexes])
+
+
+def exile_random_from_graveyard(game: OneWithDeathGame, member: MemberInfo, num_cards: int) -> list[Event]:
+    if num_cards > len(game.graveyard):
+        raise InvalidCommandError(f"You tried to exile {num_cards} from the graveyard, but there are only {len(game.graveyard)} cards there. You cannot exile more cards from the grave than exist.")
+
+    return _exile_graveyard_cards(game, member, random.sample(range(len(game.graveyard)), k=num_cards))
+
+
+def _exile_graveyard_cards(game: OneWithDeathGame, member: MemberInfo, card_indexes: list[int]) -> list[Event]:
+    cards_exiled = [game.graveyard.cards[card_index] for card_index in card_indexes]
+
+    # pull from the back of the graveyard first so the earlier indexes don't shift
+    for card_index in sorted(card_indexes, reverse=True):
+        game.graveyard.pull_card_by_index(card_index)
+    game.exile_cards(*cards_exiled)
+
+    return [CardsExiled(member=member, cards=cards_exiled)]
@@ -0,0 +1,128 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+from models import MemberInfo
+
+
+@dataclass
+class Event:
+    """
+    Something that happened in a game as the result of an engine action.
+
+    Events only describe the change; it's up to whoever is driving the engine (e.g. the Discord bot) to decide
+    who gets told about it and how.
+    """
+    pass
+
+
+@dataclass
+class CardsDrawn(Event):
+    member: MemberInfo
+    cards: list[str]
+    num_requested: int
+
+
+@dataclass
+class OneWithDeathDrawn(Event):
+    member: MemberInfo
+    count: int
+
+
+@dataclass
+class HandLimitExceeded(Event):
+    member: MemberInfo
+    hand_size: int
+    limit: int
+
+
+@dataclass
+class CardsPeeked(Event):
+    member: MemberInfo
+    cards: list[str]
+    num_requested: int
+    # the kind of !order expected next, if any
+    follow_up_action: Optional[str] = None
+
+
+@dataclass
+class CardsReordered(Event):
+    member: MemberInfo
+    top_cards: list[str] = field(default_factory=lambda: [])
+    bottom_cards: list[str] = field(default_factory=lambda: [])
+
+
+@dataclass
+class CardPlayed(Event):
+    member: MemberInfo
+    card: str
+
+
+@dataclass
+class CardsDiscarded(Event):
+    member: MemberInfo
+    cards: list[str]
+    # whether the whole hand was discarded, rather than a specific card
+    whole_hand: bool = False
+
+
+@dataclass
+class CardBoughtBack(Event):
+    member: MemberInfo
+    card: str
+
+
+@dataclass
+class CardFlashbacked(Event):
+    member: MemberInfo
+    card: str
+
+
+@dataclass
+class CardsMilled(Event):
+    member: MemberInfo
+    cards: list[str]
+    num_requested: int
+    one_with_death_milled: bool
+
+
+@dataclass
+class CardsResolved(Event):
+    cards: list[str]
+    remaining: list[str]
+    card_name: str = ''
+    num_requested: Optional[int] = None
+    to_top: bool = False
+
+
+@dataclass
+class DeckShuffled(Event):
+    member: MemberInfo
+
+
+@dataclass
+class CardPulled(Event):
+    member: MemberInfo
+    card: str
+
+
+@dataclass
+class CardsExiled(Event):
+    member: MemberInfo
+    cards: list[str]
+
+
+@dataclass
+class HandExiledAndRedrawn(Event):
+    member: MemberInfo
+    num_cards: int
+
+
+@dataclass
+class RedrawAllTriggered(Event):
+    member: MemberInfo
+
+
+@dataclass
+class GameEnded(Event):
+    game_id: str
+    members: list[MemberInfo]
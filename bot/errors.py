@@ -12,3 +12,6 @@ class InvalidBuybackError(Exception):
 
 class ImageNotFoundError(Exception):
     pass
+
+class InvalidCommandError(Exception):
+    pass
@@ -0,0 +1,128 @@
+import time
+from datetime import timedelta
+from typing import Optional
+
+from disnake.ext import commands
+
+from constants import GAME_COMMAND_BURST, GAME_COMMAND_PERIOD, MAX_COMMAND_CARDS, USER_COMMAND_BURST, USER_COMMAND_PERIOD
+from errors import InvalidCommandError
+from lib.send_scheduler import TokenBucket
+
+
+# built once, since a rejected command shouldn't cost anything more than sending one of these
+USER_REJECTION_REPLY = "You're sending commands faster than I can keep up with, so I skipped that one. Give it a few seconds, then try again"
+GAME_REJECTION_REPLY = "Your game is sending commands faster than I can keep up with, so I skipped that one. Give it a few seconds, then try again"
+
+# how many commands are checked between each sweep for buckets which have filled back up
+PRUNE_INTERVAL = 1000
+
+
+class CommandRejectedError(commands.CheckFailure):
+    """
+    Raised for a command turned away by admission control, which has already been replied to if it needed to be
+    """
+    pass
+
+
+class AdmissionController:
+    """
+    Decides whether a command runs at all, before any work is done for it.
+
+    Every player and every game has a token bucket of commands. A command takes a token from its author's bucket and,
+    if they're playing, from their game's bucket too, so a player spamming !hand runs out of commands long before the rest
+    of their game does, and a game can't crowd out every other game.
+
+    A turned away command costs one short, prebuilt reply, sent only the first time a player is turned away
+    until they're let in again, so carrying on spamming costs nothing at all.
+    """
+    def __init__(
+        self,
+        user_burst: int=USER_COMMAND_BURST,
+        user_period: timedelta=USER_COMMAND_PERIOD,
+        game_burst: int=GAME_COMMAND_BURST,
+        game_period: timedelta=GAME_COMMAND_PERIOD,
+    ):
+        self.user_burst = user_burst
+        self.user_period = user_period.total_seconds()
+        self.game_burst = game_burst
+        self.game_period = game_period.total_seconds()
+        self.admitted = 0
+        self.rejected_by_user = 0
+        self.rejected_by_game = 0
+        self.num_replies = 0
+        self._num_checked = 0
+        self._user_buckets: dict[int, TokenBucket] = {}
+        self._game_buckets: dict[str, TokenBucket] = {}
+        # players who've been told they were turned away, and haven't been let in since
+        self._replied_to: set[int] = set()
+
+    def admit(self, user_id: int, game_id: Optional[str]=None) -> Optional[str]:
+        """
+        Lets a command in, taking its tokens, or turns it away. Returns None if the command was let in, otherwise the reply for it
+        """
+        now = time.monotonic()
+        self._num_checked += 1
+        if self._num_checked % PRUNE_INTERVAL == 0:
+            self.prune(now)
+
+        user_bucket = self._user_buckets.get(user_id)
+        if user_bucket is None:
+            user_bucket = self._user_buckets[user_id] = TokenBucket(self.user_burst, self.user_period)
+        game_bucket = None
+        if game_id is not None:
+            game_bucket = self._game_buckets.get(game_id)
+            if game_bucket is None:
+                game_bucket = self._game_buckets[game_id] = TokenBucket(self.game_burst, self.game_period)
+
+        if user_bucket.get_wait(now) > 0:
+            self.rejected_by_user += 1
+            return USER_REJECTION_REPLY
+        if game_bucket and game_bucket.get_wait(now) > 0:
+            self.rejected_by_game += 1
+            return GAME_REJECTION_REPLY
+
+        user_bucket.take(now)
+        if game_bucket:
+            game_bucket.take(now)
+        self._replied_to.discard(user_id)
+        self.admitted += 1
+        return None
+
+    def should_reply(self, user_id: int) -> bool:
+        """
+        Whether to reply to a player's turned away command, which is only the first time they're turned away in a row
+        """
+        if user_id in self._replied_to:
+            return False
+        self._replied_to.add(user_id)
+        self.num_replies += 1
+        return True
+
+    def prune(self, now: float):
+        """
+        Drops the buckets which have filled back up, since a new bucket for the same player or game would be no different
+        """
+        self._user_buckets = {user_id: bucket for user_id, bucket in self._user_buckets.items() if not bucket.is_full(now)}
+        self._game_buckets = {game_id: bucket for game_id, bucket in self._game_buckets.items() if not bucket.is_full(now)}
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            'admitted': self.admitted,
+            'rejected_by_user': self.rejected_by_user,
+            'rejected_by_game': self.rejected_by_game,
+            'replies': self.num_replies,
+            'user_buckets': len(self._user_buckets),
+            'game_buckets': len(self._game_buckets),
+        }
+
+
+def check_num_cards(num_cards: int, command_name: str):
+    """
+    Turns away a command asking for more cards than it's allowed to take at once
+    """
+    max_cards = MAX_COMMAND_CARDS.get(command_name)
+    if max_cards is not None and num_cards > max_cards:
+        raise InvalidCommandError(f"`!{command_name}` can only take up to {max_cards} cards at a time")
+
+
+ADMISSION_CONTROLLER = AdmissionController()
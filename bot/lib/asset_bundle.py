@@ -0,0 +1,129 @@
+import hashlib
+import io
+import json
+import mmap
+import os
+import struct
+from typing import Optional
+
+from constants import CARD_IMAGE_CACHE_FOLDER
+
+
+BUNDLE_MAGIC = b'OWDBUNDLE1'
+# magic, then the length of the JSON index which follows it
+BUNDLE_HEADER = struct.Struct(f'<{len(BUNDLE_MAGIC)}sQ')
+
+
+def get_bundle_location(quality: str, cache_folder: str=CARD_IMAGE_CACHE_FOLDER) -> str:
+    return os.path.join(cache_folder, f"{quality}.bundle")
+
+
+def build_asset_bundle(file_paths: list[str], bundle_path: str):
+    """
+    Packs files into a single bundle: a header, an index of where each file's bytes are, then the bytes of every file back to back.
+
+    Files are indexed by file name, along with the hash of their contents so a bundled file which has since changed can be caught.
+    """
+    index = {}
+    offset = 0
+    for file_path in file_paths:
+        with open(file_path, 'rb') as f:
+            file_bytes = f.read()
+        index[os.path.basename(file_path)] = [offset, len(file_bytes), hashlib.sha256(file_bytes).hexdigest()]
+        offset += len(file_bytes)
+
+    index_bytes = json.dumps(index).encode()
+
+    # write to a temporary file first so a running bot never maps a half-written bundle
+    temp_path = f"{bundle_path}.tmp"
+    os.makedirs(os.path.dirname(bundle_path), exist_ok=True)
+    with open(temp_path, 'wb') as bundle:
+        bundle.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, len(index_bytes)))
+        bundle.write(index_bytes)
+        for file_path in file_paths:
+            with open(file_path, 'rb') as f:
+                bundle.write(f.read())
+    os.replace(temp_path, bundle_path)
+
+    print(f"Bundled {len(file_paths)} files ({offset} bytes) into {bundle_path}")
+
+
+class MemoryviewReader(io.RawIOBase):
+    """
+    Read-only file object over a memoryview, so a bundled file can be uploaded straight out of the bundle without copying it first
+    """
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int=io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, min(offset, len(self._view)))
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        num_bytes = min(len(buffer), len(self._view) - self._position)
+        buffer[:num_bytes] = self._view[self._position:self._position + num_bytes]
+        self._position += num_bytes
+        return num_bytes
+
+
+class AssetBundle:
+    """
+    A bundle file, memory-mapped once and read-only.
+
+    The file descriptor is closed as soon as the bundle is mapped, and since the mapping is backed by the page cache,
+    every process serving the same bundle shares the same memory for it.
+    """
+    def __init__(self, bundle_path: str):
+        self.bundle_path = bundle_path
+        with open(bundle_path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+
+        magic, index_length = BUNDLE_HEADER.unpack_from(self._view)
+        if magic != BUNDLE_MAGIC:
+            raise ValueError(f"{bundle_path} is not an asset bundle")
+
+        index_start = BUNDLE_HEADER.size
+        self._data_start = index_start + index_length
+        self.index: dict[str, list] = json.loads(bytes(self._view[index_start:self._data_start]))
+
+    def __contains__(self, file_name: str) -> bool:
+        return file_name in self.index
+
+    def get(self, file_name: str) -> memoryview:
+        offset, length, _ = self.index[file_name]
+        start = self._data_start + offset
+        return self._view[start:start + length]
+
+    def open(self, file_name: str) -> MemoryviewReader:
+        return MemoryviewReader(self.get(file_name))
+
+    def get_hash(self, file_name: str) -> str:
+        return self.index[file_name][2]
+
+    def discard(self, file_name: str):
+        """
+        Stops serving a file from the bundle, e.g. because the file has changed since the bundle was built
+        """
+        self.index.pop(file_name, None)
+
+
+def load_asset_bundle(quality: str, cache_folder: str=CARD_IMAGE_CACHE_FOLDER) -> Optional[AssetBundle]:
+    bundle_path = get_bundle_location(quality, cache_folder)
+    if not os.path.exists(bundle_path):
+        return None
+    return AssetBundle(bundle_path)
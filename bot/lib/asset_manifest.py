@@ -0,0 +1,94 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from functools import cache
+
+from PIL import Image
+
+from constants import CARD_IMAGES_FOLDER, DECKLIST_FILE
+from lib.card_lists import get_card_list
+from lib.deck import read_decklist
+from lib.util import sanitize_card_name
+
+
+# cards the bot hands out which aren't part of the Deck of Death
+NON_DECK_CARDS = ["Nix", "Charon's Obol"]
+
+CARD_LIST_CATEGORIES = ["buyback", "flashback", "recur"]
+
+
+@dataclass(frozen=True)
+class CardAsset:
+    path: str
+    size: int
+    width: int
+    height: int
+    content_hash: str
+
+
+def get_file_hash(file_path: str) -> str:
+    file_hash = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def image_file_name_to_card_key(file_name: str) -> str:
+    """
+    Image files are named after the snake_case of the sanitized card name, so this undoes that to get the sanitized card name back
+    """
+    return os.path.splitext(file_name)[0].replace('_', ' ')
+
+
+@cache
+def get_asset_manifest(images_folder: str=CARD_IMAGES_FOLDER) -> dict[str, CardAsset]:
+    """
+    Gets every card image, keyed by the sanitized name of its card.
+
+    The folder is only scanned the first time, so looking up a card's image after that never touches the filesystem.
+    """
+    manifest = {}
+    for file_name in sorted(os.listdir(images_folder)):
+        if not file_name.endswith('.png'):
+            continue
+
+        path = os.path.join(images_folder, file_name)
+        with Image.open(path) as image:
+            # only the header is read to get the dimensions
+            width, height = image.size
+
+        manifest[image_file_name_to_card_key(file_name)] = CardAsset(
+            path=path,
+            size=os.path.getsize(path),
+            width=width,
+            height=height,
+            content_hash=get_file_hash(path),
+        )
+    return manifest
+
+
+def find_asset_problems(manifest: dict[str, CardAsset], decklist_file: str=DECKLIST_FILE) -> list[str]:
+    """
+    Checks the card images against every card the bot knows about: the decklist, the cards handed out outside of it,
+    and the buyback/flashback/recur card lists
+    """
+    problems = []
+    deck_cards = list(dict.fromkeys(read_decklist(decklist_file)))
+    deck_card_keys = {sanitize_card_name(card) for card in deck_cards}
+
+    for card in [*deck_cards, *NON_DECK_CARDS]:
+        if sanitize_card_name(card) not in manifest:
+            problems.append(f"No image for {card}")
+
+    for category in CARD_LIST_CATEGORIES:
+        for card in get_card_list(category):
+            if sanitize_card_name(card) not in deck_card_keys:
+                problems.append(f"{card} is in the {category} card list, but not in the decklist")
+
+    known_card_keys = deck_card_keys | {sanitize_card_name(card) for card in NON_DECK_CARDS}
+    for card_key, asset in manifest.items():
+        if card_key not in known_card_keys:
+            problems.append(f"Image {os.path.basename(asset.path)} doesn't belong to any card in the decklist")
+
+    return problems
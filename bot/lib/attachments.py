@@ -0,0 +1,208 @@
+import asyncio
+import glob
+import json
+import os
+import sys
+import time
+from traceback import print_exception
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+import disnake
+from disnake.abc import Messageable
+from disnake.message import Message
+
+from constants import ATTACHMENT_URL_EXPIRY_MARGIN, ATTACHMENT_URLS_FILE, MAX_MESSAGE_ATTACHMENTS
+from lib.executors import run_disk_io
+from lib.image_cache import load_image_files
+
+
+def get_url_expiry(url: str) -> Optional[float]:
+    """
+    Gets when a Discord CDN attachment URL expires, from its signed "ex" parameter (a hex unix timestamp).
+    URLs without one never expire.
+    """
+    expiry = parse_qs(urlparse(url).query).get('ex')
+    if not expiry:
+        return None
+    try:
+        return int(expiry[0], 16)
+    except ValueError:
+        return None
+
+
+def load_urls(urls_file: str) -> dict[str, str]:
+    """
+    Loads the URLs saved to the given file and to any worker process's file next to it, keeping whichever URL for a file expires last.
+    A file which can't be read is skipped, since every URL in it can be uploaded again
+    """
+    file_root, file_extension = os.path.splitext(urls_file)
+    urls: dict[str, str] = {}
+    for file_path in sorted(glob.glob(f"{glob.escape(file_root)}*{file_extension}")):
+        try:
+            with open(file_path, 'r') as f:
+                file_urls = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Failed to load attachment URLs from {file_path}, so its images will be uploaded again")
+            print_exception(
+                type(e), e, e.__traceback__, file=sys.stderr
+            )
+            continue
+
+        for filename, url in file_urls.items():
+            expiry = get_url_expiry(url)
+            current_expiry = get_url_expiry(urls[filename]) if filename in urls else 0
+            if expiry is None or (current_expiry is not None and expiry > current_expiry):
+                urls[filename] = url
+    return urls
+
+
+class AttachmentRegistry:
+    """
+    Remembers the Discord URL of every image file that has been uploaded, so the same bytes don't get uploaded again.
+
+    Files are keyed by their file name. Card image derivatives are named after the hash of their source image,
+    so a changed card image is never matched with the URL of its old upload.
+
+    If an asset channel is set, images which have never been uploaded or whose URL has gone stale are uploaded there,
+    so every send can reference them by URL. Without one, images get uploaded with the first message that uses them.
+    """
+    def __init__(self, urls_file: str=ATTACHMENT_URLS_FILE):
+        self.urls_file = urls_file
+        self.asset_channel: Optional[Messageable] = None
+        self.urls: dict[str, str] = {}
+        self._needs_save = False
+        self._save_task: Optional[asyncio.Task] = None
+
+        self.urls = load_urls(urls_file)
+
+    def use_worker_file(self, worker_name: str):
+        """
+        Saves this process's URLs to a file of its own next to the shared one, since worker processes saving to the same file
+        would overwrite each other's URLs. Every process still loads the URLs all of them have saved
+        """
+        file_root, file_extension = os.path.splitext(self.urls_file)
+        self.urls_file = f"{file_root}.{worker_name}{file_extension}"
+
+    def save(self, urls: Optional[dict[str, str]]=None):
+        os.makedirs(os.path.dirname(self.urls_file), exist_ok=True)
+
+        # write to a temporary file first so a crash mid-write can't leave a truncated file behind
+        temp_path = f"{self.urls_file}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.urls if urls is None else urls, f, indent=4)
+        os.replace(temp_path, self.urls_file)
+
+    def save_in_background(self):
+        """
+        Saves the URLs on the disk I/O threads. URLs recorded while a save is running are saved together once it's done,
+        so saves never overlap and the last one written always has every URL
+        """
+        self._needs_save = True
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._save_until_saved())
+
+    async def wait_for_save(self):
+        """
+        Waits until every URL recorded so far has been saved
+        """
+        if self._save_task:
+            await self._save_task
+
+    async def _save_until_saved(self):
+        while self._needs_save:
+            self._needs_save = False
+            try:
+                await run_disk_io(self.save, dict(self.urls))
+            except Exception as e:
+                print(f"Failed to save attachment URLs to {self.urls_file}")
+                print_exception(
+                    type(e), e, e.__traceback__, file=sys.stderr
+                )
+
+    def get_url(self, filename: str) -> Optional[str]:
+        url = self.urls.get(filename)
+        if not url:
+            return None
+
+        expiry = get_url_expiry(url)
+        if expiry is not None and expiry < time.time() + ATTACHMENT_URL_EXPIRY_MARGIN.total_seconds():
+            return None
+
+        return url
+
+    def record(self, files: list[disnake.File], message: Message):
+        """
+        Records the URLs of the attachments a message was sent with
+        """
+        uploaded_filenames = {file.filename for file in files}
+        new_urls = {attachment.filename: attachment.url for attachment in message.attachments if attachment.filename in uploaded_filenames}
+        if new_urls:
+            self.urls.update(new_urls)
+            self.save_in_background()
+
+    async def upload(self, files: list[disnake.File]):
+        """
+        Uploads files to the asset channel, just to record their URLs
+        """
+        for i in range(0, len(files), MAX_MESSAGE_ATTACHMENTS):
+            files_chunk = files[i:i + MAX_MESSAGE_ATTACHMENTS]
+            await load_image_files(files_chunk)
+            message = await self.asset_channel.send(files=files_chunk)
+            self.record(files_chunk, message)
+
+    async def upload_missing(self, file_paths: list[str]):
+        """
+        Uploads every file to the asset channel which doesn't have a usable URL yet, e.g. to have all card images ready at startup
+        """
+        missing_file_paths = [file_path for file_path in file_paths if not self.get_url(os.path.basename(file_path))]
+        if not missing_file_paths:
+            return
+
+        print(f"Uploading {len(missing_file_paths)} images to the asset channel")
+        await self.upload([disnake.File(file_path) for file_path in missing_file_paths])
+
+    async def send(self, destination: Messageable, *args, **kwargs) -> Message:
+        """
+        Sends a message, swapping any attached files which have already been uploaded for embeds of their URLs
+        """
+        files: list[disnake.File] = list(kwargs.pop('files', None) or [])
+        if kwargs.get('file'):
+            files.append(kwargs.pop('file'))
+        else:
+            kwargs.pop('file', None)
+
+        if not files:
+            return await destination.send(*args, **kwargs)
+
+        if self.asset_channel:
+            stale_files = [file for file in files if not self.get_url(file.filename)]
+            if stale_files:
+                try:
+                    await self.upload(stale_files)
+                except Exception as e:
+                    # fall back to attaching whatever didn't make it to the asset channel to the message itself
+                    print(f"Failed to upload {len(stale_files)} images to the asset channel")
+                    print_exception(
+                        type(e), e, e.__traceback__, file=sys.stderr
+                    )
+                    for file in stale_files:
+                        file.reset()
+
+        embeds = list(kwargs.pop('embeds', None) or [])
+        files_to_upload = []
+        for file in files:
+            url = self.get_url(file.filename)
+            if url:
+                embeds.append(disnake.Embed().set_image(url=url))
+                file.close()
+            else:
+                files_to_upload.append(file)
+
+        await load_image_files(files_to_upload)
+        message = await destination.send(*args, embeds=embeds or None, files=files_to_upload or None, **kwargs)
+        self.record(files_to_upload, message)
+        return message
+
+
+ATTACHMENT_REGISTRY = AttachmentRegistry()
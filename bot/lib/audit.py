@@ -0,0 +1,55 @@
+from collections import Counter
+from functools import cache
+
+from constants import DECKLIST_FILE
+from lib.deck import read_decklist
+from models import OneWithDeathGame
+
+
+@cache
+def get_decklist_counts(decklist_file: str=DECKLIST_FILE) -> Counter:
+    return Counter(read_decklist(decklist_file))
+
+
+def get_expected_card_counts(game: OneWithDeathGame, decklist_file: str=DECKLIST_FILE) -> Counter:
+    """
+    Gets how many copies of each card the game should hold across all its zones: the decklist, plus the Nix each player starts with
+    """
+    expected_counts = Counter(get_decklist_counts(decklist_file))
+    expected_counts["Nix"] += len(game.members)
+    return expected_counts
+
+
+def find_conservation_violations(game: OneWithDeathGame, decklist_file: str=DECKLIST_FILE) -> list[str]:
+    """
+    Checks that no cards have been lost or duplicated in the game, using the running zone counts.
+
+    This only costs as much as the number of distinct cards and zones, so it's cheap enough to run after every command.
+    """
+    violations = []
+    zone_counts = game.get_zone_counts()
+
+    # the running counts should still agree with the size of each zone, otherwise a zone was changed without being counted
+    zone_sizes = {
+        'deck': len(game.deck.cards),
+        'hands': sum(len(hand) for hand in game.deck._hands.values()),
+        'resolving': len(game.deck._waiting_to_resolve),
+        'graveyard': len(game.graveyard.cards),
+        'exile': len(game.exile),
+    }
+    for zone, size in zone_sizes.items():
+        counted_size = sum(zone_counts[zone].values())
+        if counted_size != size:
+            violations.append(f"{zone} holds {size} cards, but {counted_size} were counted moving into it")
+
+    total_counts = Counter()
+    for counts in zone_counts.values():
+        total_counts.update(counts)
+
+    expected_counts = get_expected_card_counts(game, decklist_file)
+    for card in sorted(set(total_counts) | set(expected_counts)):
+        if total_counts[card] != expected_counts[card]:
+            locations = ', '.join(f"{zone}: {counts[card]}" for zone, counts in zone_counts.items() if counts[card])
+            violations.append(f"expected {expected_counts[card]} {card}, found {total_counts[card]} ({locations or 'nowhere'})")
+
+    return violations
@@ -1,28 +1,149 @@
+import io
 import os
+from io import BytesIO
+from typing import Optional
 
 import disnake
 
-from constants import CARD_IMAGES_FOLDER
+from constants import DECKLIST_FILE
 from errors import ImageNotFoundError
+from lib.asset_bundle import AssetBundle
+from lib.asset_manifest import get_asset_manifest
+from lib.deck import get_decklist
+from lib.attachments import ATTACHMENT_REGISTRY
+from lib.image_cache import IMAGE_CACHE, ImageFileReader
+from lib.prefetch import PREFETCHER
 from lib.util import sanitize_card_name
 
 
-def card_name_to_snake_case(card_name: str) -> str:
-    return sanitize_card_name(card_name).replace(' ', '_')
+# source image path -> scaled down derivative to upload instead, filled in at startup by use_image_derivatives
+_IMAGE_DERIVATIVES: dict[str, str] = {}
+
+
+# bundle of card images to serve straight from memory instead of opening their files, set at startup by use_asset_bundle
+_ASSET_BUNDLE: Optional[AssetBundle] = None
+
+
+def use_image_derivatives(derivatives: dict[str, str]):
+    _IMAGE_DERIVATIVES.clear()
+    _IMAGE_DERIVATIVES.update(derivatives)
+
+
+def use_asset_bundle(bundle: Optional[AssetBundle]):
+    """
+    Serves card images out of the given bundle, except for any source image which has changed since the bundle was built.
+    Derivatives are named after the hash of their source, so a changed image gets a new derivative which won't be in the bundle either.
+    """
+    global _ASSET_BUNDLE
+    if bundle:
+        for asset in get_asset_manifest().values():
+            file_name = os.path.basename(asset.path)
+            if file_name in bundle and bundle.get_hash(file_name) != asset.content_hash:
+                print(f"{file_name} has changed since {bundle.bundle_path} was built, so it will be read from disk until the bundle is rebuilt")
+                bundle.discard(file_name)
+    _ASSET_BUNDLE = bundle
+
+
+def is_bundled(image_file_path: str) -> bool:
+    return _ASSET_BUNDLE is not None and os.path.basename(image_file_path) in _ASSET_BUNDLE
+
+
+def open_image_file(image_file_path: str) -> io.IOBase:
+    """
+    Opens an image file for reading, from the asset bundle if it's bundled, otherwise from the image cache.
+    An image which isn't cached yet is only read once it's sent, off the event loop
+    """
+    if is_bundled(image_file_path):
+        return _ASSET_BUNDLE.open(os.path.basename(image_file_path))
+    record_served(image_file_path)
+    if image_file_path not in IMAGE_CACHE:
+        return ImageFileReader(image_file_path)
+    # BytesIO shares the cached bytes until something writes to it, so this doesn't copy the image
+    return BytesIO(IMAGE_CACHE.get(image_file_path))
+
+
+def record_served(image_file_path: str):
+    """
+    Lets the prefetcher know an image is about to be served from the image cache. Bundled images are never prefetched, so they aren't counted
+    """
+    if not is_bundled(image_file_path):
+        PREFETCHER.record_served(image_file_path, image_file_path in IMAGE_CACHE)
+
+
+def read_image_file(image_file_path: str) -> bytes:
+    """
+    Reads an image file's bytes, from the asset bundle if it's bundled, otherwise from the image cache.
+    On a cache miss this reads from disk, so it belongs on the disk I/O threads
+    """
+    if is_bundled(image_file_path):
+        return bytes(_ASSET_BUNDLE.get(os.path.basename(image_file_path)))
+    return IMAGE_CACHE.get(image_file_path)
 
 
 def get_image_file_location(card_name: str) -> str:
-    image_file_path = os.path.join(CARD_IMAGES_FOLDER, f"{card_name_to_snake_case(card_name)}.png")
-    if not os.path.exists(image_file_path):
-        raise ImageNotFoundError(f"No image file found at {image_file_path}")
-    return image_file_path
+    """
+    Gets the image file to upload for a card, which is its derivative for the configured quality if one was built, otherwise the source image
+    """
+    asset = get_asset_manifest().get(sanitize_card_name(card_name))
+    if not asset:
+        raise ImageNotFoundError(f"No image file found for {card_name}")
+    return _IMAGE_DERIVATIVES.get(asset.path, asset.path)
+
 
+def get_card_image(card_name: str) -> disnake.File:
+    """
+    Gets a card's image ready to attach to a message, served from memory rather than read from disk on every send
+    """
+    image_file_path = get_image_file_location(card_name)
+    return disnake.File(open_image_file(image_file_path), filename=os.path.basename(image_file_path))
 
-def get_card_images(card_names: list[str]) -> str:
+
+def get_card_images(card_names: list[str]) -> list[disnake.File]:
     card_images = []
     for card in card_names:
         try:
-            card_images.append(disnake.File(get_image_file_location(card)))
+            card_images.append(get_card_image(card))
         except ImageNotFoundError:
             print(f"Failed to retrieve image for {card}")
     return card_images
+
+
+def get_all_image_file_locations() -> list[str]:
+    """
+    Gets the image file to upload for every card which has an image
+    """
+    return [_IMAGE_DERIVATIVES.get(asset.path, asset.path) for asset in get_asset_manifest().values()]
+
+
+def get_decklist_image_file_locations(decklist_file: str=DECKLIST_FILE) -> list[str]:
+    """
+    Gets the image file to upload for every card a game can hold, i.e. each card in the decklist plus the Nix every player starts with
+    """
+    image_file_locations = []
+    for card_name in dict.fromkeys([*get_decklist(decklist_file), "Nix"]):
+        try:
+            image_file_locations.append(get_image_file_location(card_name))
+        except ImageNotFoundError:
+            print(f"Failed to retrieve image for {card_name}")
+    return image_file_locations
+
+
+def prefetch_card_images(upcoming_cards: list[str]):
+    """
+    Gets the images of the upcoming cards ready to send ahead of time.
+
+    If any of them would need uploading to the asset channel, every image which needs it is uploaded rather than just those,
+    so the asset channel never shows which cards are coming up.
+    """
+    image_file_paths = []
+    for card_name in upcoming_cards[:PREFETCHER.depth]:
+        try:
+            image_file_paths.append(get_image_file_location(card_name))
+        except ImageNotFoundError:
+            pass
+
+    # bundled images are always in memory, and aren't counted as hits or misses when they're served
+    PREFETCHER.prefetch([path for path in image_file_paths if not is_bundled(path)])
+
+    if ATTACHMENT_REGISTRY.asset_channel and any(not ATTACHMENT_REGISTRY.get_url(os.path.basename(path)) for path in image_file_paths):
+        PREFETCHER.run_in_background(ATTACHMENT_REGISTRY.upload_missing(get_all_image_file_locations()))
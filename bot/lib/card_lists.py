@@ -4,11 +4,13 @@ import enum
 from functools import cache
 
 from constants import CARD_LIST_FILE_TEMPLATE
+from lib.util import normalize_card_name
 
 
 class CardListCategory(enum.Enum):
     BUYBACK = 'buyback'
     FLASHBACK = 'flashback'
+    RECUR = 'recur'
 
 
 @cache
@@ -21,4 +23,12 @@ def get_card_list(category: str):
     """
     filename = CARD_LIST_FILE_TEMPLATE.format(category=category)
     with open(filename, 'r') as f:
-        return [line.strip() for line in f.readlines()]
+        return [normalize_card_name(line) for line in f.readlines() if line.strip()]
+
+
+def read_card_lists():
+    """
+    Reads every card list ahead of its first use, so no command has to wait on the disk for one
+    """
+    for category in CardListCategory:
+        get_card_list(category.value)
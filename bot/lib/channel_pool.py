@@ -0,0 +1,160 @@
+import asyncio
+import sys
+import uuid
+from traceback import print_exception
+from typing import Coroutine, Optional
+
+import disnake
+from disnake.channel import TextChannel, VoiceChannel
+from disnake.guild import Guild
+
+from constants import CHANNEL_POOL_SIZE
+
+
+POOL_CHANNEL_PREFIX = "owd-pool-"
+POOL_VOICE_CHANNEL_SUFFIX = "-vc"
+
+
+def get_hidden_overwrites(guild: Guild) -> dict:
+    return {
+        guild.default_role: disnake.PermissionOverwrite(view_channel=False),
+        guild.me: disnake.PermissionOverwrite(view_channel=True),
+    }
+
+
+class ChannelPool:
+    """
+    Keeps some hidden text and voice channel pairs ready in every server, so starting a game only has to rename a pair
+    and let its players in, rather than create both channels one after the other.
+
+    Pools are topped back up in the background whenever a pair is claimed, and an ended game's pair goes back into the pool
+    once its messages have been cleared out. Pool channels are named "owd-pool-<id>" and "owd-pool-<id>-vc",
+    which is how they're found again after a restart.
+    """
+    def __init__(self, size: int=CHANNEL_POOL_SIZE):
+        self.size = size
+        self.num_claimed = 0
+        self.num_missed = 0
+        self._pairs: dict[int, list[tuple[TextChannel, VoiceChannel]]] = {}
+        self._refills: dict[int, asyncio.Task] = {}
+        # keeps a reference to every background task so they can't be garbage collected before they finish
+        self._tasks: set[asyncio.Task] = set()
+
+    def get_pairs(self, guild: Guild) -> list[tuple[TextChannel, VoiceChannel]]:
+        return self._pairs.setdefault(guild.id, [])
+
+    def adopt(self, guild: Guild):
+        """
+        Takes back the pool channels left in a server from before the bot restarted
+        """
+        voice_channels = {channel.name: channel for channel in guild.voice_channels}
+        pairs = self.get_pairs(guild)
+        pooled_channel_ids = {channel.id for pair in pairs for channel in pair}
+
+        for text_channel in guild.text_channels:
+            if not text_channel.name.startswith(POOL_CHANNEL_PREFIX) or text_channel.id in pooled_channel_ids:
+                continue
+            voice_channel = voice_channels.get(f"{text_channel.name}{POOL_VOICE_CHANNEL_SUFFIX}")
+            if voice_channel:
+                pairs.append((text_channel, voice_channel))
+
+    def claim(self, guild: Guild) -> Optional[tuple[TextChannel, VoiceChannel]]:
+        """
+        Takes a text and voice channel pair out of the server's pool, if it has one left, and starts topping the pool back up
+        """
+        pairs = self.get_pairs(guild)
+        pair = pairs.pop(0) if pairs else None
+        if pair:
+            self.num_claimed += 1
+        else:
+            self.num_missed += 1
+
+        self.refill_in_background(guild)
+        return pair
+
+    def refill_in_background(self, guild: Guild):
+        if self.size <= 0:
+            return
+        refill = self._refills.get(guild.id)
+        if refill and not refill.done():
+            return
+        self._refills[guild.id] = self._run_in_background(self.refill(guild))
+
+    async def refill(self, guild: Guild):
+        pairs = self.get_pairs(guild)
+        while len(pairs) < self.size:
+            name = f"{POOL_CHANNEL_PREFIX}{uuid.uuid4().hex[:8]}"
+            overwrites = get_hidden_overwrites(guild)
+            text_channel = await guild.create_text_channel(name, overwrites=overwrites)
+            voice_channel = await guild.create_voice_channel(f"{name}{POOL_VOICE_CHANNEL_SUFFIX}", overwrites=overwrites)
+            pairs.append((text_channel, voice_channel))
+
+    async def release(self, guild: Guild, text_channel: Optional[TextChannel], voice_channel: Optional[VoiceChannel]):
+        """
+        Gives an ended game's channels back to the pool, or deletes them if the pool is already full.
+
+        The pool is only topped up to its size, but takes back up to twice that many pairs, so a server where games
+        keep starting and ending recycles its channels rather than creating new ones
+        """
+        if text_channel and voice_channel and len(self.get_pairs(guild)) < self.size * 2:
+            self._run_in_background(self.recycle(guild, text_channel, voice_channel))
+            return
+
+        await delete_channels(text_channel, voice_channel)
+
+    async def recycle(self, guild: Guild, text_channel: TextChannel, voice_channel: VoiceChannel):
+        """
+        Hides a pair of channels again, and clears out their messages so the next game's players can't read the last game's
+        """
+        name = f"{POOL_CHANNEL_PREFIX}{uuid.uuid4().hex[:8]}"
+        overwrites = get_hidden_overwrites(guild)
+        try:
+            # hidden first, so nobody can read what's left while it's cleared
+            await asyncio.gather(
+                text_channel.edit(name=name, overwrites=overwrites),
+                voice_channel.edit(name=f"{name}{POOL_VOICE_CHANNEL_SUFFIX}", overwrites=overwrites),
+            )
+            await text_channel.purge(limit=None)
+            await voice_channel.purge(limit=None)
+        except Exception as e:
+            print(f"Failed to recycle channels {text_channel.id} and {voice_channel.id}, so they're being deleted instead")
+            print_exception(
+                type(e), e, e.__traceback__, file=sys.stderr
+            )
+            await delete_channels(text_channel, voice_channel)
+            self.refill_in_background(guild)
+            return
+
+        self.get_pairs(guild).append((text_channel, voice_channel))
+
+    def _run_in_background(self, coroutine: Coroutine) -> asyncio.Task:
+        task = asyncio.create_task(self._log_failure(coroutine))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    @staticmethod
+    async def _log_failure(coroutine: Coroutine):
+        try:
+            await coroutine
+        except Exception as e:
+            print("Failed to maintain the channel pool")
+            print_exception(
+                type(e), e, e.__traceback__, file=sys.stderr
+            )
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            'pooled_pairs': sum(len(pairs) for pairs in self._pairs.values()),
+            'claimed': self.num_claimed,
+            'missed': self.num_missed,
+        }
+
+
+async def delete_channels(*channels: Optional[disnake.abc.GuildChannel]):
+    for channel in channels:
+        if channel:
+            await channel.delete()
+
+
+CHANNEL_POOL = ChannelPool()
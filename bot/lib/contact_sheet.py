@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import sys
+from collections import OrderedDict
+from io import BytesIO
+from math import ceil
+from traceback import print_exception
+from typing import Optional
+
+import disnake
+from PIL import Image, ImageDraw, ImageFont
+
+from constants import CONTACT_SHEET_CACHE_SIZE, CONTACT_SHEET_CARD_SIZE, CONTACT_SHEET_COLUMNS, CONTACT_SHEET_MAX_CARDS, CONTACT_SHEET_MIN_CARDS, CONTACT_SHEET_QUALITY
+from errors import ImageNotFoundError
+from lib.card_image import get_card_images, get_image_file_location, read_image_file, record_served
+from lib.executors import run_cpu_bound, run_disk_io
+
+
+CONTACT_SHEET_PADDING = 8
+CONTACT_SHEET_BACKGROUND = (47, 49, 54)
+
+
+def get_card_thumbnail(card_name: str, image_bytes: Optional[bytes]) -> Image.Image:
+    """
+    Gets a card's image scaled to fit a contact sheet tile, or a blank tile with the card's name if it has no image
+    """
+    if image_bytes is None:
+        thumbnail = Image.new('RGBA', CONTACT_SHEET_CARD_SIZE, (32, 34, 37))
+        ImageDraw.Draw(thumbnail).multiline_text((12, CONTACT_SHEET_CARD_SIZE[1] // 2), card_name.replace(' ', '\n'), fill='white', font=ImageFont.load_default(size=20))
+        return thumbnail
+
+    with Image.open(BytesIO(image_bytes)) as image:
+        thumbnail = image.convert('RGBA')
+    thumbnail.thumbnail(CONTACT_SHEET_CARD_SIZE, Image.LANCZOS)
+    return thumbnail
+
+
+def draw_card_number(sheet: Image.Image, number: int, position: tuple[int, int]):
+    draw = ImageDraw.Draw(sheet)
+    font = ImageFont.load_default(size=28)
+    x, y = position
+    radius = 22
+
+    draw.ellipse((x, y, x + radius * 2, y + radius * 2), fill=(0, 0, 0, 200), outline='white', width=2)
+    draw.text((x + radius, y + radius), str(number), fill='white', font=font, anchor='mm')
+
+
+def render_contact_sheet(card_images: tuple[tuple[str, Optional[bytes]], ...], first_number: int=1) -> bytes:
+    """
+    Tiles the images of the given cards into a single image, numbered from first_number in the order given.
+
+    It's given each card's name with the bytes of its image (or None if it has no image), which are read beforehand,
+    so it only ever renders.
+    """
+    card_width, card_height = CONTACT_SHEET_CARD_SIZE
+    num_columns = min(len(card_images), CONTACT_SHEET_COLUMNS)
+    num_rows = ceil(len(card_images) / CONTACT_SHEET_COLUMNS)
+
+    sheet = Image.new(
+        'RGB',
+        (num_columns * (card_width + CONTACT_SHEET_PADDING) + CONTACT_SHEET_PADDING, num_rows * (card_height + CONTACT_SHEET_PADDING) + CONTACT_SHEET_PADDING),
+        CONTACT_SHEET_BACKGROUND,
+    )
+
+    for i, (card_name, image_bytes) in enumerate(card_images):
+        thumbnail = get_card_thumbnail(card_name, image_bytes)
+        x = CONTACT_SHEET_PADDING + (i % CONTACT_SHEET_COLUMNS) * (card_width + CONTACT_SHEET_PADDING)
+        y = CONTACT_SHEET_PADDING + (i // CONTACT_SHEET_COLUMNS) * (card_height + CONTACT_SHEET_PADDING)
+        sheet.paste(thumbnail, (x, y), thumbnail)
+        # just below the card's title bar, so the number doesn't hide the card's name
+        draw_card_number(sheet, first_number + i, (x + 6, y + card_height * 3 // 20))
+
+    sheet_bytes = BytesIO()
+    sheet.save(sheet_bytes, format='WEBP', quality=CONTACT_SHEET_QUALITY)
+    return sheet_bytes.getvalue()
+
+
+def get_image_file_locations(card_names: tuple[str, ...]) -> list[Optional[str]]:
+    image_file_locations = []
+    for card_name in card_names:
+        try:
+            image_file_locations.append(get_image_file_location(card_name))
+        except ImageNotFoundError:
+            image_file_locations.append(None)
+    return image_file_locations
+
+
+def get_contact_sheet_filename(card_names: tuple[str, ...], first_number: int=1) -> str:
+    """
+    Names a contact sheet after the images it's made of and how they're numbered, so the same sheet always gets the same name
+    and can be matched with its earlier upload, while a sheet made of changed card images can't be
+    """
+    image_keys = [image_file_location or card_name for card_name, image_file_location in zip(card_names, get_image_file_locations(card_names))]
+    if first_number != 1:
+        image_keys.append(str(first_number))
+    return f"contact_sheet.{hashlib.sha256(chr(0).join(image_keys).encode()).hexdigest()[:16]}.webp"
+
+
+def read_image_files(image_file_paths: list[Optional[str]]) -> list[Optional[bytes]]:
+    return [read_image_file(image_file_path) if image_file_path else None for image_file_path in image_file_paths]
+
+
+# rendered sheets by file name, least recently used first, so showing the same cards again (e.g. an unchanged hand) doesn't re-render them
+_rendered_sheets: OrderedDict[str, bytes] = OrderedDict()
+
+
+def clear_rendered_sheets():
+    _rendered_sheets.clear()
+
+
+async def get_contact_sheet(card_names: list[str], first_number: int=1) -> disnake.File:
+    """
+    Renders a contact sheet of the given cards, reading their images and then tiling them on the disk I/O threads,
+    so a big sheet can't stall the event loop
+    """
+    card_names = tuple(card_names)
+    filename = get_contact_sheet_filename(card_names, first_number)
+
+    sheet_bytes = _rendered_sheets.get(filename)
+    if sheet_bytes is not None:
+        _rendered_sheets.move_to_end(filename)
+    else:
+        image_file_paths = get_image_file_locations(card_names)
+        for image_file_path in image_file_paths:
+            if image_file_path:
+                record_served(image_file_path)
+
+        image_bytes = await run_disk_io(read_image_files, image_file_paths)
+        sheet_bytes = await run_cpu_bound(render_contact_sheet, tuple(zip(card_names, image_bytes)), first_number)
+
+        _rendered_sheets[filename] = sheet_bytes
+        while len(_rendered_sheets) > CONTACT_SHEET_CACHE_SIZE:
+            _rendered_sheets.popitem(last=False)
+
+    return disnake.File(BytesIO(sheet_bytes), filename=filename)
+
+
+async def get_card_attachments(card_names: list[str]) -> list[disnake.File]:
+    """
+    Gets the images to attach to a message showing the given cards: a contact sheet if there are enough of them, otherwise an image per card.
+    Too many cards for one sheet are split across as many sheets as it takes, rendered at the same time
+    """
+    if len(card_names) < CONTACT_SHEET_MIN_CARDS:
+        return get_card_images(card_names)
+
+    try:
+        return list(await asyncio.gather(*(
+            get_contact_sheet(card_names[i:i + CONTACT_SHEET_MAX_CARDS], first_number=i + 1)
+            for i in range(0, len(card_names), CONTACT_SHEET_MAX_CARDS)
+        )))
+    except Exception as e:
+        # the images on their own are still better than nothing
+        print(f"Failed to render contact sheet for card list: {card_names}")
+        print_exception(
+            type(e), e, e.__traceback__, file=sys.stderr
+        )
+        return get_card_images(card_names)
+
+
+def get_staged_card_attachments(card_names: list[str]) -> dict:
+    """
+    Gets the keyword arguments for a message staged in a GameTransaction to show the given cards.
+
+    Contact sheets are only named here, then rendered when the transaction is flushed, so rendering never holds up the command itself.
+    """
+    if len(card_names) < CONTACT_SHEET_MIN_CARDS:
+        return {'files': get_card_images(card_names)}
+    return {'contact_sheet': list(card_names)}
@@ -1,11 +1,13 @@
 import os
 from dataclasses import dataclass, field
+from functools import cache
 from random import randint
 from typing import Optional
 
 from errors import InvalidBuybackError
 from lib.card_group import CardGroup
-from lib.util import sanitize_card_name
+from lib.util import normalize_card_name, sanitize_card_name
+from lib.zone_counts import ZoneCounts
 
 
 @dataclass
@@ -17,6 +19,14 @@ class Deck(CardGroup):
     _waiting_to_resolve: list[str] = field(default_factory=lambda: [])
     _last_card_played: str = None
 
+    def __post_init__(self):
+        # not a dataclass field, so it stays out of the saved state and is rebuilt from the zones on load
+        self.zone_counts = ZoneCounts(
+            deck=self.cards,
+            hands=[c for hand in self._hands.values() for c in hand],
+            resolving=self._waiting_to_resolve,
+        )
+
     def draw(self, member_id: int, num_cards: int=1) -> list[str]:
         """
         Returns and removes the top specified number of cards from the deck
@@ -34,6 +44,9 @@ class Deck(CardGroup):
             self._hands[member_id_str] = normal_drawn_cards
         self._waiting_to_resolve.extend([c for c in drawn_cards if c == 'One with Death'])
 
+        self.zone_counts.move('deck', 'hands', normal_drawn_cards)
+        self.zone_counts.move('deck', 'resolving', [c for c in drawn_cards if c == 'One with Death'])
+
         return drawn_cards
 
 
@@ -51,10 +64,7 @@ class Deck(CardGroup):
         """
         simple fisher-yates shuffle to mix up the cards
         """
-        final_card_index = len(self.cards) - 1
-        for i in range(len(self.cards) - 2):
-            j = randint(i, final_card_index)
-            self.cards[i], self.cards[j] = self.cards[j], self.cards[i]
+        self.cards[:] = get_shuffled_cards(self.cards)
 
 
     def reorder_scry(self, new_top_card_indexes: list[int], new_bottom_card_indexes: list[int]):
@@ -112,7 +122,10 @@ class Deck(CardGroup):
         if not card_indexes:
             raise ValueError(f"Card {card} is not in your Deck of Death hand")
 
-        return self._hands[member_id_str].pop(card_indexes[0])
+        discarded_card = self._hands[member_id_str].pop(card_indexes[0])
+        self.zone_counts.remove('hands', [discarded_card])
+
+        return discarded_card
 
 
     def play(self, card: str, member_id: int) -> str:
@@ -125,6 +138,7 @@ class Deck(CardGroup):
             raise ValueError(f"Card {card} is not in your Deck of Death hand")
 
         card_to_return = self._hands[member_id_str].pop(card_indexes[0])
+        self.zone_counts.remove('hands', [card_to_return])
 
         self._last_card_played = card_to_return
 
@@ -132,24 +146,42 @@ class Deck(CardGroup):
 
 
     def resolve(self, card: str, resolve_to_top: bool=False) -> str:
-        index_to_pop = 0
-        # if the card name is empty, resolve the first card on the stack, otherwise find the card to resolve
+        return self.resolve_many(card, num_cards=1, resolve_to_top=resolve_to_top)[0]
+
+
+    def resolve_many(self, card: str='', num_cards: Optional[int]=None, resolve_to_top: bool=False) -> list[str]:
+        """
+        Resolves several cards from the resolution stack at once, putting every One with Death back into the deck
+        and shuffling only a single time rather than once per card.
+
+        If the card name is empty, cards are resolved from the top of the stack regardless of name.
+        If no number of cards is given, every matching card on the stack is resolved.
+        """
         if card:
             card_indexes = [i for i, c in enumerate(self._waiting_to_resolve) if sanitize_card_name(c) == sanitize_card_name(card)]
 
             if not card_indexes:
                 raise ValueError(f"Card {card} is not in the cards waiting to be resolved from this Deck of Death")
+        else:
+            card_indexes = list(range(len(self._waiting_to_resolve)))
 
-            index_to_pop = card_indexes[0]
+        if num_cards is not None:
+            card_indexes = card_indexes[:num_cards]
 
-        resolved_card = self._waiting_to_resolve.pop(index_to_pop)
-        if resolved_card == 'One with Death':
-            self.cards = [resolved_card, *self.cards]
+        indexes_to_pop = set(card_indexes)
+        resolved_cards = [self._waiting_to_resolve[i] for i in card_indexes]
+        self._waiting_to_resolve = [c for i, c in enumerate(self._waiting_to_resolve) if i not in indexes_to_pop]
+        self.zone_counts.remove('resolving', resolved_cards)
+
+        resolved_owds = [c for c in resolved_cards if c == 'One with Death']
+        if resolved_owds:
+            self.cards = [*resolved_owds, *self.cards]
+            self.zone_counts.add('deck', resolved_owds)
 
             if not resolve_to_top:
                 self.shuffle()
 
-        return resolved_card
+        return resolved_cards
     
 
     def buyback(self, card: str, member_id: int):
@@ -166,6 +198,7 @@ class Deck(CardGroup):
             self._hands[member_id_str].append(card)
         else:
             self._hands[member_id_str] = [card]
+        self.zone_counts.add('hands', [card])
 
 
     def is_buyback_valid(self, card: str) -> bool:
@@ -191,10 +224,12 @@ class Deck(CardGroup):
             self._hands[member_id_str].append(card_name)
         else:
             self._hands[member_id_str] = [card_name]
+        self.zone_counts.add('hands', [card_name])
 
 
     def add_to_deck(self, *card_names: list[str]):
         self.cards.extend(card_names)
+        self.zone_counts.add('deck', card_names)
 
 
     def mill(self, num_cards: int) -> [list[str], bool]:
@@ -214,8 +249,10 @@ class Deck(CardGroup):
             self.cards.extend(owd_cards)
             self.shuffle()
 
+            self.zone_counts.remove('deck', non_owd_cards)
             return non_owd_cards, True
         else:
+            self.zone_counts.remove('deck', milled_cards)
             return milled_cards, False
 
 
@@ -224,6 +261,7 @@ class Deck(CardGroup):
         if member_id_str in self._hands:
             hand = self._hands[member_id_str]
             self._hands[member_id_str] = []
+            self.zone_counts.remove('hands', hand)
             return hand
         else:
             return []
@@ -237,20 +275,7 @@ class Deck(CardGroup):
         if not member_ids:
             member_ids = []
 
-        if not os.path.exists(decklist_file):
-            raise FileNotFoundError(f"Could not find file {decklist_file} to initialize decklist")
-        
-        cards = []
-        with open(decklist_file) as f:
-            decklist = f.readlines()
-        
-        for line in decklist:
-            delimiter_index = line.index(" ")
-
-            num_cards, card_name = int(line[:delimiter_index]), line[delimiter_index + 1:] 
-            cards.extend([card_name.strip()] * num_cards)
-        
-        deck = cls(cards=cards)
+        deck = cls(cards=list(get_decklist(decklist_file)))
 
         if shuffle:
             deck.shuffle()
@@ -262,3 +287,45 @@ class Deck(CardGroup):
 
     def __len__(self) -> int:
         return len(self.cards)
+
+
+def get_shuffled_cards(cards: list[str]) -> list[str]:
+    """
+    simple fisher-yates shuffle of a copy of the cards, leaving the cards themselves as they are, so a huge deck can be
+    shuffled off the event loop without anything reading it half shuffled
+    """
+    shuffled_cards = list(cards)
+    final_card_index = len(shuffled_cards) - 1
+    for i in range(len(shuffled_cards) - 2):
+        j = randint(i, final_card_index)
+        shuffled_cards[i], shuffled_cards[j] = shuffled_cards[j], shuffled_cards[i]
+    return shuffled_cards
+
+
+def read_decklist(decklist_file: str) -> list[str]:
+    """
+    Reads every card in a decklist file, where each line specifies a count of a card then the card name, delimited by a space
+    e.g. 11 One with Death
+    """
+    if not os.path.exists(decklist_file):
+        raise FileNotFoundError(f"Could not find file {decklist_file} to initialize decklist")
+    
+    cards = []
+    with open(decklist_file) as f:
+        decklist = f.readlines()
+    
+    for line in decklist:
+        delimiter_index = line.index(" ")
+
+        num_cards, card_name = int(line[:delimiter_index]), line[delimiter_index + 1:] 
+        cards.extend([normalize_card_name(card_name)] * num_cards)
+
+    return cards
+
+
+@cache
+def get_decklist(decklist_file: str) -> tuple[str, ...]:
+    """
+    Gets every card in a decklist file, read only the first time it's needed, so starting a game doesn't read the file again
+    """
+    return tuple(read_decklist(decklist_file))
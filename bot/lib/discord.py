@@ -1,9 +1,16 @@
+from typing import Union
 
 from disnake.ext.commands.context import Context
-from models import OneWithDeathGame
+from disnake.member import Member
+from disnake.user import User
+
+from models import MemberInfo, OneWithDeathGame
 
 def message_is_in_server(ctx: Context) -> bool:
     return bool(ctx.guild)
 
 def message_is_in_game_channel(ctx: Context, game: OneWithDeathGame) -> bool:
     return ctx.guild and ctx.channel.id == game.text_channel
+
+def to_member_info(member: Union[User, Member]) -> MemberInfo:
+    return MemberInfo(id=member.id, name=member.display_name, mention=member.mention, username=member.name)
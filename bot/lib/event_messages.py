@@ -0,0 +1,184 @@
+from typing import Callable, Union
+
+from disnake.abc import Messageable
+from disnake.member import Member
+from disnake.user import User
+
+from engine.events import (
+    CardBoughtBack,
+    CardFlashbacked,
+    CardPlayed,
+    CardPulled,
+    CardsDiscarded,
+    CardsDrawn,
+    CardsExiled,
+    CardsMilled,
+    CardsPeeked,
+    CardsReordered,
+    CardsResolved,
+    DeckShuffled,
+    Event,
+    GameEnded,
+    HandExiledAndRedrawn,
+    HandLimitExceeded,
+    OneWithDeathDrawn,
+    RedrawAllTriggered,
+)
+from lib.card_image import get_card_images
+from lib.contact_sheet import get_staged_card_attachments
+from lib.discord import message_is_in_game_channel
+from lib.formatting import format_card_list
+from lib.interactions import InteractionContext, get_private_destination, is_slash_command
+from lib.member_cache import PLAYER_CACHE
+from lib.transaction import GameTransaction
+from models import MemberInfo, OneWithDeathGame
+
+
+def send_events(tx: GameTransaction, game: OneWithDeathGame, events: list[Event]):
+    """
+    Stages the Discord messages for everything that happened in a game: private results go to the player as a DM
+    (or an ephemeral reply, for a slash command), everything else to the game channel
+    """
+    for event in events:
+        EVENT_MESSAGE_SENDERS[type(event)](tx, game, event)
+
+
+def get_game_channel(tx: GameTransaction, game: OneWithDeathGame) -> Messageable:
+    return tx.ctx.guild.get_channel(game.text_channel)
+
+
+def get_member(tx: GameTransaction, member: MemberInfo) -> Union[User, Member, InteractionContext]:
+    if tx.ctx.author.id == member.id:
+        return get_private_destination(tx.ctx)
+    return PLAYER_CACHE.get(tx.ctx.guild, member.id)
+
+
+def command_is_hidden_from_game_channel(tx: GameTransaction, game: OneWithDeathGame) -> bool:
+    """
+    Whether the other players can't see the command which did something private, so the game channel needs telling it happened:
+    either it was run outside the game channel, or it was a slash command, which leaves nothing behind in the channel
+    """
+    return not message_is_in_game_channel(tx.ctx, game) or is_slash_command(tx.ctx)
+
+
+def send_cards_drawn(tx: GameTransaction, game: OneWithDeathGame, event: CardsDrawn):
+    num_cards = event.num_requested
+    member = get_member(tx, event.member)
+
+    card_attachments = get_staged_card_attachments(event.cards)
+    tx.send(member, f"You drew {'these' if num_cards > 1 else 'this'} {num_cards} card{'s' if num_cards > 1 else ''}: {format_card_list(event.cards)}", **card_attachments)
+    if len(card_attachments.get('files', event.cards)) < len(event.cards):
+        tx.send(member, "Sorry, I had some trouble loading the images for this draw.")
+
+    if command_is_hidden_from_game_channel(tx, game):
+        tx.send(get_game_channel(tx, game), f"{event.member.mention} drew {num_cards} cards")
+
+
+def send_one_with_death_drawn(tx: GameTransaction, game: OneWithDeathGame, event: OneWithDeathDrawn):
+    tx.send(get_game_channel(tx, game), f"{event.member.mention} drew {event.count} One with Death card{'s' if event.count > 1 else ''}!", files=get_card_images(["One with Death"]))
+    tx.send(get_member(tx, event.member), f"You got {'{}'.format(event.count) if event.count > 1 else 'a'} Charon's Obol{'s' if event.count > 1 else ''}!", files=get_card_images(["Charon's Obol"]))
+
+
+def send_hand_limit_exceeded(tx: GameTransaction, game: OneWithDeathGame, event: HandLimitExceeded):
+    tx.send(get_member(tx, event.member), f"Your hand size of {event.hand_size} is over the limit of {event.limit} cards!")
+
+
+def send_cards_peeked(tx: GameTransaction, game: OneWithDeathGame, event: CardsPeeked):
+    member = get_member(tx, event.member)
+
+    cards_display = '\n'.join([f"`{i + 1}. {card}`" for i, card in enumerate(event.cards)])
+    tx.send(member, f"You peeked these {event.num_requested} cards:\n{cards_display}\n", **get_staged_card_attachments(event.cards))
+
+    if event.follow_up_action == "reorder:scry":
+        tx.send(member, "Respond to me with a `!order` command with the re-ordered card numbers, grouped by top/bottom as a prefixing word.\n\nFor example, for a `!scry 3` you might write: `!order top 1 2 bottom 3`.")
+    elif event.follow_up_action == "reorder:rearrange":
+        tx.send(member, "Respond to me with a `!order` command with the re-ordered card numbers, separated by spaces.\n\nFor example, for a `!fix 3` you might write: `!order 3 1 2`.")
+
+    if command_is_hidden_from_game_channel(tx, game):
+        tx.send(get_game_channel(tx, game), f"{event.member.mention} peeked at {event.num_requested} cards")
+
+
+def send_cards_reordered(tx: GameTransaction, game: OneWithDeathGame, event: CardsReordered):
+    tx.send(tx.ctx, "Cards successfully re-ordered")
+
+
+def send_card_played(tx: GameTransaction, game: OneWithDeathGame, event: CardPlayed):
+    tx.send(get_game_channel(tx, game), f"{event.member.mention} played {event.card}", files=get_card_images([event.card]))
+
+
+def send_cards_discarded(tx: GameTransaction, game: OneWithDeathGame, event: CardsDiscarded):
+    if event.whole_hand:
+        tx.send(get_game_channel(tx, game), f"{event.member.mention} discarded {', '.join(event.cards)}")
+    else:
+        tx.send(get_game_channel(tx, game), f"{event.member.mention} discarded {', '.join(event.cards)}", **get_staged_card_attachments(event.cards))
+
+
+def send_card_bought_back(tx: GameTransaction, game: OneWithDeathGame, event: CardBoughtBack):
+    tx.send(get_game_channel(tx, game), f"{event.member.mention} bought back {event.card}")
+
+
+def send_card_flashbacked(tx: GameTransaction, game: OneWithDeathGame, event: CardFlashbacked):
+    tx.send(get_game_channel(tx, game), f"{event.card} has been flashbacked by {event.member.mention} and is now exiled", files=get_card_images([event.card]))
+
+
+def send_cards_milled(tx: GameTransaction, game: OneWithDeathGame, event: CardsMilled):
+    if event.one_with_death_milled:
+        tx.send(get_game_channel(tx, game), f"{event.member.mention} milled {event.num_requested} cards, including a One with Death! The deck was shuffled because the One with Deaths were shuffled back in after being milled.", **get_staged_card_attachments(event.cards))
+    else:
+        tx.send(get_game_channel(tx, game), f"{event.member.mention} milled {event.num_requested} cards", **get_staged_card_attachments(event.cards))
+
+
+def send_cards_resolved(tx: GameTransaction, game: OneWithDeathGame, event: CardsResolved):
+    num_resolved = len(event.cards)
+    if event.num_requested is not None and num_resolved < event.num_requested:
+        tx.send(tx.ctx, f"There {'was' if num_resolved == 1 else 'were'} only {num_resolved} {event.card_name + ' ' if event.card_name else ''}card{'s' if num_resolved != 1 else ''} in the resolution stack")
+
+    if event.cards:
+        tx.send(get_game_channel(tx, game), f"Resolved {'a' if num_resolved == 1 else str(num_resolved)} card{'s' if num_resolved > 1 else ''}{' to the top of the deck' if event.to_top else ''}: {format_card_list(event.cards)} The resolution stack is now {':' + format_card_list(event.remaining) if event.remaining else 'empty'}")
+
+
+def send_deck_shuffled(tx: GameTransaction, game: OneWithDeathGame, event: DeckShuffled):
+    tx.send(get_game_channel(tx, game), f"{event.member.mention} shuffled the Deck of Death.")
+
+
+def send_card_pulled(tx: GameTransaction, game: OneWithDeathGame, event: CardPulled):
+    tx.send(get_game_channel(tx, game), f"{event.member.mention} pulled {event.card} from the grave")
+
+
+def send_cards_exiled(tx: GameTransaction, game: OneWithDeathGame, event: CardsExiled):
+    cards_str = '\n'.join(event.cards)
+    tx.send(get_game_channel(tx, game), f"{event.member.mention} exiled these cards from the graveyard:\n```\n{cards_str}\n```")
+
+
+def send_hand_exiled_and_redrawn(tx: GameTransaction, game: OneWithDeathGame, event: HandExiledAndRedrawn):
+    tx.send(get_game_channel(tx, game), f"{event.member.mention} exiled and re-drew {event.num_cards} cards")
+
+
+def send_redraw_all_triggered(tx: GameTransaction, game: OneWithDeathGame, event: RedrawAllTriggered):
+    tx.send(get_game_channel(tx, game), f"{event.member.mention} triggered a re-draw for all players")
+
+
+def send_game_ended(tx: GameTransaction, game: OneWithDeathGame, event: GameEnded):
+    for member in event.members:
+        tx.send(get_member(tx, member), f"The game {event.game_id} has ended!")
+
+
+EVENT_MESSAGE_SENDERS: dict[type, Callable[[GameTransaction, OneWithDeathGame, Event], None]] = {
+    CardsDrawn: send_cards_drawn,
+    OneWithDeathDrawn: send_one_with_death_drawn,
+    HandLimitExceeded: send_hand_limit_exceeded,
+    CardsPeeked: send_cards_peeked,
+    CardsReordered: send_cards_reordered,
+    CardPlayed: send_card_played,
+    CardsDiscarded: send_cards_discarded,
+    CardBoughtBack: send_card_bought_back,
+    CardFlashbacked: send_card_flashbacked,
+    CardsMilled: send_cards_milled,
+    CardsResolved: send_cards_resolved,
+    DeckShuffled: send_deck_shuffled,
+    CardPulled: send_card_pulled,
+    CardsExiled: send_cards_exiled,
+    HandExiledAndRedrawn: send_hand_exiled_and_redrawn,
+    RedrawAllTriggered: send_redraw_all_triggered,
+    GameEnded: send_game_ended,
+}
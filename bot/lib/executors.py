@@ -0,0 +1,39 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from constants import DISK_IO_THREADS
+
+
+T = TypeVar('T')
+
+
+# every blocking file read and write, and image rendering, goes through the same few threads, rather than one per call like asyncio.to_thread
+DISK_IO_EXECUTOR = ThreadPoolExecutor(max_workers=DISK_IO_THREADS, thread_name_prefix='disk-io')
+
+
+async def run_disk_io(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Runs a blocking file read or write on the disk I/O threads
+    """
+    return await asyncio.get_running_loop().run_in_executor(DISK_IO_EXECUTOR, functools.partial(func, *args, **kwargs))
+
+
+async def run_cpu_bound(func: Callable[..., T], *args: Any) -> T:
+    """
+    Runs CPU heavy work (rendering contact sheets, shuffling a deck) on the disk I/O threads.
+
+    A process pool for this was deliberately left out. Pillow lets go of the GIL while it decodes, resizes and encodes images,
+    so rendering on a thread already leaves the event loop free. A shuffle holds the GIL, but takes well under a millisecond
+    for the Deck of Death (about 6 ms for 10,000 cards), less than pickling the deck over to a process and back would cost.
+    A process pool would also fork the bot's threads on Linux and re-import the bot in every process on Windows
+    """
+    return await asyncio.get_running_loop().run_in_executor(DISK_IO_EXECUTOR, func, *args)
+
+
+def shutdown_executors():
+    """
+    Waits for any file writes still queued (e.g. saving games), then stops the threads
+    """
+    DISK_IO_EXECUTOR.shutdown(wait=True)
@@ -1,3 +1,9 @@
+from constants import MAX_MESSAGE_LENGTH
+
+
+CODE_BLOCK_FENCE = "```"
+
+
 def format_card_list(cards: list[str], include_numbers: bool=False) -> str:
     """
     Formats a list of cards to be displayed in a one-per-line fashion in a code block, using markdown syntax
@@ -9,4 +15,39 @@ def format_card_list(cards: list[str], include_numbers: bool=False) -> str:
     ])
     return f"""```
 {cards_str}
-```"""
\ No newline at end of file
+```"""
+
+
+def split_message(content: str, max_length: int=MAX_MESSAGE_LENGTH) -> list[str]:
+    """
+    Splits a message too long for Discord into as few messages as fit, between lines.
+    A code block split across messages is closed at the end of one and opened again at the start of the next
+    """
+    if len(content) <= max_length:
+        return [content]
+
+    messages = []
+    message = ""
+    in_code_block = False
+    for line in content.split('\n'):
+        line_toggles_code_block = line.count(CODE_BLOCK_FENCE) % 2 == 1
+        ends_in_code_block = in_code_block != line_toggles_code_block
+        # leave room to close a code block the message would end inside of
+        closing_length = len(CODE_BLOCK_FENCE) + 1 if ends_in_code_block else 0
+        extended_message = f"{message}\n{line}" if message else line
+
+        if message and len(extended_message) + closing_length > max_length:
+            messages.append(f"{message}\n{CODE_BLOCK_FENCE}" if in_code_block else message)
+            extended_message = f"{CODE_BLOCK_FENCE}\n{line}" if in_code_block else line
+
+        # a single line longer than a whole message can only be cut wherever it goes over
+        while len(extended_message) > max_length:
+            messages.append(extended_message[:max_length])
+            extended_message = extended_message[max_length:]
+
+        message = extended_message
+        in_code_block = ends_in_code_block
+
+    if message:
+        messages.append(message)
+    return messages
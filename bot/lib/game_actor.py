@@ -0,0 +1,90 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+
+class GameActor:
+    """
+    Runs the commands for a single game one at a time, in the order they arrived.
+
+    Each command runs to completion, including sending its messages, before the next one for the same game starts,
+    so two players' commands can never read and change the same deck in between each other's awaits.
+    Commands for different games go to different actors, so they still run concurrently.
+
+    The worker only runs while there are commands waiting, so an idle game costs nothing but the actor object.
+    """
+    def __init__(self, game_id: str):
+        self.game_id = game_id
+        self.num_commands = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._queue: asyncio.Queue[tuple[Callable[[], Awaitable[Any]], asyncio.Future, float]] = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    def get_queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def run(self, command: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Queues a command and waits for it to be run, returning its result or raising whatever it raised
+        """
+        result = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((command, result, time.perf_counter()))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+        if not self._worker or self._worker.done():
+            self._worker = asyncio.create_task(self._work())
+
+        return await result
+
+    async def _work(self):
+        while not self._queue.empty():
+            command, result, queued_at = self._queue.get_nowait()
+
+            wait = time.perf_counter() - queued_at
+            self.num_commands += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+            # the caller gave up waiting, e.g. because the bot is shutting down
+            if result.cancelled():
+                continue
+
+            try:
+                command_result = await command()
+            except Exception as e:
+                if not result.cancelled():
+                    result.set_exception(e)
+            else:
+                if not result.cancelled():
+                    result.set_result(command_result)
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            'commands': self.num_commands,
+            'queue_depth': self.get_queue_depth(),
+            'max_queue_depth': self.max_queue_depth,
+            'mean_wait_ms': round(self.total_wait / self.num_commands * 1000, 2) if self.num_commands else 0,
+            'max_wait_ms': round(self.max_wait * 1000, 2),
+        }
+
+
+GAME_ACTORS: dict[str, GameActor] = {}
+
+
+def get_game_actor(game_id: str) -> GameActor:
+    if game_id not in GAME_ACTORS:
+        GAME_ACTORS[game_id] = GameActor(game_id)
+    return GAME_ACTORS[game_id]
+
+
+def discard_game_actor(game_id: str):
+    """
+    Forgets a game's actor once the game is over. Anything already queued for it still gets run
+    """
+    GAME_ACTORS.pop(game_id, None)
+
+
+def get_game_actor_stats() -> dict[str, dict[str, Any]]:
+    return {game_id: actor.get_stats() for game_id, actor in GAME_ACTORS.items()}
@@ -1,43 +1,131 @@
+import asyncio
 import os
 import json
+from typing import Iterable, Optional
 
-from constants import GAME_STATE_FILE
+from constants import GAME_STATE_FILE, GAME_STATE_FOLDER
+from lib.executors import run_disk_io
 from models import OneWithDeathGame
 
 
-def save_game_state(games: list[OneWithDeathGame]):
-    original_state = load_game_state()
+def get_shard_id(guild_id: int, shard_count: int) -> int:
+    """
+    Gets which shard Discord sends a server's events to, and so which worker process owns its games
+    """
+    return (guild_id >> 22) % shard_count
+
+
+def get_guild_game_state_file(guild_id: Optional[int]) -> str:
+    # games saved before their server was stored stay in the single file all games used to be saved to
+    if guild_id is None:
+        return GAME_STATE_FILE
+    return os.path.join(GAME_STATE_FOLDER, f"{guild_id}.json")
+
+
+def save_game_state(games: list[OneWithDeathGame], guild_ids: Optional[Iterable[Optional[int]]]=None):
+    """
+    Saves games to a file per server, so each worker process only ever writes the files of the servers it owns.
+
+    Only the files of the given servers are written, or of every server with a game if none are given.
+    A server with no games left has its file removed.
+    """
+    for game_state_file, game_dicts in get_game_state_files(games, guild_ids).items():
+        write_game_state_file(game_state_file, game_dicts)
+
+
+# one lock per file, so saves of the same file are written in the order they were made
+_game_state_file_locks: dict[str, asyncio.Lock] = {}
+
+
+async def save_game_state_in_background(games: list[OneWithDeathGame], guild_ids: Optional[Iterable[Optional[int]]]=None):
+    """
+    Saves games the same way as save_game_state, but writes the files on the disk I/O threads.
+
+    The games are serialized before this first waits on anything, so later changes to them can't end up in this save
+    """
+    game_state_files = get_game_state_files(games, guild_ids)
+
+    async def write_in_order(game_state_file: str, game_dicts: list[dict]):
+        async with _game_state_file_locks.setdefault(game_state_file, asyncio.Lock()):
+            await run_disk_io(write_game_state_file, game_state_file, game_dicts)
+
+    await asyncio.gather(*(write_in_order(game_state_file, game_dicts) for game_state_file, game_dicts in game_state_files.items()))
+
+
+def get_game_state_files(games: list[OneWithDeathGame], guild_ids: Optional[Iterable[Optional[int]]]=None) -> dict[str, list[dict]]:
+    """
+    Gets what to write to the game state file of each of the given servers, or of every server with a game if none are given
+    """
+    if guild_ids is None:
+        guild_ids = {game.guild_id for game in games}
+
+    return {
+        get_guild_game_state_file(guild_id): [game.to_dict() for game in games if game.guild_id == guild_id]
+        for guild_id in guild_ids
+    }
+
+
+def write_game_state_file(game_state_file: str, game_dicts: list[dict]):
+    if not game_dicts:
+        if os.path.exists(game_state_file):
+            os.remove(game_state_file)
+        return
+
+    original_state = load_game_state_dicts(game_state_file)
     try:
         # if the folder to save the state in doesn't exist, make it
-        os.makedirs(os.path.dirname(GAME_STATE_FILE), exist_ok=True)
+        os.makedirs(os.path.dirname(game_state_file), exist_ok=True)
 
-        with open(GAME_STATE_FILE, 'w') as f:
-            json_serializable_games = [game.to_dict() for game in games]
-            json.dump(json_serializable_games, f, indent=4)
+        with open(game_state_file, 'w') as f:
+            json.dump(game_dicts, f, indent=4)
     except:
         # if we fail to save the new changes, fall back to whatever was there before, if anything
         if original_state:
-            with open(GAME_STATE_FILE, 'w') as f:
+            with open(game_state_file, 'w') as f:
                 json.dump(original_state, f, indent=4)
         else:
             # there was no existing state, so remove the file created during the faulty save
-            if os.path.exists(GAME_STATE_FILE):
-                os.remove(GAME_STATE_FILE)
+            if os.path.exists(game_state_file):
+                os.remove(game_state_file)
         # still raise the error so we know there's an issue
         raise
 
 
-def load_game_state() -> list[OneWithDeathGame]:
-    if not os.path.exists(GAME_STATE_FILE):
-        print("No existing game state found, starting with empty state")
-        return []
-    try:
-        with open(GAME_STATE_FILE, 'r') as f:
-            game_dicts = json.load(f)
+def load_game_state(shard_ids: Optional[Iterable[int]]=None, shard_count: Optional[int]=None) -> list[OneWithDeathGame]:
+    """
+    Loads the games of every server, or only of the servers on the given shards.
+
+    Games not yet migrated to their server's file belong to whichever process runs shard 0
+    """
+    shard_ids = set(shard_ids) if shard_ids is not None else None
+    game_state_files = []
+    if shard_ids is None or 0 in shard_ids:
+        game_state_files.append(GAME_STATE_FILE)
 
-            print(f"Found {len(game_dicts)} existing games upon load")
+    if os.path.isdir(GAME_STATE_FOLDER):
+        for filename in sorted(os.listdir(GAME_STATE_FOLDER)):
+            guild_id, extension = os.path.splitext(filename)
+            if extension != '.json' or not guild_id.isdigit():
+                continue
+            if shard_ids is not None and get_shard_id(int(guild_id), shard_count) not in shard_ids:
+                continue
+            game_state_files.append(os.path.join(GAME_STATE_FOLDER, filename))
 
-            return [OneWithDeathGame.from_dict(d) for d in game_dicts]
+    games = [game for game_state_file in game_state_files for game in load_game_state_file(game_state_file)]
+    print(f"Found {len(games)} existing games upon load")
+    return games
+
+
+def load_game_state_file(game_state_file: str) -> list[OneWithDeathGame]:
+    return [OneWithDeathGame.from_dict(d) for d in load_game_state_dicts(game_state_file)]
+
+
+def load_game_state_dicts(game_state_file: str) -> list[dict]:
+    if not os.path.exists(game_state_file):
+        return []
+    try:
+        with open(game_state_file, 'r') as f:
+            return json.load(f)
     except Exception as e:
         # TODO: use a logger you lazy bastard
         print('ERROR WHILE LOADING GAME STATE: ', e)
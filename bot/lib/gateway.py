@@ -0,0 +1,36 @@
+from typing import Any
+
+import disnake
+
+
+def get_intents(lean: bool) -> disnake.Intents:
+    intents = disnake.Intents.default()
+    intents.message_content = True
+    # kept even when lean, for the member updates and removals which keep the member caches up to date
+    intents.members = True
+    if lean:
+        # nothing the bot does depends on who's typing. presences are already off, since they're privileged
+        intents.typing = False
+    return intents
+
+
+def get_gateway_options(lean: bool) -> dict[str, Any]:
+    """
+    Gets how the bot connects to the gateway and what disnake caches from it.
+
+    By default disnake requests every member of every server as it connects (chunking) and caches them all, which on large servers
+    costs far more memory than the handful of players in running games. Lean, it skips chunking and its member cache flags
+    are all off, so it caches no members at all: the players of running games are kept by the player cache, and anyone else
+    is fetched when they're needed. That's where nearly all of the savings are; dropping typing events only saves on traffic.
+
+    Measured with `make gateway-memory`, against a fake server of 50,000 members with a game of 6 players: every member
+    cached takes about 50 MB (roughly 1 KB a member, in 50 chunks), while lean keeps about 0.15 MB after fetching the 6 players
+    """
+    if not lean:
+        return {'intents': get_intents(lean)}
+
+    return {
+        'intents': get_intents(lean),
+        'chunk_guilds_at_startup': False,
+        'member_cache_flags': disnake.MemberCacheFlags.none(),
+    }
@@ -5,14 +5,25 @@ from errors import CardMissingBuybackError, CardMissingFlashbackError, CardNotFo
 from lib.card_lists import get_card_list
 from lib.card_group import CardGroup
 from lib.util import find_card_index
+from lib.zone_counts import ZoneCounts
 
 
 @dataclass
 class Graveyard(CardGroup):
     cards: list[str] = field(default_factory=lambda: list())
 
+    def __post_init__(self):
+        # not a dataclass field, so it stays out of the saved state and is rebuilt from the cards on load
+        self.zone_counts = ZoneCounts(graveyard=self.cards)
+
     def insert(self, card: str):
         self.cards.append(card)
+        self.zone_counts.add('graveyard', [card])
+
+    def pop(self, card_index: int) -> str:
+        card = self.cards.pop(card_index)
+        self.zone_counts.remove('graveyard', [card])
+        return card
 
 
     def buyback(self, card_name: str):
@@ -26,7 +37,7 @@ class Graveyard(CardGroup):
         if actual_card_name not in buyback_cards:
             raise CardMissingBuybackError(f"{actual_card_name} doesn't have buyback")
         
-        return self.cards.pop(card_in_grave_index)
+        return self.pop(card_in_grave_index)
 
 
     def flashback(self, card_name: str) -> str:
@@ -40,7 +51,7 @@ class Graveyard(CardGroup):
         if actual_card_name not in flashback_cards:
             raise CardMissingFlashbackError(f"{actual_card_name} doesn't have flashback")
         
-        return self.cards.pop(card_in_grave_index)
+        return self.pop(card_in_grave_index)
 
 
     def pull_card_by_name(self, card_name: str) -> str:
@@ -48,14 +59,14 @@ class Graveyard(CardGroup):
         if card_in_grave_index < 0:
             raise CardNotFoundError(f"Card {card_name} cannot be pulled because it is not in the graveyard")
         
-        return self.cards.pop(card_in_grave_index)
+        return self.pop(card_in_grave_index)
 
 
     def pull_card_by_index(self, card_index: int) -> str:
-        if card_index < 0 or card_index > len(self.cards):
+        if card_index < 0 or card_index >= len(self.cards):
             raise IndexError()
         
-        return self.cards.pop(card_index)
+        return self.pop(card_index)
 
 
     def get_recurrable_cards(self) -> list[str]:
@@ -0,0 +1,155 @@
+import asyncio
+import io
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Optional
+
+import disnake
+
+from constants import IMAGE_CACHE_MAX_BYTES
+from lib.executors import run_disk_io
+
+
+class ImageCache:
+    """
+    Least-recently-used cache of image file contents, bounded by the total number of bytes held rather than the number of images.
+
+    Images are read from disk once and then served from memory on every send after that.
+    The cache is shared between the event loop and the disk I/O threads, so every access goes through a lock.
+    """
+    def __init__(self, max_bytes: int=IMAGE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._images: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self._warmup_task: Optional[asyncio.Task] = None
+
+    def __contains__(self, file_path: str) -> bool:
+        return file_path in self._images
+
+    def get(self, file_path: str) -> bytes:
+        with self._lock:
+            if file_path in self._images:
+                self.hits += 1
+                self._images.move_to_end(file_path)
+                return self._images[file_path]
+            self.misses += 1
+
+        return self._load(file_path)
+
+    def _load(self, file_path: str) -> bytes:
+        with open(file_path, 'rb') as f:
+            image_bytes = f.read()
+
+        with self._lock:
+            if file_path not in self._images:
+                self._insert(file_path, image_bytes)
+        return image_bytes
+
+    def _insert(self, file_path: str, image_bytes: bytes):
+        # an image bigger than the whole budget would just evict everything else, so it only gets served from disk
+        if len(image_bytes) > self.max_bytes:
+            return
+
+        self._images[file_path] = image_bytes
+        self.num_bytes += len(image_bytes)
+
+        while self.num_bytes > self.max_bytes:
+            _, evicted_bytes = self._images.popitem(last=False)
+            self.num_bytes -= len(evicted_bytes)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self.num_bytes = 0
+
+    def warm(self, file_paths: list[str]):
+        """
+        Loads images into the cache ahead of their first use, without counting towards the hits and misses
+        """
+        for file_path in file_paths:
+            if file_path in self._images:
+                continue
+            try:
+                self._load(file_path)
+            except OSError as e:
+                print(f"Failed to warm image cache with {file_path}: {e}")
+
+    def start_warmup(self, file_paths: list[str]):
+        """
+        Warms the cache on the disk I/O threads, so the bot can take commands while the images load
+        """
+        if self._warmup_task and not self._warmup_task.done():
+            return
+
+        def warm_and_report():
+            self.warm(file_paths)
+            print(f"Image cache warmed: {self.get_stats()}")
+
+        self._warmup_task = asyncio.create_task(run_disk_io(warm_and_report))
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            'images': len(self._images),
+            'bytes': self.num_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+IMAGE_CACHE = ImageCache()
+
+
+class ImageFileReader(io.RawIOBase):
+    """
+    Read-only file object over an image which isn't in the image cache yet, and is only read once it's needed.
+
+    Sending the file loads it on the disk I/O threads first, so the event loop never waits on the disk for it,
+    and an image which ends up linked from an earlier upload rather than uploaded again is never read at all
+    """
+    def __init__(self, image_file_path: str, image_cache: ImageCache=IMAGE_CACHE):
+        self.image_file_path = image_file_path
+        self.image_cache = image_cache
+        self._reader: Optional[BytesIO] = None
+
+    def is_loaded(self) -> bool:
+        return self._reader is not None
+
+    async def load(self):
+        if self._reader is None:
+            self._reader = BytesIO(await run_disk_io(self.image_cache.get, self.image_file_path))
+
+    def _get_reader(self) -> BytesIO:
+        # anything reading the file without loading it first still gets it, just from the disk there and then
+        if self._reader is None:
+            self._reader = BytesIO(self.image_cache.get(self.image_file_path))
+        return self._reader
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._reader.tell() if self._reader else 0
+
+    def seek(self, offset: int, whence: int=io.SEEK_SET) -> int:
+        return self._get_reader().seek(offset, whence)
+
+    def readinto(self, buffer) -> int:
+        return self._get_reader().readinto(buffer)
+
+
+async def load_image_files(files: list[disnake.File]):
+    """
+    Loads every file about to be sent whose image hasn't been read yet, all at once on the disk I/O threads
+    """
+    await asyncio.gather(*(file.fp.load() for file in files if isinstance(file.fp, ImageFileReader) and not file.fp.is_loaded()))
@@ -0,0 +1,80 @@
+import os
+from typing import Optional
+
+from PIL import Image
+
+from constants import CARD_IMAGE_CACHE_FOLDER, IMAGE_QUALITY, IMAGE_QUALITY_TIERS
+from lib.asset_manifest import get_asset_manifest
+
+
+def get_derivative_location(source_path: str, source_hash: str, quality: str, cache_folder: str=CARD_IMAGE_CACHE_FOLDER) -> str:
+    """
+    Gets where the derivative of a source image is cached. Derivatives are keyed by the hash of their source,
+    so replacing a card image gets it a fresh derivative instead of serving the stale one
+    """
+    card_file_name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(cache_folder, quality, f"{card_file_name}.{source_hash[:16]}.webp")
+
+
+def build_derivative(source_path: str, derivative_path: str, max_size: tuple[int, int], webp_quality: int):
+    with Image.open(source_path) as image:
+        image.thumbnail(max_size, Image.LANCZOS)
+
+        # write to a temporary file first so a crash mid-write can't leave a truncated image in the cache
+        temp_path = f"{derivative_path}.tmp"
+        image.save(temp_path, format='WEBP', quality=webp_quality, method=6)
+    os.replace(temp_path, derivative_path)
+
+
+def get_image_derivatives(quality: str=IMAGE_QUALITY, cache_folder: str=CARD_IMAGE_CACHE_FOLDER) -> dict[str, str]:
+    """
+    Gets the derivatives which have already been built for the given quality tier, without building or clearing out anything,
+    for worker processes whose supervisor has built them already. A card without one is served from its source image
+    """
+    if IMAGE_QUALITY_TIERS.get(quality) is None:
+        return {}
+
+    derivatives = {}
+    for asset in get_asset_manifest().values():
+        derivative_path = get_derivative_location(asset.path, asset.content_hash, quality, cache_folder)
+        if os.path.exists(derivative_path):
+            derivatives[asset.path] = derivative_path
+    return derivatives
+
+
+def build_image_derivatives(quality: str=IMAGE_QUALITY, cache_folder: str=CARD_IMAGE_CACHE_FOLDER) -> dict[str, str]:
+    """
+    Builds the scaled down, recompressed derivative of every card image for the given quality tier, skipping any that are already cached.
+
+    Returns a map of source image path to derivative path. For the "original" tier the map is empty, since the source images are served as is.
+    """
+    if quality not in IMAGE_QUALITY_TIERS:
+        raise ValueError(f"Unknown image quality {quality}, expected one of: {', '.join(IMAGE_QUALITY_TIERS)}")
+
+    tier: Optional[tuple[tuple[int, int], int]] = IMAGE_QUALITY_TIERS[quality]
+    if tier is None:
+        return {}
+    max_size, webp_quality = tier
+
+    tier_folder = os.path.join(cache_folder, quality)
+    os.makedirs(tier_folder, exist_ok=True)
+
+    derivatives = {}
+    num_built = 0
+    for asset in get_asset_manifest().values():
+        derivative_path = get_derivative_location(asset.path, asset.content_hash, quality, cache_folder)
+        if not os.path.exists(derivative_path):
+            build_derivative(asset.path, derivative_path, max_size, webp_quality)
+            num_built += 1
+
+        derivatives[asset.path] = derivative_path
+
+    # clear out derivatives of images which have since been replaced or removed, but not one still being written
+    current_derivatives = set(derivatives.values())
+    for file_name in os.listdir(tier_folder):
+        file_path = os.path.join(tier_folder, file_name)
+        if file_path not in current_derivatives and not file_name.endswith('.tmp'):
+            os.remove(file_path)
+
+    print(f"Card image derivatives for quality {quality}: {num_built} built, {len(derivatives) - num_built} already cached")
+    return derivatives
@@ -0,0 +1,57 @@
+from typing import Union
+
+from disnake.ext.commands.context import Context
+from disnake.interactions import ApplicationCommandInteraction
+from disnake.member import Member
+from disnake.message import Message
+from disnake.user import User
+from disnake.utils import MISSING
+
+
+class InteractionContext:
+    """
+    Lets a slash command's interaction stand in for the Context of a prefix command, so the same command code runs either way.
+
+    The interaction is deferred as soon as it arrives, to stay within Discord's 3 seconds to acknowledge it however long
+    the command then waits for its game. Everything sent to it afterwards is an ephemeral follow-up in the channel the
+    command was used in, which is where a slash command gets the results only its author should see, rather than in a DM.
+    """
+    def __init__(self, interaction: ApplicationCommandInteraction):
+        self.interaction = interaction
+        self.bot = interaction.bot
+        self.author = interaction.author
+        self.guild = interaction.guild
+        self.channel = interaction.channel
+        self.command = interaction.application_command.qualified_name
+        self.message = None
+        self.num_replies = 0
+
+    async def defer(self):
+        await self.interaction.response.defer(ephemeral=True)
+
+    async def send(self, content: str=None, **kwargs) -> Message:
+        self.num_replies += 1
+        # follow-ups take MISSING rather than None for anything not being sent
+        kwargs = {key: value for key, value in kwargs.items() if value is not None}
+        return await self.interaction.followup.send(content if content is not None else MISSING, ephemeral=True, wait=True, **kwargs)
+
+    async def finish(self):
+        """
+        Clears the "thinking..." left by deferring, if the command only posted to other channels and never replied
+        """
+        if not self.num_replies:
+            await self.interaction.delete_original_response()
+
+
+def get_private_destination(ctx: Union[Context, InteractionContext]) -> Union[User, Member, InteractionContext]:
+    """
+    Gets where to send what only the command's author should see: their DMs for a prefix command, or an ephemeral
+    follow-up for a slash command
+    """
+    if isinstance(ctx, InteractionContext):
+        return ctx
+    return ctx.author
+
+
+def is_slash_command(ctx: Union[Context, InteractionContext]) -> bool:
+    return isinstance(ctx, InteractionContext)
@@ -0,0 +1,80 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from constants import LOOP_LAG_THRESHOLD
+
+
+class LoopLagMonitor:
+    """
+    Logs whatever holds up the event loop for longer than the threshold, e.g. a handler reading a file or rendering an image
+    without handing it off to a worker.
+
+    A task on the loop ticks every so often, and a watchdog thread checks on the ticks. When they stop for longer than the threshold,
+    the watchdog logs the stack the loop is stuck in while it's still stuck there, which points at the handler responsible.
+    Once the loop gets going again, the tick logs how long it was held up for.
+    """
+    def __init__(self, threshold: float=LOOP_LAG_THRESHOLD.total_seconds()):
+        self.threshold = threshold
+        self.num_stalls = 0
+        self.max_lag = 0.0
+        self._last_tick = time.monotonic()
+        self._reported_tick: Optional[float] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self.tick())
+        threading.Thread(target=self.watch, name='loop-lag-monitor', daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+
+    async def tick(self):
+        interval = self.threshold / 2
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            lag = now - self._last_tick - interval
+            self._last_tick = now
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                self.num_stalls += 1
+                print(f"The event loop was held up for {lag * 1000:.0f} ms", file=sys.stderr)
+
+    def watch(self):
+        while not self._stopped.wait(self.threshold / 2):
+            last_tick = self._last_tick
+            # the tick is due every half a threshold, so anything past that is how long the loop has been held up
+            if time.monotonic() - last_tick - self.threshold / 2 <= self.threshold or self._reported_tick == last_tick:
+                continue
+
+            # only once per stall, however long it goes on
+            self._reported_tick = last_tick
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            print(f"The event loop has been held up for over {self.threshold * 1000:.0f} ms, at:", file=sys.stderr)
+            traceback.print_stack(frame, file=sys.stderr)
+
+    def get_stats(self) -> dict[str, float]:
+        return {
+            'stalls': self.num_stalls,
+            'max_lag_ms': round(self.max_lag * 1000),
+            'threshold_ms': round(self.threshold * 1000),
+        }
+
+
+LOOP_LAG_MONITOR = LoopLagMonitor()
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from datetime import timedelta
+from typing import Iterable, Optional, Union
+
+from disnake.guild import Guild
+from disnake.member import Member
+from disnake.user import User
+
+from constants import MEMBER_CACHE_TTL
+from models import OneWithDeathGame
+
+
+class MemberNameCache:
+    """
+    Remembers which member each name was resolved to in each server, so resolving the same name again (e.g. the same
+    group of players starting their next game) needs neither a member search through the API nor a walk over every member
+    of the server.
+
+    Entries expire after a while in case they were missed by the gateway events which keep them up to date:
+    a member changing their name or leaving the server drops every name they were found under.
+    """
+    def __init__(self, ttl: timedelta=MEMBER_CACHE_TTL):
+        self.ttl = ttl.total_seconds()
+        self.hits = 0
+        self.misses = 0
+        # (guild id, lowercased name) -> (member, when the entry expires)
+        self._members: dict[tuple[int, str], tuple[Member, float]] = {}
+        # (guild id, member id) -> the names they're cached under, so they can all be dropped together
+        self._names: dict[tuple[int, int], set[str]] = {}
+
+    def get(self, guild_id: int, name: str) -> Optional[Member]:
+        key = (guild_id, name.lower())
+        entry = self._members.get(key)
+        if not entry:
+            return None
+
+        member, expires_at = entry
+        if expires_at < time.monotonic():
+            self.forget(guild_id, member.id)
+            return None
+        return member
+
+    def add(self, member: Member, *names: str):
+        """
+        Caches a member under the names they were found by, plus their account and display names
+        """
+        expires_at = time.monotonic() + self.ttl
+        member_names = self._names.setdefault((member.guild.id, member.id), set())
+        for name in {*names, member.name, member.display_name}:
+            self._members[(member.guild.id, name.lower())] = (member, expires_at)
+            member_names.add(name.lower())
+
+    def forget(self, guild_id: int, member_id: int):
+        for name in self._names.pop((guild_id, member_id), set()):
+            entry = self._members.get((guild_id, name))
+            if entry and entry[0].id == member_id:
+                del self._members[(guild_id, name)]
+
+    def forget_user(self, user: Union[User, Member]):
+        """
+        Drops a user from every server they're cached in, e.g. when they change their account name
+        """
+        for guild_id, member_id in list(self._names):
+            if member_id == user.id:
+                self.forget(guild_id, member_id)
+
+    async def find(self, guild: Guild, name: str) -> Optional[Member]:
+        """
+        Finds a member of a server by name, from this cache, then the server's cached members, then a search through the API
+        """
+        member = self.get(guild.id, name)
+        if member:
+            self.hits += 1
+            return member
+        self.misses += 1
+
+        member = guild.get_member_named(name)
+        if not member:
+            members = await guild.search_members(name)
+            member = members[0] if members else None
+
+        if member:
+            self.add(member, name)
+        return member
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            'names': len(self._members),
+            'members': len(self._names),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+class PlayerCache:
+    """
+    Keeps the members playing in running games, since messages for a game are staged without waiting on anything and so
+    need its players at hand, for when the gateway is lean and disnake doesn't cache any members itself.
+
+    Players are fetched when a command for their game runs and dropped once they're not in any running game.
+    With disnake caching every member, the players are always found in its cache instead and nothing is kept here
+    """
+    def __init__(self):
+        self.num_fetches = 0
+        self._members: dict[tuple[int, int], Member] = {}
+
+    def get(self, guild: Guild, member_id: int) -> Optional[Member]:
+        return guild.get_member(member_id) or self._members.get((guild.id, member_id))
+
+    async def fetch(self, guild: Guild, member_id: int) -> Member:
+        member = self.get(guild, member_id)
+        if not member:
+            self.num_fetches += 1
+            member = await guild.fetch_member(member_id)
+            self._members[(guild.id, member_id)] = member
+        return member
+
+    async def fetch_players(self, guild: Guild, game: OneWithDeathGame):
+        await asyncio.gather(*(self.fetch(guild, member.id) for member in game.members))
+
+    def add(self, member: Member):
+        if not member.guild.get_member(member.id):
+            self._members[(member.guild.id, member.id)] = member
+
+    def update(self, member: Member):
+        """
+        Swaps a cached player for a newer copy of them, e.g. after they changed their name
+        """
+        if (member.guild.id, member.id) in self._members:
+            self._members[(member.guild.id, member.id)] = member
+
+    def forget(self, guild_id: int, member_id: int):
+        self._members.pop((guild_id, member_id), None)
+
+    def keep_only(self, games: Iterable[OneWithDeathGame]):
+        """
+        Drops every cached member who isn't playing in any of the given games
+        """
+        player_ids = {member.id for game in games for member in game.members}
+        for guild_id, member_id in list(self._members):
+            if member_id not in player_ids:
+                del self._members[(guild_id, member_id)]
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            'players': len(self._members),
+            'fetches': self.num_fetches,
+        }
+
+
+MEMBER_CACHE = MemberNameCache()
+PLAYER_CACHE = PlayerCache()
@@ -0,0 +1,311 @@
+import asyncio
+import sys
+from traceback import print_exception
+from typing import Any, Awaitable, Callable, Coroutine, Optional
+
+from disnake.abc import Messageable
+from disnake.enums import ChannelType
+from disnake.ext.commands.context import Context
+from disnake.member import Member
+from disnake.user import User
+
+from constants import COALESCE_MESSAGES, IMAGE_MESSAGE_TIMEOUT, MAX_MESSAGE_ATTACHMENTS, MAX_MESSAGE_LENGTH, PROGRESSIVE_IMAGE_DELIVERY
+from lib.attachments import ATTACHMENT_REGISTRY
+from lib.contact_sheet import get_card_attachments
+from lib.formatting import split_message
+from lib.interactions import InteractionContext
+from lib.send_scheduler import PRIORITY_INFORMATIONAL, PRIORITY_PRIVATE, PRIORITY_PUBLIC, SEND_SCHEDULER
+
+
+class Outbox:
+    """
+    Delivers the messages and other outbound Discord calls a command staged, once its transaction has committed.
+
+    Unless PROGRESSIVE_IMAGE_DELIVERY is turned off, the text goes out first and the card images follow in the background.
+    Unless COALESCE_MESSAGES is turned off, all staged messages for the same destination are merged into as few messages
+    as Discord allows, so a command produces one message per channel and one DM per player however much happened.
+    Deferred actions (e.g. deleting a channel) run after every message has gone out.
+    """
+    def __init__(self, ctx: Context, staged_actions: list[tuple[Optional[Messageable], Callable[..., Awaitable[Any]], tuple, dict]]):
+        self.ctx = ctx
+        # (destination, action, args, kwargs), where destination is only set for staged messages
+        self.staged_actions = staged_actions
+
+    async def deliver(self):
+        staged_actions = self.staged_actions
+
+        staged_image_actions = []
+        if PROGRESSIVE_IMAGE_DELIVERY:
+            staged_actions, staged_image_actions = split_off_images(staged_actions)
+
+        staged_actions = await render_contact_sheets(staged_actions)
+        if COALESCE_MESSAGES:
+            staged_actions = merge_staged_messages(staged_actions)
+
+        staged_messages = [staged_action for staged_action in staged_actions if staged_action[0] is not None]
+        other_actions = [staged_action for staged_action in staged_actions if staged_action[0] is None]
+
+        failed_destinations = await self.fan_out(staged_messages)
+        await self.report_failed_members(failed_destinations)
+
+        # e.g. deleting a channel, which has to wait until the messages have gone out
+        for staged_action in other_actions:
+            await self.send_staged_action(staged_action)
+
+        if staged_image_actions:
+            deliver_in_background(self.deliver_images(staged_image_actions))
+
+    async def fan_out(self, staged_messages: list[tuple], timeout: Optional[float]=None, priority: Optional[int]=None) -> list[Messageable]:
+        """
+        Sends staged messages to all of their destinations at once, so e.g. DMing every player takes about as long as the slowest DM.
+
+        Messages to the same destination still go out one after another in the order they were staged.
+        Every send waits for its turn from the send scheduler, which keeps within Discord's global rate limit and lets DMs
+        go before messages to the game channel, unless a priority is given for all of them.
+
+        Returns the destinations which any message failed to send to.
+        """
+        staged_messages_by_destination: dict[Messageable, list[tuple]] = {}
+        for staged_message in staged_messages:
+            staged_messages_by_destination.setdefault(get_destination_key(staged_message[0]), []).append(staged_message)
+
+        async def send_in_order(destination: Messageable, destination_messages: list[tuple]) -> bool:
+            sent_all = True
+            send_priority = priority if priority is not None else get_send_priority(destination)
+            for staged_message in destination_messages:
+                async with SEND_SCHEDULER.slot(get_rate_limit_bucket(destination), send_priority):
+                    sent_all = await self.send_staged_action(staged_message, timeout) and sent_all
+            return sent_all
+
+        sent = await asyncio.gather(*(
+            send_in_order(destination, destination_messages)
+            for destination, destination_messages in staged_messages_by_destination.items()
+        ))
+        return [destination for destination, sent_all in zip(staged_messages_by_destination, sent) if not sent_all]
+
+    async def report_failed_members(self, failed_destinations: list[Messageable]):
+        """
+        Lets the command's channel know which players didn't get their DMs (e.g. because they don't allow DMs from the server),
+        since those can hold cards only they were meant to see
+        """
+        failed_members = [destination for destination in failed_destinations if isinstance(destination, (Member, User))]
+        if not failed_members:
+            return
+
+        try:
+            await self.ctx.send(f"I couldn't DM {', '.join(member.mention for member in failed_members)}, so they might be missing what that command showed them. Check that DMs from server members are allowed, then use `!hand` to catch up.")
+        except Exception as e:
+            print(f"Failed to report failed DMs for command {self.ctx.command}")
+            print_exception(
+                type(e), e, e.__traceback__, file=sys.stderr
+            )
+
+    async def send_staged_action(self, staged_action: tuple, timeout: Optional[float]=None) -> bool:
+        """
+        Sends a staged message or runs a deferred action, returning whether it succeeded
+        """
+        destination, action, args, kwargs = staged_action
+        try:
+            if destination is not None:
+                # messages go through the registry, so images which were uploaded before are linked rather than uploaded again
+                await asyncio.wait_for(ATTACHMENT_REGISTRY.send(destination, *args, **kwargs), timeout)
+            else:
+                await asyncio.wait_for(action(*args, **kwargs), timeout)
+            return True
+        except asyncio.TimeoutError:
+            print(f"Gave up on a staged message for command {self.ctx.command} after {timeout} seconds")
+        except Exception as e:
+            # the game state is already committed, so one failed send shouldn't stop the rest from going out
+            print(f"Failed to send staged message for command {self.ctx.command}")
+            print_exception(
+                type(e), e, e.__traceback__, file=sys.stderr
+            )
+        return False
+
+    async def deliver_images(self, staged_image_actions: list[tuple]):
+        """
+        Sends the images split off from the command's messages, after its text has already gone out.
+
+        Images for the same destination are combined and then chunked by Discord's attachment limit,
+        and each message only gets so long to send, so one slow upload can't hold up the rest.
+        """
+        staged_image_actions = merge_staged_messages(await render_contact_sheets(staged_image_actions))
+        await self.fan_out(staged_image_actions, timeout=IMAGE_MESSAGE_TIMEOUT.total_seconds(), priority=PRIORITY_INFORMATIONAL)
+
+
+def get_destination_key(destination: Messageable) -> Messageable:
+    # replies to a command go to the channel it was sent in, so they're grouped with anything else sent there
+    if isinstance(destination, Context):
+        return destination.channel
+    return destination
+
+
+def get_send_priority(destination: Messageable) -> int:
+    # a DM or an ephemeral reply to a slash command is where a player gets what only they can see
+    if isinstance(destination, (Member, User, InteractionContext)) or getattr(destination, 'type', None) == ChannelType.private:
+        return PRIORITY_PRIVATE
+    return PRIORITY_PUBLIC
+
+
+def get_rate_limit_bucket(destination: Messageable):
+    """
+    Gets the id Discord rate limits messages to a destination by, which is its channel's id
+    """
+    if isinstance(destination, (Member, User)):
+        # until the bot has DMed someone it doesn't know the id of their DM channel
+        dm_channel = getattr(destination, 'dm_channel', None)
+        return dm_channel.id if dm_channel else ('dm', destination.id)
+    if isinstance(destination, InteractionContext):
+        # follow-ups go through the interaction's webhook, which is limited separately from any channel
+        return ('interaction', destination.interaction.id)
+    return getattr(destination, 'id', destination)
+
+
+def split_off_images(staged_actions: list[tuple]) -> tuple[list[tuple], list[tuple]]:
+    """
+    Splits the images off of staged messages, so the text can be sent without waiting on them.
+    Returns the messages without their images, and a message for the images of each message which had any.
+    """
+    text_actions = []
+    image_actions = []
+    for destination, action, args, kwargs in staged_actions:
+        image_kwargs = {key: kwargs[key] for key in ['file', 'files', 'contact_sheet'] if kwargs.get(key)}
+        if destination is None or not image_kwargs:
+            text_actions.append((destination, action, args, kwargs))
+            continue
+
+        text_kwargs = {key: value for key, value in kwargs.items() if key not in ['file', 'files', 'contact_sheet']}
+        if args or text_kwargs.get('content'):
+            text_actions.append((destination, action, args, text_kwargs))
+        image_actions.append((destination, action, (), image_kwargs))
+
+    return text_actions, image_actions
+
+
+# keeps a reference to every background delivery so they can't be garbage collected before they finish
+_background_deliveries: set[asyncio.Task] = set()
+
+
+def deliver_in_background(delivery: Coroutine):
+    task = asyncio.create_task(delivery)
+    _background_deliveries.add(task)
+    task.add_done_callback(_background_deliveries.discard)
+
+
+async def wait_for_background_deliveries():
+    """
+    Waits for every delivery still running in the background, e.g. before shutting down
+    """
+    while _background_deliveries:
+        await asyncio.gather(*_background_deliveries)
+
+
+async def render_contact_sheets(staged_actions: list[tuple]) -> list[tuple]:
+    """
+    Swaps the card names staged for contact sheets with the rendered sheets, rendering all of them concurrently
+    """
+    sheet_indexes = [i for i, (_, _, _, kwargs) in enumerate(staged_actions) if kwargs.get('contact_sheet')]
+    if not sheet_indexes:
+        return staged_actions
+
+    sheets = await asyncio.gather(*(get_card_attachments(staged_actions[i][3]['contact_sheet']) for i in sheet_indexes))
+
+    staged_actions = list(staged_actions)
+    for i, sheet_files in zip(sheet_indexes, sheets):
+        destination, action, args, kwargs = staged_actions[i]
+        kwargs = {key: value for key, value in kwargs.items() if key != 'contact_sheet'}
+        kwargs['files'] = [*(kwargs.get('files') or []), *sheet_files]
+        staged_actions[i] = (destination, action, args, kwargs)
+    return staged_actions
+
+
+# the only arguments merged messages can be made of, so a message with anything else (e.g. embeds or a view) is sent as it was staged
+MERGEABLE_MESSAGE_KWARGS = {'content', 'file', 'files'}
+
+
+def merge_staged_messages(staged_actions: list[tuple]) -> list[tuple]:
+    """
+    Merges staged messages going to the same destination, keeping the order each destination was first sent to.
+
+    Only messages made of nothing but content and files are merged. Their content is joined by blank lines, and each message's files
+    stay right below its content, so a new message is started for content following any files, or where Discord's length
+    or attachment limits would be passed.
+    Content too long for a single message is split between lines.
+    Any other message is passed through as it was staged, and messages staged for the same destination after it are only merged
+    with each other, so they still go out after it. Deferred non-message actions keep their position at the end.
+    """
+    # (destination, the content and files of the messages merged into it, or the staged message passed through as is)
+    entries: list[tuple[Messageable, Optional[list[tuple[Optional[str], list]]], Optional[tuple]]] = []
+    open_merges: dict[Messageable, list[tuple[Optional[str], list]]] = {}
+    other_actions = []
+
+    for destination, action, args, kwargs in staged_actions:
+        if destination is None:
+            other_actions.append((destination, action, args, kwargs))
+            continue
+
+        destination = get_destination_key(destination)
+        if len(args) > 1 or not set(kwargs) <= MERGEABLE_MESSAGE_KWARGS:
+            open_merges.pop(destination, None)
+            entries.append((destination, None, (destination, action, args, kwargs)))
+            continue
+
+        if destination not in open_merges:
+            open_merges[destination] = []
+            entries.append((destination, open_merges[destination], None))
+
+        content = args[0] if args else kwargs.get('content')
+        files = [kwargs['file']] if kwargs.get('file') else []
+        files.extend(kwargs.get('files') or [])
+        open_merges[destination].append((str(content) if content else None, files))
+
+    merged_actions = []
+    for destination, staged_messages, staged_action in entries:
+        if staged_action:
+            merged_actions.append(staged_action)
+        else:
+            merged_actions.extend((destination, destination.send, (), kwargs) for kwargs in merge_messages(staged_messages))
+
+    return [*merged_actions, *other_actions]
+
+
+def merge_messages(staged_messages: list[tuple[Optional[str], list]]) -> list[dict]:
+    """
+    Packs the content and files of messages into as few messages as Discord allows, keeping each message's files with its content
+    """
+    pieces = []
+    for content, files in staged_messages:
+        contents = split_message(content) if content else []
+        file_chunks = [files[i:i + MAX_MESSAGE_ATTACHMENTS] for i in range(0, len(files), MAX_MESSAGE_ATTACHMENTS)]
+        # the files go with the last of the content, since that's what ends up right above them
+        pieces.extend((part, []) for part in contents[:-1])
+        pieces.append((contents[-1] if contents else None, file_chunks[0] if file_chunks else []))
+        pieces.extend((None, file_chunk) for file_chunk in file_chunks[1:])
+
+    messages: list[tuple[list[str], list]] = []
+    for content, files in pieces:
+        if not content and not files:
+            continue
+
+        if messages:
+            merged_contents, merged_files = messages[-1]
+            merged_length = len('\n\n'.join([*merged_contents, content])) if content else 0
+            # files show up below all of a message's content, so content after a message's files needs a message of its own
+            fits_content = not content or (not merged_files and merged_length <= MAX_MESSAGE_LENGTH)
+            if fits_content and len(merged_files) + len(files) <= MAX_MESSAGE_ATTACHMENTS:
+                if content:
+                    merged_contents.append(content)
+                merged_files.extend(files)
+                continue
+
+        messages.append(([content] if content else [], list(files)))
+
+    message_kwargs = []
+    for contents, files in messages:
+        kwargs = {}
+        if contents:
+            kwargs['content'] = '\n\n'.join(contents)
+        if files:
+            kwargs['files'] = files
+        message_kwargs.append(kwargs)
+    return message_kwargs
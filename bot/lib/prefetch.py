@@ -0,0 +1,64 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from constants import PREFETCH_DEPTH
+from lib.executors import run_disk_io
+from lib.image_cache import IMAGE_CACHE
+
+
+class ImagePrefetcher:
+    """
+    Warms the images of the cards about to come off the top of the deck, so the next draw, scry or mill doesn't start from a cold cache.
+
+    What's prefetched never leaves the process: images are only loaded into memory, and nothing about which cards were picked
+    is sent anywhere or logged, since that would give away the order of the deck.
+
+    A card image served from the image cache afterwards counts as a hit if it was prefetched, or a miss if it had to be read from disk
+    without having been. Images already in memory for some other reason (e.g. the One with Death art) don't count either way.
+    """
+    def __init__(self, depth: int=PREFETCH_DEPTH):
+        self.depth = depth
+        self.num_prefetched = 0
+        self.hits = 0
+        self.misses = 0
+        self._pending: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+
+    def prefetch(self, image_file_paths: list[str], is_in_memory: Callable[[str], bool]=IMAGE_CACHE.__contains__):
+        """
+        Marks the given images as prefetched, then loads whichever aren't in memory yet on the disk I/O threads
+        """
+        new_image_file_paths = [path for path in image_file_paths if path not in self._pending]
+        self._pending.update(new_image_file_paths)
+        self.num_prefetched += len(new_image_file_paths)
+
+        images_to_load = [path for path in new_image_file_paths if not is_in_memory(path)]
+        if images_to_load:
+            self.run_in_background(run_disk_io(IMAGE_CACHE.warm, images_to_load))
+
+    def run_in_background(self, work: Awaitable):
+        task = asyncio.ensure_future(work)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def record_served(self, image_file_path: str, is_cached: bool):
+        if image_file_path in self._pending:
+            self._pending.discard(image_file_path)
+            self.hits += 1
+        elif not is_cached:
+            self.misses += 1
+
+    def get_hit_rate(self) -> float:
+        num_served = self.hits + self.misses
+        return self.hits / num_served if num_served else 0.0
+
+    def get_stats(self) -> dict[str, float]:
+        return {
+            'prefetched': self.num_prefetched,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.get_hit_rate(),
+        }
+
+
+PREFETCHER = ImagePrefetcher()
@@ -0,0 +1,203 @@
+import asyncio
+import heapq
+import time
+from contextlib import asynccontextmanager
+from itertools import count
+from typing import Any, AsyncIterator, Hashable, Optional
+
+from constants import (
+    CHANNEL_RATE_LIMIT,
+    CHANNEL_RATE_LIMIT_PERIOD,
+    GLOBAL_RATE_LIMIT,
+    GLOBAL_RATE_LIMIT_PERIOD,
+    MAX_CONCURRENT_SENDS,
+)
+
+
+# what a message carries decides how soon it goes out when sends have to wait their turn
+PRIORITY_PRIVATE = 0  # hidden results only one player can see, e.g. the cards they drew
+PRIORITY_PUBLIC = 1  # changes to the game every player needs to know about
+PRIORITY_INFORMATIONAL = 2  # everything else, e.g. card images following the text they illustrate
+
+PRIORITY_NAMES = {
+    PRIORITY_PRIVATE: 'private',
+    PRIORITY_PUBLIC: 'public',
+    PRIORITY_INFORMATIONAL: 'informational',
+}
+
+GLOBAL_BUCKET = 'global'
+
+
+class TokenBucket:
+    """
+    Tracks how many requests are left in one of Discord's rate limit buckets, refilling evenly over the bucket's period
+    """
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.period = period
+        self.tokens = float(capacity)
+        self._updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        # a bucket can be made after the time it's first checked at was taken, and mustn't go back to before it was made
+        if now <= self._updated_at:
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.capacity / self.period)
+        self._updated_at = now
+
+    def get_wait(self, now: float) -> float:
+        """
+        How long until a request can be made in this bucket, 0 if one can be made right away
+        """
+        self._refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) * self.period / self.capacity
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class SendScheduler:
+    """
+    Decides which message goes out next when more messages are waiting than can be sent at once.
+
+    Each send waits for a free slot (at most MAX_CONCURRENT_SENDS sends are in flight) and for a token in the global bucket,
+    which mirrors Discord's limit on requests across the whole bot, so the highest priority waiting send gets the next token
+    rather than whichever send happened to come first. Sends of the same priority go out in the order they asked.
+
+    Each channel's own limit is left to disnake, which learns it from Discord's X-RateLimit headers and waits out any 429 itself.
+    Giving CHANNEL_RATE_LIMIT paces every channel here as well, e.g. to test against a fake Discord with a known limit.
+    """
+    def __init__(
+        self,
+        max_concurrent_sends: int=MAX_CONCURRENT_SENDS,
+        bucket_capacity: Optional[int]=CHANNEL_RATE_LIMIT,
+        bucket_period: float=CHANNEL_RATE_LIMIT_PERIOD.total_seconds(),
+        global_capacity: int=GLOBAL_RATE_LIMIT,
+        global_period: float=GLOBAL_RATE_LIMIT_PERIOD.total_seconds(),
+    ):
+        self.max_concurrent_sends = max_concurrent_sends
+        self.bucket_capacity = bucket_capacity
+        self.bucket_period = bucket_period
+        self.global_bucket = TokenBucket(global_capacity, global_period)
+        self._buckets: dict[Hashable, TokenBucket] = {}
+        # (priority, arrival order, bucket key, future to wake the send up with)
+        self._waiting: list[tuple[int, int, Hashable, asyncio.Future]] = []
+        self._arrivals = count()
+        self._num_in_flight = 0
+        self._dispatch_handle: Optional[asyncio.TimerHandle] = None
+
+        self.num_sends = {priority: 0 for priority in PRIORITY_NAMES}
+        self.total_wait = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self.max_wait = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self.max_queue_depth = 0
+
+    def get_bucket(self, bucket_key: Hashable) -> Optional[TokenBucket]:
+        if bucket_key == GLOBAL_BUCKET:
+            return self.global_bucket
+        if self.bucket_capacity is None:
+            return None
+        if bucket_key not in self._buckets:
+            self._buckets[bucket_key] = TokenBucket(self.bucket_capacity, self.bucket_period)
+        return self._buckets[bucket_key]
+
+    @asynccontextmanager
+    async def slot(self, bucket_key: Hashable, priority: int=PRIORITY_PUBLIC) -> AsyncIterator[None]:
+        """
+        Waits until a message to the given bucket (e.g. a channel id) can be sent, and holds its slot while it's sent
+        """
+        queued_at = time.perf_counter()
+        ready = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._arrivals), bucket_key, ready))
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiting))
+        self._dispatch()
+
+        try:
+            await ready
+        except asyncio.CancelledError:
+            if ready.done() and not ready.cancelled():
+                # it was handed a slot just as it gave up, so pass the slot on
+                self._release()
+            raise
+
+        wait = time.perf_counter() - queued_at
+        self.num_sends[priority] += 1
+        self.total_wait[priority] += wait
+        self.max_wait[priority] = max(self.max_wait[priority], wait)
+
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        self._num_in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """
+        Hands out free slots to waiting sends, highest priority first, skipping any whose bucket is empty for now
+        """
+        if self._dispatch_handle:
+            self._dispatch_handle.cancel()
+            self._dispatch_handle = None
+
+        now = time.monotonic()
+        next_wait = None
+        still_waiting = []
+        while self._waiting and self._num_in_flight < self.max_concurrent_sends:
+            waiter = heapq.heappop(self._waiting)
+            _, _, bucket_key, ready = waiter
+            if ready.cancelled():
+                continue
+
+            bucket = self.get_bucket(bucket_key)
+            wait = max(bucket.get_wait(now) if bucket else 0, self.global_bucket.get_wait(now))
+            if wait > 0:
+                still_waiting.append(waiter)
+                next_wait = wait if next_wait is None else min(next_wait, wait)
+                if self.global_bucket.get_wait(now) > 0:
+                    # nothing else can go out either
+                    break
+                continue
+
+            if bucket:
+                bucket.take(now)
+            self.global_bucket.take(now)
+            self._num_in_flight += 1
+            ready.set_result(None)
+
+        for waiter in still_waiting:
+            heapq.heappush(self._waiting, waiter)
+
+        if next_wait is not None:
+            self._dispatch_handle = asyncio.get_running_loop().call_later(next_wait, self._dispatch)
+
+    def get_queue_depth(self) -> int:
+        return len(self._waiting)
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            'in_flight': self._num_in_flight,
+            'queue_depth': self.get_queue_depth(),
+            'max_queue_depth': self.max_queue_depth,
+            **{
+                f'{name}_sends': self.num_sends[priority]
+                for priority, name in PRIORITY_NAMES.items()
+            },
+            **{
+                f'{name}_mean_wait_ms': round(self.total_wait[priority] / self.num_sends[priority] * 1000, 2) if self.num_sends[priority] else 0
+                for priority, name in PRIORITY_NAMES.items()
+            },
+            **{
+                f'{name}_max_wait_ms': round(self.max_wait[priority] * 1000, 2)
+                for priority, name in PRIORITY_NAMES.items()
+            },
+        }
+
+
+SEND_SCHEDULER = SendScheduler()
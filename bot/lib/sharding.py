@@ -0,0 +1,137 @@
+import asyncio
+import sys
+import time
+from traceback import print_exception
+from typing import Callable, Optional
+
+import disnake
+
+from constants import WORKER_MAX_RESTART_DELAY, WORKER_RESTART_DELAY
+from lib.game_state import get_guild_game_state_file, load_game_state_file, save_game_state
+
+
+def get_shard_ranges(shard_count: int, num_workers: int) -> list[list[int]]:
+    """
+    Splits the shards into a contiguous range for each worker process, as evenly as they go
+    """
+    num_workers = max(1, min(num_workers, shard_count))
+    shard_ranges = []
+    start = 0
+    for worker in range(num_workers):
+        end = start + shard_count // num_workers + (1 if worker < shard_count % num_workers else 0)
+        shard_ranges.append(list(range(start, end)))
+        start = end
+    return shard_ranges
+
+
+async def get_recommended_shard_count(client: disnake.Client) -> int:
+    shard_count, _, _ = await client.http.get_bot_gateway()
+    return shard_count
+
+
+def has_unmigrated_games() -> bool:
+    """
+    Whether any games were saved before games stored their server, and so still need migrating
+    """
+    return bool(load_game_state_file(get_guild_game_state_file(None)))
+
+
+async def migrate_game_state(client: disnake.Client):
+    """
+    Moves games saved before their server was stored into their server's file, looking up the server through each
+    game's channel, so they end up with whichever worker process owns that server.
+
+    Games whose channel can't be found any more stay where they are, with the process running shard 0
+    """
+    games = load_game_state_file(get_guild_game_state_file(None))
+    if not games:
+        return
+
+    for game in games:
+        try:
+            channel = await client.http.get_channel(game.text_channel)
+            game.guild_id = int(channel['guild_id'])
+        except Exception as e:
+            print(f"Couldn't find the server of game {game.id}, so it's staying with shard 0")
+            print_exception(
+                type(e), e, e.__traceback__, file=sys.stderr
+            )
+
+    migrated_guild_ids = {game.guild_id for game in games if game.guild_id is not None}
+    if not migrated_guild_ids:
+        return
+    print(f"Moving {sum(game.guild_id is not None for game in games)} saved games into their servers' files")
+
+    # the servers' own files may already have games in them
+    for guild_id in migrated_guild_ids:
+        games.extend(load_game_state_file(get_guild_game_state_file(guild_id)))
+    save_game_state(games, {None, *migrated_guild_ids})
+
+
+class ShardSupervisor:
+    """
+    Runs each range of shards in its own worker process, and restarts any worker which dies.
+
+    A worker which dies soon after starting waits twice as long as last time before it's restarted, up to
+    WORKER_MAX_RESTART_DELAY, so one which can't start (e.g. Discord refusing to identify it) doesn't spin.
+    """
+    def __init__(
+        self,
+        get_worker_command: Callable[[list[int], int], list[str]],
+        shard_count: int,
+        num_workers: int,
+        restart_delay: float=WORKER_RESTART_DELAY.total_seconds(),
+        max_restart_delay: float=WORKER_MAX_RESTART_DELAY.total_seconds(),
+    ):
+        self.get_worker_command = get_worker_command
+        self.shard_count = shard_count
+        self.shard_ranges = get_shard_ranges(shard_count, num_workers)
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.num_restarts = [0] * len(self.shard_ranges)
+        self._processes: list[Optional[asyncio.subprocess.Process]] = [None] * len(self.shard_ranges)
+
+    async def run(self):
+        try:
+            await asyncio.gather(*(self.supervise(worker) for worker in range(len(self.shard_ranges))))
+        finally:
+            await self.stop()
+
+    async def supervise(self, worker: int):
+        shard_ids = self.shard_ranges[worker]
+        restart_delay = self.restart_delay
+        while True:
+            print(f"Starting worker {worker} for shards {shard_ids[0]}-{shard_ids[-1]} of {self.shard_count}")
+            started_at = time.monotonic()
+            process = await asyncio.create_subprocess_exec(*self.get_worker_command(shard_ids, self.shard_count))
+            self._processes[worker] = process
+            return_code = await process.wait()
+            self._processes[worker] = None
+
+            if time.monotonic() - started_at > self.max_restart_delay:
+                # it ran long enough that this isn't the same failure over and over
+                restart_delay = self.restart_delay
+            print(f"Worker {worker} for shards {shard_ids[0]}-{shard_ids[-1]} exited with code {return_code}, restarting it in {restart_delay:.1f}s")
+            self.num_restarts[worker] += 1
+            await asyncio.sleep(restart_delay)
+            restart_delay = min(restart_delay * 2, self.max_restart_delay)
+
+    def kill(self, worker: int):
+        """
+        Kills a worker process, which is then restarted like any other dead worker
+        """
+        process = self._processes[worker]
+        if process and process.returncode is None:
+            process.kill()
+
+    async def stop(self):
+        for process in self._processes:
+            if process and process.returncode is None:
+                process.terminate()
+        await asyncio.gather(*(process.wait() for process in self._processes if process))
+
+    def get_stats(self) -> dict[str, list[int]]:
+        return {
+            'shard_ranges': self.shard_ranges,
+            'restarts': self.num_restarts,
+        }
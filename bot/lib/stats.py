@@ -0,0 +1,81 @@
+import asyncio
+from datetime import timedelta
+from typing import Any, Optional
+
+from constants import STATS_LOG_INTERVAL
+from lib.admission import ADMISSION_CONTROLLER
+from lib.channel_pool import CHANNEL_POOL
+from lib.game_actor import get_game_actor_stats
+from lib.image_cache import IMAGE_CACHE
+from lib.loop_monitor import LOOP_LAG_MONITOR
+from lib.member_cache import MEMBER_CACHE, PLAYER_CACHE
+from lib.prefetch import PREFETCHER
+from lib.send_scheduler import SEND_SCHEDULER
+
+
+def get_game_actor_totals() -> dict[str, Any]:
+    """
+    Sums up the stats of every game's actor, since there's one per running game
+    """
+    actor_stats = list(get_game_actor_stats().values())
+    num_commands = sum(stats['commands'] for stats in actor_stats)
+    return {
+        'games': len(actor_stats),
+        'commands': num_commands,
+        'queue_depth': sum(stats['queue_depth'] for stats in actor_stats),
+        'max_queue_depth': max((stats['max_queue_depth'] for stats in actor_stats), default=0),
+        'mean_wait_ms': round(sum(stats['mean_wait_ms'] * stats['commands'] for stats in actor_stats) / num_commands, 2) if num_commands else 0,
+        'max_wait_ms': max((stats['max_wait_ms'] for stats in actor_stats), default=0),
+    }
+
+
+def get_stats() -> dict[str, dict[str, Any]]:
+    return {
+        'loop': LOOP_LAG_MONITOR.get_stats(),
+        'admission': ADMISSION_CONTROLLER.get_stats(),
+        'game_actors': get_game_actor_totals(),
+        'sends': SEND_SCHEDULER.get_stats(),
+        'image_cache': IMAGE_CACHE.get_stats(),
+        'prefetch': PREFETCHER.get_stats(),
+        'member_cache': MEMBER_CACHE.get_stats(),
+        'player_cache': PLAYER_CACHE.get_stats(),
+        'channel_pool': CHANNEL_POOL.get_stats(),
+    }
+
+
+def format_stats(stats: dict[str, dict[str, Any]]) -> str:
+    """
+    Formats stats as a single log line, e.g. "Stats: loop stalls=0 max_lag_ms=3 threshold_ms=250 | admission admitted=12 ..."
+    """
+    return "Stats: " + " | ".join(
+        f"{name} " + " ".join(f"{key}={value}" for key, value in section.items())
+        for name, section in stats.items()
+    )
+
+
+class StatsLogger:
+    """
+    Logs the stats every cache, queue and rate limiter keeps as a single line every so often, so how well each of them
+    is working can be read straight off the bot's output
+    """
+    def __init__(self, interval: Optional[timedelta]=STATS_LOG_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if not self.interval or (self._task and not self._task.done()):
+            return
+
+        self._task = asyncio.create_task(self.log_periodically())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def log_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval.total_seconds())
+            print(format_stats(get_stats()))
+
+
+STATS_LOGGER = StatsLogger()
@@ -0,0 +1,168 @@
+import sys
+from contextvars import ContextVar
+from copy import deepcopy
+from typing import Any, Awaitable, Callable, Optional
+
+from disnake.abc import Messageable
+from disnake.ext.commands.context import Context
+
+from errors import InvalidCommandError
+from lib.audit import find_conservation_violations
+from lib.card_image import prefetch_card_images
+from lib.game_state import save_game_state_in_background
+from lib.outbox import Outbox
+from models import OneWithDeathGame
+
+
+_current_transaction: ContextVar[Optional['GameTransaction']] = ContextVar('current_transaction', default=None)
+
+
+class GameTransaction:
+    """
+    Wraps all game mutations made by a single command.
+
+    The game the command is for is snapshotted when the transaction is entered, and outbound messages are staged instead of sent.
+    When the command finishes, the game state is persisted once (only if anything changed) and then the staged messages are
+    handed to an Outbox to go out, so a failing Discord send can never leave a half-saved game behind.
+
+    Raising InvalidCommandError inside the transaction rolls that game back to its snapshot, undoes any game the command started
+    or ended, drops the staged messages and replies to the command author with the error instead.
+    Other games are never touched, since their own commands can be committing on their actors at the same time.
+
+    A transaction opened while another one is active (e.g. a command handler invoked by another command) joins the outer one.
+    """
+    def __init__(self, ctx: Context, games: list[OneWithDeathGame], game: Optional[OneWithDeathGame]=None):
+        self.ctx = ctx
+        self.games = games
+        self.game = game
+        self.num_saves = 0
+        # (destination, action, args, kwargs), where destination is only set for staged messages
+        self._staged_actions: list[tuple[Optional[Messageable], Callable[..., Awaitable[Any]], tuple, dict]] = []
+        self._original_games: list[OneWithDeathGame] = []
+        self._snapshot: Optional[OneWithDeathGame] = None
+        self._outer: Optional[GameTransaction] = None
+        self._token = None
+
+    async def __aenter__(self) -> 'GameTransaction':
+        self._outer = _current_transaction.get()
+        if self._outer:
+            return self._outer
+
+        # only the list itself is copied, to tell which games the command started or ended
+        self._original_games = list(self.games)
+        self._snapshot = deepcopy(self.game) if self.game else None
+        self._token = _current_transaction.set(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        if self._outer:
+            # let the outermost transaction decide whether to commit or roll back
+            return False
+
+        _current_transaction.reset(self._token)
+
+        if exc_type is None:
+            await self.commit()
+            await self.flush()
+            return False
+
+        self.rollback()
+
+        if issubclass(exc_type, InvalidCommandError):
+            await self.ctx.send(str(exc))
+            return True
+
+        return False
+
+    def send(self, destination: Messageable, *args, **kwargs):
+        """
+        Stage a message to be sent once the transaction has been committed.
+
+        Besides the usual arguments to send, contact_sheet can be given a list of card names to attach a contact sheet of
+        """
+        self._staged_actions.append((destination, destination.send, args, kwargs))
+
+    def defer(self, action: Callable[..., Awaitable[Any]], *args, **kwargs):
+        """
+        Stage any outbound Discord call (e.g. deleting a channel) to run once the transaction has been committed
+        """
+        self._staged_actions.append((None, action, args, kwargs))
+
+    def get_started_games(self) -> list[OneWithDeathGame]:
+        original_game_ids = {id(game) for game in self._original_games}
+        return [game for game in self.games if id(game) not in original_game_ids]
+
+    def get_ended_games(self) -> list[OneWithDeathGame]:
+        game_ids = {id(game) for game in self.games}
+        return [game for game in self._original_games if id(game) not in game_ids]
+
+    def has_changes(self) -> bool:
+        return bool(self.get_changed_games() or self.get_ended_games())
+
+    def get_changed_games(self) -> list[OneWithDeathGame]:
+        """
+        Gets the command's game if it changed and is still running, along with any game the command started
+        """
+        changed_games = self.get_started_games()
+        is_running = any(game is self.game for game in self.games)
+        is_started = any(game is self.game for game in changed_games)
+        if self.game is not None and is_running and not is_started and self.game != self._snapshot:
+            changed_games.insert(0, self.game)
+        return changed_games
+
+    def get_changed_guild_ids(self) -> set[Optional[int]]:
+        """
+        Gets the servers whose games this command changed, started or ended, since only their saved state needs writing
+        """
+        return {game.guild_id for game in [*self.get_changed_games(), *self.get_ended_games()]}
+
+    async def commit(self):
+        if self.has_changes():
+            # written on the disk I/O threads, but still before anything is sent
+            await save_game_state_in_background(self.games, self.get_changed_guild_ids())
+            self.num_saves += 1
+            self.audit()
+            self.prefetch()
+
+    def audit(self):
+        """
+        Reports any game this command changed which no longer holds exactly the cards it started with
+        """
+        for game in self.get_changed_games():
+            violations = find_conservation_violations(game)
+            if not violations:
+                continue
+
+            command_text = self.ctx.message.content if getattr(self.ctx, 'message', None) else self.ctx.command
+            print(f"CARD CONSERVATION VIOLATION in game {game.id} after command `{command_text}` from {self.ctx.author}:", file=sys.stderr)
+            for violation in violations:
+                print(f"    {violation}", file=sys.stderr)
+
+            self.send(self.ctx, f"Uh-oh, the Deck of Death lost track of some cards after that command ({'; '.join(violations)}). Reach out to @snowydark to get this fixed, because it shouldn't happen.")
+
+    def prefetch(self):
+        """
+        Gets the images for the top of each changed game's deck ready, since they're what the next draw, scry or mill will show
+        """
+        for game in self.get_changed_games():
+            prefetch_card_images(game.deck.cards)
+
+    def rollback(self):
+        if self.game is not None and self._snapshot is not None:
+            vars(self.game).update(vars(self._snapshot))
+
+        # only the games this command started or ended, since other games can have started or ended in the meantime
+        started_game_ids = {id(game) for game in self.get_started_games()}
+        ended_games = self.get_ended_games()
+        self.games[:] = [game for game in self.games if id(game) not in started_game_ids]
+        original_indexes = {id(game): i for i, game in enumerate(self._original_games)}
+        for game in ended_games:
+            self.games.insert(min(original_indexes[id(game)], len(self.games)), game)
+        self._staged_actions = []
+
+    async def flush(self):
+        """
+        Hands everything staged over to be delivered, now that the game state has been committed
+        """
+        staged_actions, self._staged_actions = self._staged_actions, []
+        await Outbox(self.ctx, staged_actions).deliver()
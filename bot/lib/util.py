@@ -1,8 +1,18 @@
+TYPOGRAPHIC_QUOTES = str.maketrans({'‘': '\'', '’': '\'', '“': '"', '”': '"'})
+
+
+def normalize_card_name(card_name: str) -> str:
+    """
+    Normalizes how a card name is written, e.g. replacing curly apostrophes (Oona’s Grace) with straight ones (Oona's Grace)
+    """
+    return card_name.strip().translate(TYPOGRAPHIC_QUOTES)
+
+
 def sanitize_card_name(card_name: str) -> str:
     """
     Sanitizes a card name to not include uppercase characters or quotes, to be used for comparison
     """
-    return card_name.lower().replace('\'', '').replace('"', '')
+    return normalize_card_name(card_name).lower().replace('\'', '').replace('"', '')
 
 
 def find_card_index(card_name: str, card_list: str) -> int:
@@ -11,6 +21,6 @@ def find_card_index(card_name: str, card_list: str) -> int:
 
     Returns -1 if the card is not found.
     """
-    card_index = [i for i, grave_card in enumerate(card_list) if grave_card.lower() == card_name.lower()]
+    card_index = [i for i, grave_card in enumerate(card_list) if sanitize_card_name(grave_card) == sanitize_card_name(card_name)]
 
     return card_index[0] if len(card_index) > 0 else -1
@@ -0,0 +1,27 @@
+from collections import Counter
+from typing import Iterable
+
+
+class ZoneCounts:
+    """
+    Running count of how many copies of each card are in each zone (deck, hands, graveyard, etc.).
+
+    The counts are updated as cards move rather than recounted from the zones, so totalling them up only costs
+    as much as the number of distinct cards in the game.
+    """
+    def __init__(self, **zones: Iterable[str]):
+        self.zones: dict[str, Counter] = {zone: Counter(cards) for zone, cards in zones.items()}
+
+    def add(self, zone: str, cards: Iterable[str]):
+        self.zones[zone].update(cards)
+
+    def remove(self, zone: str, cards: Iterable[str]):
+        self.zones[zone].subtract(cards)
+
+    def move(self, from_zone: str, to_zone: str, cards: Iterable[str]):
+        cards = list(cards)
+        self.remove(from_zone, cards)
+        self.add(to_zone, cards)
+
+    def size(self, zone: str) -> int:
+        return sum(self.zones[zone].values())
@@ -1,9 +1,11 @@
+from collections import Counter
 from dataclasses import dataclass, asdict, is_dataclass, field
 from datetime import datetime
 from typing import Optional, Union
 
 from lib.deck import Deck
 from lib.graveyard import Graveyard
+from lib.zone_counts import ZoneCounts
 
 
 class SerializableDataclass():
@@ -18,8 +20,11 @@ class SerializableDataclass():
 @dataclass
 class MemberInfo(SerializableDataclass):
     id: str
+    # display name in the game's server
     name: str
     mention: str
+    # account name, which games saved before it was stored don't have
+    username: Optional[str]=None
 
 
 @dataclass
@@ -37,6 +42,12 @@ class OneWithDeathGame(SerializableDataclass):
     text_channel: int
     voice_channel: int
 
+    # stored so the channels can be named without looking them up. games saved before they were stored don't have them
+    text_channel_name: Optional[str]=None
+    voice_channel_name: Optional[str]=None
+    # the server the game is played in, which decides which shard's worker process owns the game.
+    # games saved before it was stored don't have it until they're migrated
+    guild_id: Optional[int]=None
     graveyard: Graveyard = field(default_factory=lambda: Graveyard())
     exile: list[str] = field(default_factory=lambda: [])
     game_started: datetime = field(default_factory=lambda: datetime.now())
@@ -47,6 +58,24 @@ class OneWithDeathGame(SerializableDataclass):
     # if there's a number associated with an action, e.g. scry 4 -> reorder 4
     waiting_for_response_number: Optional[int]=None
 
+    def __post_init__(self):
+        # not a dataclass field, so it stays out of the saved state and is rebuilt from the exile pile on load
+        self.exile_zone_counts = ZoneCounts(exile=self.exile)
+
+    def exile_cards(self, *cards: str):
+        self.exile.extend(cards)
+        self.exile_zone_counts.add('exile', cards)
+
+    def get_zone_counts(self) -> dict[str, Counter]:
+        """
+        Gets the running count of each card in every zone of the game, keyed by zone name
+        """
+        return {
+            **self.deck.zone_counts.zones,
+            **self.graveyard.zone_counts.zones,
+            **self.exile_zone_counts.zones,
+        }
+
     @classmethod
     def from_dict(cls, d: dict[str, any]) -> 'OneWithDeathGame':
         return cls(
@@ -54,8 +83,12 @@ class OneWithDeathGame(SerializableDataclass):
             members=[MemberInfo(**member_info) for member_info in d['members']],
             deck=Deck(**d['deck']),
             graveyard=Graveyard(**d['graveyard']),
+            exile=d.get('exile', []),
             text_channel=d['text_channel'],
             voice_channel=d['voice_channel'],
+            text_channel_name=d.get('text_channel_name'),
+            voice_channel_name=d.get('voice_channel_name'),
+            guild_id=d.get('guild_id'),
             waiting_for_response_from=MemberInfo(**d['waiting_for_response_from']) if 'waiting_for_response_from' in d and d['waiting_for_response_from'] else None,
             waiting_for_response_action=d.get('waiting_for_response_action'),
             waiting_for_response_number=d.get('waiting_for_response_number'),
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+
+BOT_FOLDER = os.path.realpath(os.path.join(os.path.dirname(__file__), '..', 'bot'))
+
+# the bot's modules import each other from the bot folder, which is where it's run from
+sys.path.insert(0, BOT_FOLDER)
+
+
+def pytest_addoption(parser):
+    parser.addoption('--gateway-members', type=int, default=5000, help="how many members the server in the gateway memory tests has")
+
+
+@pytest.fixture
+def state_folder(tmp_path, monkeypatch):
+    """
+    Saves game state and attachment URLs to a temporary folder, rather than over the bot's real state
+    """
+    import lib.game_state
+    from lib.attachments import ATTACHMENT_REGISTRY
+
+    monkeypatch.setattr(lib.game_state, 'GAME_STATE_FILE', str(tmp_path / 'game_state.json'))
+    monkeypatch.setattr(lib.game_state, 'GAME_STATE_FOLDER', str(tmp_path / 'games'))
+    monkeypatch.setattr(ATTACHMENT_REGISTRY, 'urls_file', str(tmp_path / 'attachment_urls.json'))
+    monkeypatch.setattr(ATTACHMENT_REGISTRY, 'urls', {})
+    return tmp_path
+
+
+@pytest.fixture
+def bot_module(state_folder, monkeypatch):
+    """
+    Imports the bot, which reads its API key from the folder it's run from, with no games running
+    """
+    (state_folder / 'api_key.txt').write_text('test-token')
+    monkeypatch.chdir(state_folder)
+
+    if 'bot.bot' not in sys.modules:
+        # disnake's bot takes the current event loop when it's made, which asyncio.run leaves unset after an earlier test
+        asyncio.set_event_loop(asyncio.new_event_loop())
+    # the bot folder is also a package named bot, from the repo's root
+    from bot import bot
+    monkeypatch.setattr(bot, 'RUNNING_GAMES', [])
+    return bot
+
+
+@pytest.fixture
+def table(bot_module):
+    """
+    A running game for two players, with its server and channels
+    """
+    import engine.actions as engine
+    from lib.discord import to_member_info
+    from tests.fakes import GUILD_ID, TEXT_CHANNEL_ID, VOICE_CHANNEL_ID, FakeChannel, FakeGuild, FakeMember
+
+    alice = FakeMember(100, 'alice')
+    bob = FakeMember(101, 'bob')
+    text_channel = FakeChannel(TEXT_CHANNEL_ID, 'alice-one-with-death')
+    guild = FakeGuild([alice, bob], [text_channel])
+    game = engine.start_game(
+        game_id='owd-alice',
+        members=[to_member_info(alice), to_member_info(bob)],
+        text_channel=TEXT_CHANNEL_ID,
+        voice_channel=VOICE_CHANNEL_ID,
+        guild_id=GUILD_ID,
+        # so what each command draws is the same every run
+        shuffle=False,
+    )
+    bot_module.RUNNING_GAMES.append(game)
+    return SimpleNamespace(bot=bot_module, game=game, guild=guild, alice=alice, bob=bob, text_channel=text_channel)
+
+
+@pytest.fixture
+def serve_fake_discord(monkeypatch):
+    """
+    Serves a fake of Discord (e.g. tests.fake_discord.FakeDiscord) for as long as the returned context is open,
+    with disnake pointed at it rather than at Discord
+    """
+    from disnake.http import Route
+
+    @asynccontextmanager
+    async def serve(fake_discord):
+        api_url = await fake_discord.start()
+        monkeypatch.setattr(Route, 'BASE', api_url)
+        try:
+            yield api_url
+        finally:
+            await fake_discord.stop()
+
+    return serve
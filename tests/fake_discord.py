@@ -0,0 +1,169 @@
+"""
+A local fake of the Discord HTTP API, along with command contexts which send to it through a real client
+"""
+import asyncio
+import json
+import re
+import time
+from itertools import count
+from typing import Optional
+
+import disnake
+from aiohttp import web
+
+
+def json_response(data: dict, status: int=200, headers: Optional[dict[str, str]]=None) -> web.Response:
+    # disnake only parses the body as JSON if the content type is exactly this, without a charset
+    return web.Response(body=json.dumps(data).encode(), status=status, headers={'Content-Type': 'application/json', **(headers or {})})
+
+
+class FakeDiscord:
+    """
+    Just enough of the Discord HTTP API for the bot to log in and send messages, counting what gets uploaded.
+
+    With a rate limit of (number of messages, period in seconds), each channel only takes that many messages per period
+    and answers the rest with a 429, sending the same rate limit headers Discord does.
+    """
+    def __init__(self, latency: float=0, rate_limit: Optional[tuple[int, float]]=None):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.bytes_received = 0
+        self.attachments_received = 0
+        self.num_rate_limited = 0
+        # channel id -> the names of the files uploaded to it, in order
+        self.uploads: dict[int, list[str]] = {}
+        self._ids = count(1)
+        self._runner = None
+        # channel id -> (when its current rate limit window started, messages sent in it)
+        self._rate_limit_windows: dict[str, tuple[float, int]] = {}
+
+        self.app = web.Application(client_max_size=100 * 1024 * 1024)
+        # the current user is the only user the bot asks for
+        self.app.router.add_get('/api/v10/users/{user_id}', self.get_current_user)
+        self.app.router.add_post('/api/v10/channels/{channel_id}/messages', self.create_message)
+
+    def get_user(self) -> dict:
+        return {'id': '1', 'username': 'One with Death', 'discriminator': '0000', 'avatar': None, 'bot': True}
+
+    async def get_current_user(self, request: web.Request) -> web.Response:
+        return json_response(self.get_user())
+
+    def get_rate_limit_headers(self, channel_id: str) -> Optional[dict[str, str]]:
+        """
+        Counts a message against its channel's rate limit, returning the headers to send with it,
+        or None if the channel is over its limit
+        """
+        if not self.rate_limit:
+            return {}
+
+        limit, period = self.rate_limit
+        now = time.monotonic()
+        window_start, num_sent = self._rate_limit_windows.get(channel_id, (now, 0))
+        if now - window_start >= period:
+            window_start, num_sent = now, 0
+
+        headers = {
+            'X-RateLimit-Limit': str(limit),
+            'X-RateLimit-Reset-After': f"{window_start + period - now:.3f}",
+            'X-RateLimit-Bucket': f"channel-{channel_id}",
+        }
+        if num_sent >= limit:
+            return None
+
+        self._rate_limit_windows[channel_id] = (window_start, num_sent + 1)
+        return {**headers, 'X-RateLimit-Remaining': str(limit - num_sent - 1)}
+
+    async def create_message(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        channel_id = request.match_info['channel_id']
+        rate_limit_headers = self.get_rate_limit_headers(channel_id)
+        if rate_limit_headers is None:
+            self.num_rate_limited += 1
+            window_start, _ = self._rate_limit_windows[channel_id]
+            retry_after = max(0.0, window_start + self.rate_limit[1] - time.monotonic())
+            # disnake only trusts a 429 which came through Discord's proxy
+            return json_response(
+                {'message': "You are being rate limited.", 'retry_after': retry_after, 'global': False},
+                status=429,
+                headers={'Via': '1.1 google', 'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset-After': f"{retry_after:.3f}"},
+            )
+        self.bytes_received += len(body)
+
+        filenames = re.findall(rb'name="files\[\d+\]"; filename="([^"]+)"', body)
+        self.attachments_received += len(filenames)
+        if filenames:
+            self.uploads.setdefault(int(channel_id), []).extend(filename.decode() for filename in filenames)
+
+        message_id = str(next(self._ids))
+        return json_response(headers=rate_limit_headers, data={
+            'id': message_id,
+            'channel_id': channel_id,
+            'type': 0,
+            'content': '',
+            'author': self.get_user(),
+            'attachments': [
+                {
+                    'id': f"{message_id}{i}",
+                    'filename': filename.decode(),
+                    'size': 0,
+                    'url': f"http://127.0.0.1/attachments/{message_id}/{filename.decode()}",
+                    'proxy_url': f"http://127.0.0.1/attachments/{message_id}/{filename.decode()}",
+                }
+                for i, filename in enumerate(filenames)
+            ],
+            'embeds': [],
+            'mentions': [],
+            'mention_roles': [],
+            'mention_everyone': False,
+            'pinned': False,
+            'tts': False,
+            'timestamp': '2024-01-01T00:00:00+00:00',
+            'edited_timestamp': None,
+            'flags': 0,
+            'components': [],
+        })
+
+    async def start(self) -> str:
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/api/v10"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+class ClientGuild:
+    """
+    Stands in for a server, whose channels and members are sent to through a real client
+    """
+    def __init__(self, client: disnake.Client):
+        self.client = client
+
+    def get_channel(self, channel_id: int):
+        return self.client.get_partial_messageable(channel_id)
+
+    def get_member(self, member_id: int):
+        return self.client.get_partial_messageable(member_id, type=disnake.ChannelType.private)
+
+
+class ClientContext:
+    """
+    Stands in for the command context of a player running commands, with everything sent through a real client (e.g. logged in
+    to a FakeDiscord). By default the command comes from a DM, so results get sent both to the player and the game channel
+    """
+    def __init__(self, client: disnake.Client, command: str, author_id: int, channel_id: Optional[int]=None):
+        self.guild = ClientGuild(client)
+        self.author = client.get_partial_messageable(author_id, type=disnake.ChannelType.private)
+        self.author.mention = f"<@{author_id}>"
+        self.author.name = self.author.display_name = f"player{author_id}"
+        self.channel = client.get_partial_messageable(channel_id) if channel_id else self.author
+        self.command = command
+
+    async def send(self, *args, **kwargs):
+        return await self.channel.send(*args, **kwargs)
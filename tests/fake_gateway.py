@@ -0,0 +1,209 @@
+"""
+A local fake of Discord's gateway, for tests of clients connecting to it as the bot would
+"""
+import json
+import time
+
+from aiohttp import WSMsgType, web
+
+from tests.fake_discord import FakeDiscord, json_response
+from lib.game_state import get_shard_id
+
+
+BOT_USER_ID = 1
+PLAYER_ID = 2
+
+
+def get_guild_id(index: int) -> int:
+    # Discord puts when the server was created in the top bits of its id, which is what decides its shard
+    return ((index + 1) << 22) + index
+
+
+def get_channel_id(guild_id: int) -> int:
+    return guild_id + 1
+
+
+class FakeGateway(FakeDiscord):
+    """
+    Just enough of Discord's gateway for sharded clients to identify, get their servers and receive messages,
+    on top of the fake HTTP API, which records every message sent.
+
+    Every server has members_per_guild members, which are only sent when a client requests them, in chunks, as Discord
+    does for large servers, or fetched one at a time
+    """
+    def __init__(self, guild_ids: list[int], shard_count: int, members_per_guild: int=0):
+        super().__init__()
+        self.guild_ids = guild_ids
+        self.shard_count = shard_count
+        self.members_per_guild = members_per_guild
+        self.num_member_chunks = 0
+        self.num_member_fetches = 0
+        self.url = None
+        self.num_identifies = [0] * shard_count
+        self.messages: list[tuple[int, str]] = []
+        self._shards: dict[int, web.WebSocketResponse] = {}
+        self._sequences = [0] * shard_count
+
+        self.app.router.add_get('/api/v10/gateway/bot', self.get_bot_gateway)
+        self.app.router.add_get('/api/v10/channels/{channel_id}', self.get_channel)
+        self.app.router.add_get('/api/v10/guilds/{guild_id}/members/{user_id}', self.get_member)
+        self.app.router.add_get('/gateway', self.connect)
+
+    async def start(self) -> str:
+        self.url = await super().start()
+        return self.url
+
+    async def get_bot_gateway(self, request: web.Request) -> web.Response:
+        return json_response({
+            'url': self.url.replace('http://', 'ws://').replace('/api/v10', '/gateway'),
+            'shards': self.shard_count,
+            'session_start_limit': {'total': 1000, 'remaining': 1000, 'reset_after': 0, 'max_concurrency': 1},
+        })
+
+    async def get_channel(self, request: web.Request) -> web.Response:
+        channel_id = int(request.match_info['channel_id'])
+        guild_id = next((guild_id for guild_id in self.guild_ids if get_channel_id(guild_id) == channel_id), None)
+        if guild_id is None:
+            return json_response({'message': "Unknown Channel", 'code': 10003}, status=404)
+        return json_response(self.get_channel_data(guild_id))
+
+    async def create_message(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        self.messages.append((int(request.match_info['channel_id']), body.get('content') or ''))
+        return await super().create_message(request)
+
+    def get_channel_data(self, guild_id: int) -> dict:
+        return {'id': str(get_channel_id(guild_id)), 'guild_id': str(guild_id), 'type': 0, 'name': 'general', 'position': 0, 'permission_overwrites': []}
+
+    def get_member_data(self, user_id: int) -> dict:
+        return {
+            'user': {'id': str(user_id), 'username': f"member{user_id}", 'global_name': f"Member {user_id}", 'discriminator': '0', 'avatar': None},
+            'nick': None,
+            'roles': [],
+            'joined_at': '2024-01-01T00:00:00+00:00',
+            'deaf': False,
+            'mute': False,
+        }
+
+    def get_member_ids(self) -> range:
+        return range(PLAYER_ID, PLAYER_ID + self.members_per_guild)
+
+    async def get_member(self, request: web.Request) -> web.Response:
+        self.num_member_fetches += 1
+        return json_response(self.get_member_data(int(request.match_info['user_id'])))
+
+    def get_guild_data(self, guild_id: int) -> dict:
+        return {
+            'id': str(guild_id),
+            'name': f"server-{guild_id}",
+            'owner_id': str(PLAYER_ID),
+            'member_count': self.members_per_guild,
+            'large': self.members_per_guild > 250,
+            'features': [],
+            'emojis': [],
+            'stickers': [],
+            'roles': [{'id': str(guild_id), 'name': '@everyone', 'permissions': '0', 'position': 0, 'color': 0, 'hoist': False, 'managed': False, 'mentionable': False}],
+            'channels': [self.get_channel_data(guild_id)],
+            'members': [],
+            'threads': [],
+        }
+
+    async def connect(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_json({'op': 10, 'd': {'heartbeat_interval': 41250}})
+
+        shard_id = None
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+            payload = json.loads(message.data)
+            if payload['op'] == 1:
+                await ws.send_json({'op': 11})
+            elif payload['op'] == 2:
+                shard_id, _ = payload['d']['shard']
+                self.num_identifies[shard_id] += 1
+                self._shards[shard_id] = ws
+                await self.send_guilds(shard_id)
+            elif payload['op'] == 8:
+                await self.send_member_chunks(shard_id, payload['d'])
+
+        if shard_id is not None and self._shards.get(shard_id) is ws:
+            del self._shards[shard_id]
+        return ws
+
+    async def dispatch(self, shard_id: int, event: str, data: dict):
+        self._sequences[shard_id] += 1
+        await self._shards[shard_id].send_json({'op': 0, 't': event, 's': self._sequences[shard_id], 'd': data})
+
+    async def send_guilds(self, shard_id: int):
+        guild_ids = [guild_id for guild_id in self.guild_ids if get_shard_id(guild_id, self.shard_count) == shard_id]
+        self._sequences[shard_id] = 0
+        await self.dispatch(shard_id, 'READY', {
+            'v': 10,
+            'user': self.get_user(),
+            'guilds': [{'id': str(guild_id), 'unavailable': True} for guild_id in guild_ids],
+            'session_id': f"session-{shard_id}-{self.num_identifies[shard_id]}",
+            'resume_gateway_url': self.url.replace('http://', 'ws://').replace('/api/v10', '/gateway'),
+            'shard': [shard_id, self.shard_count],
+            'application': {'id': str(BOT_USER_ID), 'flags': 0},
+        })
+        for guild_id in guild_ids:
+            await self.dispatch(shard_id, 'GUILD_CREATE', self.get_guild_data(guild_id))
+
+    async def send_member_chunks(self, shard_id: int, request: dict):
+        guild_ids = request['guild_id'] if isinstance(request['guild_id'], list) else [request['guild_id']]
+        member_ids = self.get_member_ids()
+        chunk_size = 1000
+        chunk_count = max(1, -(-len(member_ids) // chunk_size))
+        for guild_id in guild_ids:
+            for chunk_index in range(chunk_count):
+                self.num_member_chunks += 1
+                await self.dispatch(shard_id, 'GUILD_MEMBERS_CHUNK', {
+                    'guild_id': str(guild_id),
+                    'members': [self.get_member_data(user_id) for user_id in member_ids[chunk_index * chunk_size:(chunk_index + 1) * chunk_size]],
+                    'chunk_index': chunk_index,
+                    'chunk_count': chunk_count,
+                    'nonce': request.get('nonce'),
+                })
+
+    async def send_message(self, guild_id: int, content: str, author_id: int=PLAYER_ID):
+        """
+        Sends a message from a player to a server's channel, through the shard the server is on
+        """
+        shard_id = get_shard_id(guild_id, self.shard_count)
+        await self.dispatch(shard_id, 'MESSAGE_CREATE', {
+            'id': str(int(time.time() * 1000)),
+            'channel_id': str(get_channel_id(guild_id)),
+            'guild_id': str(guild_id),
+            'author': {'id': str(author_id), 'username': f"player{author_id}", 'discriminator': '0000', 'avatar': None},
+            'member': {'roles': [], 'joined_at': '2024-01-01T00:00:00+00:00', 'deaf': False, 'mute': False},
+            'content': content,
+            'timestamp': '2024-01-01T00:00:00+00:00',
+            'edited_timestamp': None,
+            'tts': False,
+            'mention_everyone': False,
+            'mentions': [],
+            'mention_roles': [],
+            'attachments': [],
+            'embeds': [],
+            'pinned': False,
+            'type': 0,
+            'flags': 0,
+            'components': [],
+        })
+
+    def get_replies(self, prefix: str) -> dict[int, list[str]]:
+        """
+        Gets the messages each server's channel got which start with the given word, by server
+        """
+        replies = {guild_id: [] for guild_id in self.guild_ids}
+        for channel_id, content in self.messages:
+            guild_id = next((guild_id for guild_id in self.guild_ids if get_channel_id(guild_id) == channel_id), None)
+            if guild_id is not None and content.startswith(prefix):
+                replies[guild_id].append(content)
+        return replies
+
+
+def parse_reply(reply: str) -> dict[str, int]:
+    return {key: int(value) for key, value in (word.split('=') for word in reply.split()[1:])}
@@ -0,0 +1,91 @@
+"""
+Stand-ins for the Discord objects commands are run with, which record what's sent to them rather than sending it
+"""
+from types import SimpleNamespace
+
+
+GUILD_ID = 1
+TEXT_CHANNEL_ID = 10
+VOICE_CHANNEL_ID = 11
+
+
+def get_sent_message(kwargs: dict) -> SimpleNamespace:
+    """
+    Stands in for the message a send made, with a URL for each file it was sent with
+    """
+    files = kwargs.get('files') or ([kwargs['file']] if kwargs.get('file') else [])
+    return SimpleNamespace(attachments=[SimpleNamespace(filename=file.filename, url=f"https://cdn.example/{file.filename}") for file in files])
+
+
+class FakeChannel:
+    def __init__(self, id: int, name: str):
+        self.id = id
+        self.name = name
+        self.mention = f"#{name}"
+        self.sent = []
+
+    async def send(self, *args, **kwargs):
+        self.sent.append((args, kwargs))
+        return get_sent_message(kwargs)
+
+
+class FakeMember(FakeChannel):
+    def __init__(self, id: int, name: str):
+        super().__init__(id, name)
+        self.display_name = name
+        self.mention = f"<@{id}>"
+
+    def __str__(self):
+        return self.name
+
+
+class FakeGuild:
+    def __init__(self, members: list[FakeMember], channels: list[FakeChannel]):
+        self.id = GUILD_ID
+        self.name = 'guild'
+        self.members = {member.id: member for member in members}
+        self.channels = {channel.id: channel for channel in channels}
+
+    def get_channel(self, id: int):
+        return self.channels.get(id)
+
+    def get_member(self, id: int):
+        return self.members.get(id)
+
+    async def fetch_member(self, id: int):
+        return self.members[id]
+
+
+class FakeContext:
+    def __init__(self, author: FakeMember, guild: FakeGuild, command: str):
+        self.author = author
+        self.guild = guild
+        self.channel = guild.get_channel(TEXT_CHANNEL_ID)
+        self.command = command
+        self.message = None
+
+    async def send(self, *args, **kwargs):
+        return await self.channel.send(*args, **kwargs)
+
+
+class FakeInteraction:
+    """
+    Stands in for a slash command's interaction, recording every response and follow-up to it in the order they were made
+    """
+    def __init__(self, author: FakeMember, guild: FakeGuild, command: str):
+        self.id = author.id
+        self.bot = None
+        self.author = author
+        self.guild = guild
+        self.channel = guild.get_channel(TEXT_CHANNEL_ID)
+        self.application_command = SimpleNamespace(qualified_name=command)
+        self.responses = []
+        self.response = SimpleNamespace(defer=self.record('defer'), send_message=self.record('send_message'))
+        self.followup = SimpleNamespace(send=self.record('followup'))
+        self.delete_original_response = self.record('delete_original_response')
+
+    def record(self, name: str):
+        async def respond(*args, **kwargs):
+            self.responses.append((name, args, kwargs))
+            return get_sent_message(kwargs)
+        return respond
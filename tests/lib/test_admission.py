@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+import pytest
+
+import lib.admission
+from constants import MAX_COMMAND_CARDS
+from errors import InvalidCommandError
+from lib.admission import GAME_REJECTION_REPLY, USER_REJECTION_REPLY, AdmissionController, check_num_cards
+
+
+@pytest.fixture
+def clock(monkeypatch) -> list[float]:
+    now = [1000.0]
+    monkeypatch.setattr(lib.admission.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_commands_past_the_cap_are_turned_away():
+    check_num_cards(MAX_COMMAND_CARDS['draw'], 'draw')
+    # commands without a cap take any number
+    check_num_cards(1000, 'hand')
+
+    with pytest.raises(InvalidCommandError, match=f"`!draw` can only take up to {MAX_COMMAND_CARDS['draw']} cards"):
+        check_num_cards(MAX_COMMAND_CARDS['draw'] + 1, 'draw')
+
+
+def test_player_past_their_burst_is_turned_away_until_their_bucket_refills(clock):
+    admission = AdmissionController(user_burst=2, user_period=timedelta(seconds=1), game_burst=100, game_period=timedelta(seconds=1))
+
+    assert admission.admit(100, 'owd-alice') is None
+    assert admission.admit(100, 'owd-alice') is None
+    assert admission.admit(100, 'owd-alice') == USER_REJECTION_REPLY
+    # someone else in the same game still gets in
+    assert admission.admit(101, 'owd-alice') is None
+
+    clock[0] += 0.5
+    assert admission.admit(100, 'owd-alice') is None
+    assert admission.get_stats()['rejected_by_user'] == 1
+
+
+def test_game_past_its_burst_turns_away_every_player(clock):
+    admission = AdmissionController(user_burst=100, user_period=timedelta(seconds=1), game_burst=2, game_period=timedelta(seconds=1))
+
+    assert admission.admit(100, 'owd-alice') is None
+    assert admission.admit(101, 'owd-alice') is None
+    assert admission.admit(102, 'owd-alice') == GAME_REJECTION_REPLY
+    # other games, and players outside any game, aren't held back
+    assert admission.admit(102, 'owd-carol') is None
+    assert admission.admit(102) is None
+    assert admission.get_stats()['rejected_by_game'] == 1
+
+
+def test_turned_away_player_is_only_replied_to_once_in_a_row(clock):
+    admission = AdmissionController(user_burst=1, user_period=timedelta(seconds=1))
+
+    assert admission.admit(100) is None
+    assert admission.admit(100) == USER_REJECTION_REPLY
+    assert admission.should_reply(100)
+    assert admission.admit(100) == USER_REJECTION_REPLY
+    assert not admission.should_reply(100)
+
+    # let back in, so the next time they're turned away they're told again
+    clock[0] += 1
+    assert admission.admit(100) is None
+    assert admission.admit(100) == USER_REJECTION_REPLY
+    assert admission.should_reply(100)
+    assert admission.get_stats()['replies'] == 2
@@ -0,0 +1,47 @@
+import hashlib
+import io
+
+import pytest
+
+from lib.asset_bundle import AssetBundle, build_asset_bundle, get_bundle_location, load_asset_bundle
+
+
+FILES = {
+    'nix.webp': b'nix image bytes',
+    'forget.webp': b'forget image bytes, a little longer',
+    'empty.webp': b'',
+}
+
+
+def test_bundled_files_read_back_byte_for_byte(tmp_path):
+    file_paths = []
+    for file_name, file_bytes in FILES.items():
+        (tmp_path / file_name).write_bytes(file_bytes)
+        file_paths.append(str(tmp_path / file_name))
+    build_asset_bundle(file_paths, get_bundle_location('preview', str(tmp_path / 'cache')))
+
+    bundle = load_asset_bundle('preview', str(tmp_path / 'cache'))
+
+    for file_name, file_bytes in FILES.items():
+        assert file_name in bundle
+        assert bytes(bundle.get(file_name)) == file_bytes
+        assert bundle.open(file_name).read() == file_bytes
+        assert bundle.get_hash(file_name) == hashlib.sha256(file_bytes).hexdigest()
+
+    reader = bundle.open('forget.webp')
+    reader.seek(-6, io.SEEK_END)
+    assert reader.read() == b'longer'
+
+    bundle.discard('nix.webp')
+    assert 'nix.webp' not in bundle
+
+
+def test_missing_bundle_isnt_loaded(tmp_path):
+    assert load_asset_bundle('preview', str(tmp_path)) is None
+
+
+def test_file_which_isnt_a_bundle_is_rejected(tmp_path):
+    (tmp_path / 'preview.bundle').write_bytes(b'not a bundle at all, just some bytes')
+
+    with pytest.raises(ValueError):
+        AssetBundle(str(tmp_path / 'preview.bundle'))
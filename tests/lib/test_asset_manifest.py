@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+from errors import ImageNotFoundError
+from lib.asset_manifest import get_asset_manifest
+from lib.card_image import get_image_file_location
+from lib.util import sanitize_card_name
+
+
+@pytest.mark.parametrize('card_name, file_name', [
+    # typed with a curly apostrophe, as some clients do
+    ("Oona’s Grace", 'oonas_grace.png'),
+    ("Oona's Grace", 'oonas_grace.png'),
+    ('Everybody Lives!', 'everybody_lives!.png'),
+])
+def test_card_image_is_found_however_its_name_is_written(card_name, file_name):
+    asset = get_asset_manifest()[sanitize_card_name(card_name)]
+
+    assert os.path.basename(asset.path) == file_name
+    assert os.path.basename(get_image_file_location(card_name)).startswith(os.path.splitext(file_name)[0])
+
+
+def test_card_without_an_image_is_reported():
+    with pytest.raises(ImageNotFoundError):
+        get_image_file_location('Not A Card')
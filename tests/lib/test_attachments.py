@@ -0,0 +1,94 @@
+import asyncio
+import json
+import time
+from io import BytesIO
+from types import SimpleNamespace
+
+import disnake
+
+from lib.attachments import AttachmentRegistry
+from tests.fake_discord import FakeDiscord
+from tests.fakes import TEXT_CHANNEL_ID
+
+
+ASSET_CHANNEL_ID = 99
+
+
+def get_url(filename: str, expiry: int) -> str:
+    return f"https://cdn.example/{filename}?ex={expiry:x}"
+
+
+def test_workers_save_to_their_own_files_and_load_each_others(tmp_path):
+    urls_file = str(tmp_path / 'attachment_urls.json')
+    first_worker = AttachmentRegistry(urls_file)
+    first_worker.use_worker_file('shards-0-1')
+    second_worker = AttachmentRegistry(urls_file)
+    second_worker.use_worker_file('shards-2-3')
+
+    first_worker.urls = {'nix.webp': get_url('nix.webp', 100), 'forget.webp': get_url('forget.webp', 300)}
+    first_worker.save()
+    second_worker.urls = {'nix.webp': get_url('nix.webp', 200)}
+    second_worker.save()
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['attachment_urls.shards-0-1.json', 'attachment_urls.shards-2-3.json']
+    # the URL which expires last wins
+    assert AttachmentRegistry(urls_file).urls == {'nix.webp': get_url('nix.webp', 200), 'forget.webp': get_url('forget.webp', 300)}
+
+
+def test_unreadable_urls_file_is_skipped(tmp_path):
+    (tmp_path / 'attachment_urls.json').write_text('{"nix.webp": "https://cdn.exa')
+    (tmp_path / 'attachment_urls.shards-0-1.json').write_text(json.dumps({'forget.webp': 'https://cdn.example/forget.webp'}))
+
+    registry = AttachmentRegistry(str(tmp_path / 'attachment_urls.json'))
+
+    assert registry.urls == {'forget.webp': 'https://cdn.example/forget.webp'}
+
+
+def get_image_file(filename: str) -> disnake.File:
+    return disnake.File(BytesIO(b'image bytes'), filename=filename)
+
+
+async def send_images(registry: AttachmentRegistry, channel_id: int, *filenames: str):
+    client = disnake.Client(intents=disnake.Intents.none())
+    await client.login('attachments')
+    try:
+        if registry.asset_channel:
+            registry.asset_channel = client.get_partial_messageable(registry.asset_channel.id)
+        await registry.send(client.get_partial_messageable(channel_id), "cards", files=[get_image_file(filename) for filename in filenames])
+    finally:
+        await client.close()
+
+
+def test_uploaded_images_are_linked_by_url_until_their_url_goes_stale(tmp_path, serve_fake_discord):
+    registry = AttachmentRegistry(str(tmp_path / 'attachment_urls.json'))
+    fake_discord = FakeDiscord()
+
+    async def run():
+        async with serve_fake_discord(fake_discord):
+            await send_images(registry, TEXT_CHANNEL_ID, 'nix.webp', 'forget.webp')
+            await send_images(registry, TEXT_CHANNEL_ID, 'nix.webp', 'forget.webp')
+            # nix's URL expires within the margin, so it's no longer safe to link to
+            registry.urls['nix.webp'] = get_url('nix.webp', int(time.time()))
+            await send_images(registry, TEXT_CHANNEL_ID, 'nix.webp', 'forget.webp')
+
+    asyncio.run(run())
+
+    assert fake_discord.uploads == {TEXT_CHANNEL_ID: ['nix.webp', 'forget.webp', 'nix.webp']}
+    assert registry.urls['nix.webp'].startswith('http://127.0.0.1/attachments/3/')
+
+
+def test_stale_images_are_uploaded_to_the_asset_channel_again(tmp_path, serve_fake_discord):
+    registry = AttachmentRegistry(str(tmp_path / 'attachment_urls.json'))
+    registry.asset_channel = SimpleNamespace(id=ASSET_CHANNEL_ID)
+    registry.urls = {'nix.webp': get_url('nix.webp', int(time.time())), 'forget.webp': get_url('forget.webp', int(time.time()) + 86400)}
+    fake_discord = FakeDiscord()
+
+    async def run():
+        async with serve_fake_discord(fake_discord):
+            await send_images(registry, TEXT_CHANNEL_ID, 'nix.webp', 'forget.webp')
+
+    asyncio.run(run())
+
+    # both are linked from the message, so only the stale one was uploaded anywhere
+    assert fake_discord.uploads == {ASSET_CHANNEL_ID: ['nix.webp']}
+    assert registry.urls['nix.webp'].startswith('http://127.0.0.1/attachments/1/')
@@ -0,0 +1,140 @@
+import asyncio
+from itertools import count
+from typing import Optional
+
+from lib.channel_pool import POOL_CHANNEL_PREFIX, POOL_VOICE_CHANNEL_SUFFIX, ChannelPool
+from tests.fakes import GUILD_ID
+
+
+class PoolChannel:
+    def __init__(self, id: int, name: str, guild: 'PoolGuild'):
+        self.id = id
+        self.name = name
+        self.guild = guild
+        self.overwrites = {}
+        self.num_purges = 0
+
+    async def edit(self, name: str, overwrites: dict):
+        if self.guild.edit_error:
+            raise self.guild.edit_error
+        self.name = name
+        self.overwrites = overwrites
+
+    async def purge(self, limit: Optional[int]):
+        self.num_purges += 1
+
+    async def delete(self):
+        self.guild.deleted.append(self)
+
+
+class PoolGuild:
+    """
+    A server the pool can create, rename, clear out and delete channels in
+    """
+    def __init__(self):
+        self.id = GUILD_ID
+        self.default_role = 'everyone'
+        self.me = 'bot'
+        self.created: list[PoolChannel] = []
+        self.deleted: list[PoolChannel] = []
+        self.edit_error: Optional[Exception] = None
+        self._ids = count(1000)
+
+    async def create_text_channel(self, name: str, overwrites: dict) -> PoolChannel:
+        return self.create_channel(name, overwrites)
+
+    async def create_voice_channel(self, name: str, overwrites: dict) -> PoolChannel:
+        return self.create_channel(name, overwrites)
+
+    def create_channel(self, name: str, overwrites: dict) -> PoolChannel:
+        channel = PoolChannel(next(self._ids), name, self)
+        channel.overwrites = overwrites
+        self.created.append(channel)
+        return channel
+
+
+async def wait_for_background_work(pool: ChannelPool):
+    while pool._tasks:
+        await asyncio.gather(*pool._tasks)
+
+
+def is_hidden(channel: PoolChannel) -> bool:
+    return not channel.overwrites['everyone'].view_channel and channel.overwrites['bot'].view_channel
+
+
+def test_claimed_pair_is_replaced_in_the_background():
+    pool = ChannelPool(size=2)
+    guild = PoolGuild()
+
+    async def run():
+        await pool.refill(guild)
+        pair = pool.claim(guild)
+        await wait_for_background_work(pool)
+        return pair
+
+    text_channel, voice_channel = asyncio.run(run())
+
+    assert text_channel.name.startswith(POOL_CHANNEL_PREFIX)
+    assert voice_channel.name == f"{text_channel.name}{POOL_VOICE_CHANNEL_SUFFIX}"
+    assert all(is_hidden(channel) for channel in guild.created)
+    assert len(pool.get_pairs(guild)) == 2
+    assert (text_channel, voice_channel) not in pool.get_pairs(guild)
+    assert len(guild.created) == 6
+
+
+def test_claim_from_an_empty_pool_is_a_miss():
+    pool = ChannelPool(size=0)
+
+    assert pool.claim(PoolGuild()) is None
+    assert pool.get_stats() == {'pooled_pairs': 0, 'claimed': 0, 'missed': 1}
+
+
+def test_released_pair_is_hidden_cleared_and_pooled_again():
+    pool = ChannelPool(size=1)
+    guild = PoolGuild()
+    text_channel = guild.create_channel('alice-one-with-death', {})
+    voice_channel = guild.create_channel('alice-one-with-death-vc', {})
+
+    async def run():
+        await pool.release(guild, text_channel, voice_channel)
+        await wait_for_background_work(pool)
+
+    asyncio.run(run())
+
+    assert pool.get_pairs(guild) == [(text_channel, voice_channel)]
+    assert text_channel.name.startswith(POOL_CHANNEL_PREFIX)
+    assert is_hidden(text_channel) and is_hidden(voice_channel)
+    assert text_channel.num_purges == voice_channel.num_purges == 1
+    assert guild.deleted == []
+
+
+def test_pair_which_fails_to_recycle_is_deleted_and_replaced():
+    pool = ChannelPool(size=1)
+    guild = PoolGuild()
+    text_channel = guild.create_channel('alice-one-with-death', {})
+    voice_channel = guild.create_channel('alice-one-with-death-vc', {})
+    guild.edit_error = RuntimeError("Missing permissions")
+
+    async def run():
+        await pool.release(guild, text_channel, voice_channel)
+        await wait_for_background_work(pool)
+
+    asyncio.run(run())
+
+    assert guild.deleted == [text_channel, voice_channel]
+    # topped back up with a new pair instead
+    assert len(pool.get_pairs(guild)) == 1
+    assert (text_channel, voice_channel) not in pool.get_pairs(guild)
+
+
+def test_released_pair_is_deleted_once_the_pool_has_plenty():
+    pool = ChannelPool(size=1)
+    guild = PoolGuild()
+    pool.get_pairs(guild).extend([(guild.create_channel('a', {}), guild.create_channel('a-vc', {})) for _ in range(2)])
+    text_channel = guild.create_channel('alice-one-with-death', {})
+    voice_channel = guild.create_channel('alice-one-with-death-vc', {})
+
+    asyncio.run(pool.release(guild, text_channel, voice_channel))
+
+    assert guild.deleted == [text_channel, voice_channel]
+    assert len(pool.get_pairs(guild)) == 2
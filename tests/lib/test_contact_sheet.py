@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+import lib.contact_sheet
+from lib.contact_sheet import clear_rendered_sheets, get_contact_sheet
+
+
+@pytest.fixture
+def renders(monkeypatch) -> list[tuple[str, ...]]:
+    """
+    Records the cards of every contact sheet rendered, starting from no sheets rendered yet
+    """
+    renders = []
+    render_contact_sheet = lib.contact_sheet.render_contact_sheet
+
+    def record_render(card_images, first_number=1):
+        renders.append(tuple(card_name for card_name, _ in card_images))
+        return render_contact_sheet(card_images, first_number)
+
+    monkeypatch.setattr(lib.contact_sheet, 'render_contact_sheet', record_render)
+    clear_rendered_sheets()
+    yield renders
+    clear_rendered_sheets()
+
+
+def get_filenames(*card_lists: list[str]) -> list[str]:
+    async def run():
+        return [(await get_contact_sheet(card_names)).filename for card_names in card_lists]
+
+    return asyncio.run(run())
+
+
+def test_contact_sheet_is_rendered_once_for_the_same_cards_in_the_same_order(renders):
+    first, again, reordered = get_filenames(['Nix', "Charon's Obol"], ['Nix', "Charon's Obol"], ["Charon's Obol", 'Nix'])
+
+    assert first == again
+    # the cards are numbered in the order they're shown, so the same cards in another order are another sheet
+    assert reordered != first
+    assert renders == [('Nix', "Charon's Obol"), ("Charon's Obol", 'Nix')]
@@ -0,0 +1,37 @@
+from lib.image_cache import ImageCache
+
+
+def write_image(tmp_path, name: str, num_bytes: int) -> str:
+    path = tmp_path / name
+    path.write_bytes(b'x' * num_bytes)
+    return str(path)
+
+
+def test_least_recently_used_images_are_evicted_to_stay_within_the_byte_budget(tmp_path):
+    cache = ImageCache(max_bytes=250)
+    nix, forget, charon = (write_image(tmp_path, name, 100) for name in ['nix.webp', 'forget.webp', 'charon.webp'])
+
+    cache.get(nix)
+    cache.get(forget)
+    # nix was used since forget was, so forget is the least recently used
+    cache.get(nix)
+    cache.get(charon)
+
+    assert nix in cache and charon in cache
+    assert forget not in cache
+    assert cache.num_bytes == 200
+    assert cache.get_stats()['evictions'] == 1
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_image_bigger_than_the_whole_budget_is_served_without_being_cached(tmp_path):
+    cache = ImageCache(max_bytes=250)
+    nix = write_image(tmp_path, 'nix.webp', 100)
+    big = write_image(tmp_path, 'big.webp', 300)
+    cache.get(nix)
+
+    assert cache.get(big) == b'x' * 300
+    assert big not in cache
+    # nothing was evicted to make room for it
+    assert nix in cache
+    assert cache.num_bytes == 100
@@ -0,0 +1,38 @@
+import os
+
+from PIL import Image
+
+import lib.image_derivatives
+from lib.asset_manifest import get_asset_manifest
+from lib.image_derivatives import build_image_derivatives
+
+
+def save_image(path, color: str):
+    Image.new('RGB', (800, 1120), color).save(path)
+
+
+def test_derivatives_are_keyed_by_the_hash_of_their_source(tmp_path, monkeypatch):
+    images_folder = tmp_path / 'card_images'
+    images_folder.mkdir()
+    cache_folder = str(tmp_path / 'cache')
+    save_image(images_folder / 'nix.png', 'black')
+    save_image(images_folder / 'forget.png', 'white')
+    monkeypatch.setattr(lib.image_derivatives, 'get_asset_manifest', lambda: get_asset_manifest(str(images_folder)))
+
+    derivatives = build_image_derivatives('low', cache_folder)
+    nix, forget = str(images_folder / 'nix.png'), str(images_folder / 'forget.png')
+    forget_built_at = os.path.getmtime(derivatives[forget])
+
+    # nix's image is replaced under the same file name
+    save_image(images_folder / 'nix.png', 'red')
+    get_asset_manifest.cache_clear()
+    new_derivatives = build_image_derivatives('low', cache_folder)
+
+    assert new_derivatives[nix] != derivatives[nix]
+    with Image.open(new_derivatives[nix]) as image:
+        assert image.getpixel((0, 0)) != (0, 0, 0)
+    # the stale derivative is cleared out, and the unchanged one isn't built again
+    assert not os.path.exists(derivatives[nix])
+    assert new_derivatives[forget] == derivatives[forget]
+    assert os.path.getmtime(new_derivatives[forget]) == forget_built_at
+    assert sorted(os.listdir(os.path.join(cache_folder, 'low'))) == sorted(os.path.basename(path) for path in new_derivatives.values())
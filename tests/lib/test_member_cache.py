@@ -0,0 +1,51 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from lib.member_cache import MemberNameCache, PlayerCache
+from tests.fakes import GUILD_ID
+
+
+# with a lean gateway disnake caches no members, so the server never has them
+LEAN_GUILD = SimpleNamespace(id=GUILD_ID, get_member=lambda id: None)
+
+
+def get_member(name: str, display_name: str=None) -> SimpleNamespace:
+    return SimpleNamespace(id=100, name=name, display_name=display_name or name, guild=LEAN_GUILD)
+
+
+@pytest.fixture
+def caches(bot_module, monkeypatch) -> SimpleNamespace:
+    """
+    Empty member caches for the bot's gateway events to keep up to date, with alice cached in both
+    """
+    caches = SimpleNamespace(members=MemberNameCache(), players=PlayerCache())
+    monkeypatch.setattr(bot_module, 'MEMBER_CACHE', caches.members)
+    monkeypatch.setattr(bot_module, 'PLAYER_CACHE', caches.players)
+    monkeypatch.setattr(bot_module, 'LEAN_GATEWAY', True)
+
+    alice = get_member('alice')
+    caches.members.add(alice, 'ali')
+    caches.players.add(alice)
+    return caches
+
+
+def test_member_update_drops_their_names_and_updates_the_player(bot_module, caches):
+    renamed = get_member('alice', display_name='Alice the Bold')
+
+    asyncio.run(bot_module.on_raw_member_update(renamed))
+
+    assert caches.members.get(GUILD_ID, 'ali') is None
+    assert caches.members.get(GUILD_ID, 'alice') is None
+    assert caches.players.get(LEAN_GUILD, renamed.id) is renamed
+
+
+def test_member_leaving_is_dropped_from_both_caches(bot_module, caches):
+    payload = SimpleNamespace(guild_id=GUILD_ID, user=get_member('alice'))
+
+    asyncio.run(bot_module.on_raw_member_remove(payload))
+
+    assert caches.members.get(GUILD_ID, 'ali') is None
+    assert caches.players.get(LEAN_GUILD, payload.user.id) is None
+    assert caches.members.get_stats()['names'] == 0
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+from lib.outbox import merge_staged_messages
+from tests.fakes import TEXT_CHANNEL_ID, FakeChannel
+
+
+def test_merge_keeps_files_with_their_content():
+    channel = FakeChannel(TEXT_CHANNEL_ID, 'channel')
+    owd_image = SimpleNamespace(filename='one_with_death.webp')
+    staged_messages = [
+        (channel, channel.send, ("You drew a One with Death",), {'files': [owd_image]}),
+        (channel, channel.send, ("It's been put on the resolution stack",), {}),
+    ]
+
+    merged = merge_staged_messages(staged_messages)
+
+    assert [kwargs for _, _, _, kwargs in merged] == [
+        {'content': "You drew a One with Death", 'files': [owd_image]},
+        {'content': "It's been put on the resolution stack"},
+    ]
+
+
+def test_merge_passes_other_messages_through_in_order():
+    channel = FakeChannel(TEXT_CHANNEL_ID, 'channel')
+    staged_messages = [
+        (channel, channel.send, ("first",), {}),
+        (channel, channel.send, ("second",), {}),
+        (channel, channel.send, (), {'content': "with an embed", 'embeds': ['embed']}),
+        (channel, channel.send, ("third",), {}),
+    ]
+
+    merged = merge_staged_messages(staged_messages)
+
+    assert [kwargs for _, _, _, kwargs in merged] == [
+        {'content': "first\n\nsecond"},
+        {'content': "with an embed", 'embeds': ['embed']},
+        {'content': "third"},
+    ]
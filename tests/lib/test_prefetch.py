@@ -0,0 +1,21 @@
+from lib.prefetch import ImagePrefetcher
+
+
+def test_prefetched_images_count_as_hits_and_others_read_from_disk_as_misses():
+    prefetcher = ImagePrefetcher()
+    # already in memory, so nothing needs loading
+    prefetcher.prefetch(['nix.webp', 'forget.webp'], is_in_memory=lambda path: True)
+    prefetcher.prefetch(['nix.webp'], is_in_memory=lambda path: True)
+
+    prefetcher.record_served('nix.webp', is_cached=True)
+    # only the first time a prefetched image is served counts
+    prefetcher.record_served('nix.webp', is_cached=True)
+    # in memory for some other reason, so it's neither
+    prefetcher.record_served('one_with_death.webp', is_cached=True)
+    prefetcher.record_served('charons_obol.webp', is_cached=False)
+
+    assert prefetcher.get_stats() == {'prefetched': 2, 'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_hit_rate_is_zero_before_anything_is_served():
+    assert ImagePrefetcher().get_hit_rate() == 0.0
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+from lib.send_scheduler import PRIORITY_INFORMATIONAL, PRIORITY_PRIVATE, PRIORITY_PUBLIC, SendScheduler, TokenBucket
+
+
+def test_waiting_sends_go_out_by_priority_then_in_order():
+    scheduler = SendScheduler(max_concurrent_sends=1, bucket_capacity=None)
+    sent = []
+
+    async def send(name: str, priority: int):
+        async with scheduler.slot('channel', priority):
+            sent.append(name)
+            await asyncio.sleep(0)
+
+    async def run():
+        # the first send takes the only slot, so the rest all have to wait their turn
+        await asyncio.gather(
+            send('first', PRIORITY_INFORMATIONAL),
+            send('image', PRIORITY_INFORMATIONAL),
+            send('announcement', PRIORITY_PUBLIC),
+            send('hand', PRIORITY_PRIVATE),
+            send('second announcement', PRIORITY_PUBLIC),
+        )
+
+    asyncio.run(run())
+
+    assert sent == ['first', 'hand', 'announcement', 'second announcement', 'image']
+
+
+def test_channel_buckets_pace_sends_only_when_set():
+    async def time_sends(scheduler: SendScheduler, num_sends: int) -> float:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(num_sends):
+            async with scheduler.slot('channel'):
+                pass
+        return loop.time() - start
+
+    unpaced = asyncio.run(time_sends(SendScheduler(bucket_capacity=None), 20))
+    paced = asyncio.run(time_sends(SendScheduler(bucket_capacity=5, bucket_period=0.2), 10))
+
+    assert unpaced < 0.05
+    # 5 go out right away, then the bucket refills one every 0.04 seconds
+    assert paced >= 0.18
+    assert not SendScheduler(bucket_capacity=None).get_bucket('channel')
+
+
+def test_bucket_checked_from_before_it_was_made_is_full():
+    now = time.monotonic()
+    bucket = TokenBucket(1, 10)
+
+    assert bucket.get_wait(now) == 0
+    bucket.take(now)
+    assert bucket.get_wait(now) > 0
@@ -0,0 +1,51 @@
+import asyncio
+from datetime import timedelta
+
+from lib.game_actor import get_game_actor
+from lib.stats import StatsLogger, format_stats, get_stats
+
+
+def test_game_actor_stats_are_summed_across_games(monkeypatch):
+    monkeypatch.setattr('lib.game_actor.GAME_ACTORS', {})
+
+    async def run():
+        async def command():
+            await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(get_game_actor(game_id).run(command) for game_id in ['owd-a', 'owd-a', 'owd-b']))
+
+    asyncio.run(run())
+
+    game_actor_stats = get_stats()['game_actors']
+    assert game_actor_stats['games'] == 2
+    assert game_actor_stats['commands'] == 3
+    assert game_actor_stats['queue_depth'] == 0
+    # the second command for owd-a waited behind the first
+    assert game_actor_stats['max_queue_depth'] == 2
+    assert game_actor_stats['max_wait_ms'] >= 10
+    assert 0 < game_actor_stats['mean_wait_ms'] < game_actor_stats['max_wait_ms']
+
+
+def test_stats_are_logged_as_one_line_every_interval(capsys):
+    async def run():
+        stats_logger = StatsLogger(interval=timedelta(milliseconds=20))
+        stats_logger.start()
+        await asyncio.sleep(0.05)
+        stats_logger.stop()
+
+    asyncio.run(run())
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines
+    for line in lines:
+        assert line.startswith("Stats: loop stalls=")
+        for name in ['admission', 'game_actors', 'sends', 'image_cache', 'prefetch', 'member_cache', 'player_cache', 'channel_pool']:
+            assert f" | {name} " in line
+
+
+def test_stats_are_not_logged_without_an_interval():
+    stats_logger = StatsLogger(interval=None)
+    stats_logger.start()
+
+    assert stats_logger._task is None
+    assert format_stats({'loop': {'stalls': 0}}) == "Stats: loop stalls=0"
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+from copy import deepcopy
+
+import pytest
+
+import engine.actions as engine
+import lib.outbox
+import lib.transaction
+from lib.discord import to_member_info
+from tests.fakes import GUILD_ID, FakeContext, FakeMember
+
+
+@pytest.fixture
+def saves(monkeypatch):
+    """
+    Counts every time a transaction saves the game state
+    """
+    saves = []
+    save_game_state_in_background = lib.transaction.save_game_state_in_background
+
+    async def count_saves(games, guild_ids=None):
+        saves.append(set(guild_ids))
+        await save_game_state_in_background(games, guild_ids)
+
+    monkeypatch.setattr(lib.transaction, 'save_game_state_in_background', count_saves)
+    return saves
+
+
+def run_command(table, name: str, *args):
+    async def run():
+        command = table.bot.bot.get_command(name)
+        await command.callback(FakeContext(table.alice, table.guild, name), *args)
+        await lib.outbox.wait_for_background_deliveries()
+
+    asyncio.run(run())
+
+
+def test_drawall_saves_once(table, saves):
+    num_cards = len(table.game.deck.cards)
+
+    run_command(table, 'drawall', '3')
+
+    assert len(saves) == 1
+    assert saves[0] == {GUILD_ID}
+    assert len(table.game.deck.cards) == num_cards - 6
+
+
+def test_redrawexile_saves_once(table, saves):
+    run_command(table, 'draw', '2')
+    snapshot = deepcopy(table.game)
+    saves.clear()
+
+    run_command(table, 'redrawexile')
+
+    assert len(saves) == 1
+    assert table.game != snapshot
+
+
+def test_batch_of_actions_saves_once(table, saves):
+    snapshot = deepcopy(table.game)
+
+    run_command(table, 'do', 'draw', '2;', 'mill', '2;', 'draw', '1')
+
+    assert len(saves) == 1
+    assert table.game != snapshot
+
+
+def test_invalid_command_rolls_back_without_saving(table, saves):
+    snapshot = deepcopy(table.game)
+
+    run_command(table, 'do', 'draw', '2;', 'mill', '2;', 'play', 'Not A Card')
+
+    assert saves == []
+    assert table.game == snapshot
+    assert table.bot.RUNNING_GAMES == [table.game]
+    # the error is the only reply, so nothing from the applied actions was sent
+    assert len(table.text_channel.sent) == 1
+    assert 'none of the actions were applied' in table.text_channel.sent[0][0][0]
+    assert table.alice.sent == []
+
+
+def test_endgame_only_ends_the_authors_game(table, saves):
+    other_game = engine.start_game('owd-carol', [to_member_info(FakeMember(102, 'carol'))], text_channel=20, voice_channel=21, guild_id=GUILD_ID)
+    table.bot.RUNNING_GAMES.append(other_game)
+
+    run_command(table, 'endgame', other_game.id)
+
+    assert saves == []
+    assert table.bot.RUNNING_GAMES == [table.game, other_game]
+    assert table.game.id in table.text_channel.sent[0][0][0]
+
+
+def test_command_queued_behind_the_end_of_its_game_is_not_run(table, saves):
+    snapshot = deepcopy(table.game)
+
+    async def run():
+        game_ended = asyncio.Event()
+
+        async def end_game():
+            # the game ends while the draw is waiting its turn on the game's actor
+            await game_ended.wait()
+            table.bot.RUNNING_GAMES.remove(table.game)
+
+        ending = asyncio.create_task(table.bot.get_game_actor(table.game.id).run(end_game))
+        await asyncio.sleep(0)
+        drawing = asyncio.create_task(table.bot.bot.get_command('draw').callback(FakeContext(table.alice, table.guild, 'draw'), '2'))
+        await asyncio.sleep(0)
+        game_ended.set()
+        await asyncio.gather(ending, drawing)
+        await lib.outbox.wait_for_background_deliveries()
+
+    asyncio.run(run())
+
+    assert saves == []
+    assert table.game == snapshot
+    assert table.text_channel.sent == [(("That game has already ended",), {})]
+
+
+def test_shuffle_runs_off_the_event_loop(table, saves, monkeypatch):
+    cards = list(table.game.deck.cards)
+    shuffled_on = []
+    get_shuffled_cards = table.bot.get_shuffled_cards
+
+    def record_thread(cards):
+        shuffled_on.append(threading.current_thread().name)
+        return get_shuffled_cards(cards)
+
+    monkeypatch.setattr(table.bot, 'get_shuffled_cards', record_thread)
+
+    run_command(table, 'shuffle')
+
+    assert len(shuffled_on) == 1
+    assert shuffled_on[0].startswith('disk-io')
+    assert sorted(table.game.deck.cards) == sorted(cards)
+    assert len(saves) == 1
@@ -0,0 +1,75 @@
+"""
+Tests of how much memory the bot's members take up with and without a lean gateway, against a local fake of Discord's gateway
+with one large server.
+
+Each mode connects in its own process with the bot's gateway options, then fetches the players of one game
+the way a command for it does. Lean, no members are requested as the client connects and only the players are kept.
+
+The server has 5,000 members so the tests stay quick. To measure at the size the lean gateway is for, give pytest
+--gateway-members (`make gateway-memory` uses 50,000) and -s to see what each mode reported.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+from tests.fake_gateway import FakeGateway, get_guild_id, parse_reply
+
+
+NUM_PLAYERS = 6
+WORKERS_SCRIPT = os.path.join(os.path.dirname(__file__), 'workers.py')
+
+
+async def measure(lean: bool, num_members: int) -> dict[str, int]:
+    """
+    Connects a client in one of the modes, returning what it reported along with how many chunks of members it was sent
+    """
+    fake_gateway = FakeGateway([get_guild_id(0)], 1, members_per_guild=num_members)
+    api_url = await fake_gateway.start()
+    try:
+        process = await asyncio.create_subprocess_exec(sys.executable, WORKERS_SCRIPT, 'memory', api_url, '--lean' if lean else '--full', str(NUM_PLAYERS))
+        await asyncio.wait_for(process.wait(), timeout=60)
+    finally:
+        await fake_gateway.stop()
+
+    reports = [content for _, content in fake_gateway.messages if content.startswith('memory')]
+    assert reports, f"The {'lean' if lean else 'full'} client didn't report its memory"
+    return {**parse_reply(reports[0]), 'member_chunks': fake_gateway.num_member_chunks}
+
+
+@pytest.fixture(scope='module')
+def num_members(request) -> int:
+    return request.config.getoption('--gateway-members')
+
+
+@pytest.fixture(scope='module')
+def reports(num_members) -> dict[bool, dict[str, int]]:
+    reports = {lean: asyncio.run(measure(lean, num_members)) for lean in [False, True]}
+    for lean, report in reports.items():
+        print(f"\n{'lean' if lean else 'full'} with {num_members} members: " + " ".join(f"{key}={value}" for key, value in report.items()))
+    return reports
+
+
+def test_full_gateway_caches_every_member(reports, num_members):
+    full = reports[False]
+
+    assert full['member_chunks'] > 0
+    assert full['members'] == num_members
+    assert full['players'] == NUM_PLAYERS
+    assert full['fetches'] == 0
+
+
+def test_lean_gateway_only_keeps_the_players(reports):
+    lean = reports[True]
+
+    assert lean['member_chunks'] == 0
+    assert lean['members'] == 0
+    assert lean['players'] == NUM_PLAYERS
+    assert lean['fetches'] == NUM_PLAYERS
+
+
+def test_lean_gateway_uses_less_memory(reports):
+    full, lean = reports[False], reports[True]
+
+    assert lean['players_kb'] < full['players_kb'] / 2
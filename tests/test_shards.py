@@ -0,0 +1,121 @@
+"""
+Tests of the bot's shards running across several worker processes, against a local fake of Discord's gateway.
+
+The bot prepares its shards and a shard supervisor starts a worker process for each range of them, each running the bot
+itself, and every server is sent to whichever shard Discord would send it to. Each server starts with a saved game
+(one of them from before games stored their server, so it has to be migrated first), and a player of each game asks
+about their deck from their server.
+"""
+import asyncio
+import os
+import sys
+import time
+from typing import Callable
+
+import engine.actions as engine
+import lib.game_state
+from lib.game_state import load_game_state_file, save_game_state
+from lib.sharding import ShardSupervisor
+from models import MemberInfo
+from tests.fake_gateway import PLAYER_ID, FakeGateway, get_channel_id, get_guild_id
+
+
+SHARD_COUNT = 4
+NUM_WORKERS = 2
+NUM_GUILDS = 6
+WORKERS_SCRIPT = os.path.join(os.path.dirname(__file__), 'workers.py')
+DECK_REPLY = "The Deck of Death has"
+
+
+def get_player_id(guild_id: int) -> int:
+    return PLAYER_ID + guild_id
+
+
+async def wait_for(condition: Callable[[], bool], timeout: float):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, f"Gave up waiting after {timeout}s"
+        await asyncio.sleep(0.1)
+
+
+async def ask_every_server(fake_gateway: FakeGateway, timeout: float):
+    """
+    Has the player in every server ask about their deck, checking each server answers exactly once
+    """
+    num_replies = {guild_id: len(replies) for guild_id, replies in fake_gateway.get_replies(DECK_REPLY).items()}
+    for guild_id in fake_gateway.guild_ids:
+        await fake_gateway.send_message(guild_id, "!deck", author_id=get_player_id(guild_id))
+    await wait_for(lambda: all(len(replies) > num_replies[guild_id] for guild_id, replies in fake_gateway.get_replies(DECK_REPLY).items()), timeout)
+    # long enough for a second worker with the same server to have answered too
+    await asyncio.sleep(0.5)
+
+    for guild_id, replies in fake_gateway.get_replies(DECK_REPLY).items():
+        assert len(replies) == num_replies[guild_id] + 1, f"Server {guild_id} answered {len(replies) - num_replies[guild_id]} times"
+
+
+async def run_shards(bot_module, state_folder, serve_fake_discord) -> tuple[ShardSupervisor, FakeGateway]:
+    guild_ids = [get_guild_id(i) for i in range(NUM_GUILDS)]
+    games = [
+        engine.start_game(
+            f"owd-shards-{guild_id}",
+            [MemberInfo(id=get_player_id(guild_id), name='player', mention=f"<@{get_player_id(guild_id)}>")],
+            get_channel_id(guild_id),
+            get_channel_id(guild_id),
+            guild_id=guild_id,
+        )
+        for guild_id in guild_ids
+    ]
+    # the first server's game was saved before games stored their server
+    games[0].guild_id = None
+    save_game_state(games)
+
+    fake_gateway = FakeGateway(guild_ids, SHARD_COUNT)
+    async with serve_fake_discord(fake_gateway) as api_url:
+        shard_count = await bot_module.prepare_shards()
+        assert shard_count == SHARD_COUNT
+
+        def get_worker_command(shard_ids: list[int], shard_count: int) -> list[str]:
+            # the bot's own command for the worker, run with its state and Discord swapped for the test's
+            _, _, *bot_args = bot_module.get_worker_command(shard_ids, shard_count)
+            return [sys.executable, WORKERS_SCRIPT, 'shard', api_url, str(state_folder), *bot_args]
+
+        supervisor = ShardSupervisor(get_worker_command, shard_count, NUM_WORKERS, restart_delay=0.5)
+        supervision = asyncio.create_task(supervisor.run())
+        # shards after a worker's first wait 5 seconds to identify, as they would with Discord
+        timeout = 10 + 6 * max(len(shard_ids) for shard_ids in supervisor.shard_ranges)
+        try:
+            await wait_for(lambda: all(fake_gateway.num_identifies), timeout)
+            await ask_every_server(fake_gateway, timeout)
+
+            supervisor.kill(NUM_WORKERS - 1)
+            await wait_for(lambda: all(fake_gateway.num_identifies[shard_id] == 2 for shard_id in supervisor.shard_ranges[-1]), timeout)
+            await ask_every_server(fake_gateway, timeout)
+        finally:
+            supervision.cancel()
+            try:
+                await supervision
+            except asyncio.CancelledError:
+                pass
+
+    return supervisor, fake_gateway
+
+
+def test_every_server_is_run_by_the_worker_for_its_shard_and_restarted_after_a_crash(bot_module, state_folder, serve_fake_discord):
+    supervisor, fake_gateway = asyncio.run(run_shards(bot_module, state_folder, serve_fake_discord))
+
+    assert supervisor.num_restarts == [0] * (NUM_WORKERS - 1) + [1]
+    # every shard connected once, and only the killed worker's shards again
+    assert fake_gateway.num_identifies == [2 if shard_id in supervisor.shard_ranges[-1] else 1 for shard_id in range(SHARD_COUNT)]
+    # the game saved without its server was moved into its server's file, so the worker running that server found it
+    assert load_game_state_file(lib.game_state.GAME_STATE_FILE) == []
+    assert sorted(os.listdir(state_folder / 'games')) == sorted(f"{guild_id}.json" for guild_id in fake_gateway.guild_ids)
+
+
+def test_shards_are_prepared_without_logging_in_when_nothing_needs_discord(bot_module, monkeypatch):
+    async def login(self, token: str):
+        raise AssertionError("Logged in to Discord")
+
+    monkeypatch.setattr(bot_module.disnake.Client, 'login', login)
+    monkeypatch.setattr(bot_module, 'SHARD_COUNT', SHARD_COUNT)
+
+    assert asyncio.run(bot_module.prepare_shards()) == SHARD_COUNT
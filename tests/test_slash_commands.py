@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+import lib.outbox
+from lib.admission import USER_REJECTION_REPLY, AdmissionController, CommandRejectedError
+from tests.fakes import FakeContext, FakeInteraction
+
+
+def run_slash_command(table, name: str, *args) -> FakeInteraction:
+    inter = FakeInteraction(table.alice, table.guild, name)
+
+    async def run():
+        await table.bot.bot.get_slash_command(name)(inter, *args)
+        await lib.outbox.wait_for_background_deliveries()
+
+    asyncio.run(run())
+    return inter
+
+
+def test_slash_command_is_deferred_then_answered_with_an_ephemeral_follow_up(table):
+    hand = table.game.deck.get_hand(table.alice.id)
+
+    inter = run_slash_command(table, 'hand')
+
+    assert [(name, args[:1], kwargs.get('ephemeral')) for name, args, kwargs in inter.responses] == [
+        ('defer', (), True),
+        ('followup', (f"The cards in your hand are:\n```\n{hand[0]}\n```",), True),
+    ]
+    # alice's hand was shown to her alone, rather than in her DMs
+    assert table.alice.sent == []
+
+
+def test_slash_command_sends_what_only_its_author_should_see_as_ephemeral_follow_ups(table):
+    num_cards = len(table.game.deck.cards)
+
+    inter = run_slash_command(table, 'draw', 2)
+
+    assert inter.responses[0] == ('defer', (), {'ephemeral': True})
+    assert len(inter.responses) > 1
+    assert all(name == 'followup' and kwargs['ephemeral'] for name, _, kwargs in inter.responses[1:])
+    assert len(table.game.deck.cards) == num_cards - 2
+    assert table.alice.sent == []
+
+
+def test_slash_command_turned_away_by_admission_is_answered_without_running(table, monkeypatch):
+    monkeypatch.setattr(table.bot, 'ADMISSION_CONTROLLER', AdmissionController(user_burst=1))
+    run_slash_command(table, 'draw', 1)
+    num_cards = len(table.game.deck.cards)
+
+    inter = run_slash_command(table, 'draw', 1)
+
+    # every interaction needs a response, so it's answered straight away without being deferred
+    assert inter.responses == [('send_message', (USER_REJECTION_REPLY,), {'ephemeral': True})]
+    assert len(table.game.deck.cards) == num_cards
+    # slash and prefix commands are let in from the same buckets, so alice's prefix commands are turned away too
+    with pytest.raises(CommandRejectedError):
+        asyncio.run(table.bot.admit_command(FakeContext(table.alice, table.guild, 'draw')))
@@ -0,0 +1,156 @@
+"""
+Stress tests of games taking commands from all of their players at once.
+
+Every player of every game fires off a stream of the bot's own commands concurrently, against a local fake of the Discord
+HTTP API with some latency on every message. Afterwards, every game must still hold exactly the cards it started with,
+and each game's commands must have run exactly once each, one at a time, in the order they were queued.
+
+With a rate limit, the fake Discord only takes so many messages per channel per period and sends the same rate limit
+headers Discord does, which disnake paces each channel by, so no send should ever get a 429.
+"""
+import asyncio
+import random
+from contextlib import redirect_stdout
+from contextvars import ContextVar
+from io import StringIO
+
+import disnake
+import pytest
+
+import engine.actions as engine
+from lib.audit import find_conservation_violations
+from lib.game_actor import GameActor
+from lib.outbox import wait_for_background_deliveries
+from lib.transaction import GameTransaction
+from models import MemberInfo, OneWithDeathGame
+from tests.fake_discord import ClientContext, FakeDiscord
+
+
+NUM_GAMES = 2
+NUM_PLAYERS = 3
+NUM_COMMANDS = 8
+LATENCY = 0.005
+
+# the command a player is running, so the actor it's queued on can tell whose it is
+_current_command: ContextVar[ClientContext] = ContextVar('current_command')
+
+
+class CommandLog:
+    """
+    Records the order each game's commands were queued on its actor, and the order their transactions ran in
+    """
+    def __init__(self):
+        self.queued: dict[str, list[ClientContext]] = {}
+        self.run: dict[str, list[ClientContext]] = {}
+        self.running: set[str] = set()
+        self.overlapped = False
+
+
+@pytest.fixture
+def command_log(bot_module, monkeypatch) -> CommandLog:
+    command_log = CommandLog()
+    run = GameActor.run
+
+    async def run_logged(actor: GameActor, command):
+        command_log.queued.setdefault(actor.game_id, []).append(_current_command.get())
+        return await run(actor, command)
+
+    class LoggedGameTransaction(GameTransaction):
+        async def __aenter__(self):
+            game_id = self.game.id
+            command_log.overlapped = command_log.overlapped or game_id in command_log.running
+            command_log.running.add(game_id)
+            command_log.run.setdefault(game_id, []).append(self.ctx)
+            return await super().__aenter__()
+
+        async def __aexit__(self, exc_type, exc, tb):
+            try:
+                return await super().__aexit__(exc_type, exc, tb)
+            finally:
+                command_log.running.discard(self.game.id)
+
+    monkeypatch.setattr(GameActor, 'run', run_logged)
+    monkeypatch.setattr(bot_module, 'GameTransaction', LoggedGameTransaction)
+    return command_log
+
+
+def get_random_command(game: OneWithDeathGame, member: MemberInfo) -> tuple[str, list[str]]:
+    """
+    Picks a command for a player, with its arguments as they'd type them. Cards are picked from their hand as it is
+    when the command is sent, so some won't be there any more by the time it runs
+    """
+    hand = game.deck.get_hand(member.id)
+    if game.waiting_for_response_from and game.waiting_for_response_from.id == member.id:
+        return 'order', []
+    if hand and random.random() < 0.4:
+        return random.choice(['play', 'discard']), random.choice(hand).split()
+
+    return random.choice([
+        ('draw', [str(random.randint(1, 3))]),
+        ('mill', [str(random.randint(1, 3))]),
+        ('scry', ['2']),
+        ('shuffle', []),
+        ('resolveall', []),
+    ])
+
+
+async def run_player(bot_module, client: disnake.Client, game: OneWithDeathGame, member: MemberInfo, num_commands: int):
+    for _ in range(num_commands):
+        command_name, args = get_random_command(game, member)
+        ctx = ClientContext(client, command_name, author_id=member.id, channel_id=game.text_channel)
+        _current_command.set(ctx)
+        await bot_module.bot.get_command(command_name).callback(ctx, *args)
+        await asyncio.sleep(random.random() * 0.01)
+
+
+async def run_stress_test(bot_module, fake_discord: FakeDiscord, serve_fake_discord, num_commands: int=NUM_COMMANDS) -> list[OneWithDeathGame]:
+    """
+    Plays every game at once, returning the games
+    """
+    games: list[OneWithDeathGame] = []
+    for i in range(NUM_GAMES):
+        members = [MemberInfo(id=i * 100 + j + 1, name=f"player{i * 100 + j + 1}", mention=f"<@{i * 100 + j + 1}>") for j in range(NUM_PLAYERS)]
+        games.append(engine.start_game(f"owd-stress-{i}", members, text_channel=10_000 + i, voice_channel=20_000 + i, guild_id=1))
+    bot_module.RUNNING_GAMES.extend(games)
+
+    async with serve_fake_discord(fake_discord):
+        client = disnake.Client(intents=disnake.Intents.none())
+        await client.login('stress')
+        try:
+            # the bot's own logging of every command would drown out the test's output
+            with redirect_stdout(StringIO()):
+                await asyncio.gather(*(
+                    run_player(bot_module, client, game, member, num_commands)
+                    for game in games
+                    for member in game.members
+                ))
+                await wait_for_background_deliveries()
+        finally:
+            await client.close()
+
+    return games
+
+
+def test_concurrent_commands_keep_every_card_and_run_in_order(bot_module, command_log, serve_fake_discord):
+    fake_discord = FakeDiscord(latency=LATENCY)
+
+    games = asyncio.run(run_stress_test(bot_module, fake_discord, serve_fake_discord))
+
+    for game in games:
+        assert find_conservation_violations(game) == []
+        assert len(command_log.queued[game.id]) == NUM_PLAYERS * NUM_COMMANDS
+        assert command_log.run[game.id] == command_log.queued[game.id]
+    assert not command_log.overlapped
+    assert fake_discord.bytes_received > 0
+
+
+def test_sends_stay_within_rate_limits(bot_module, command_log, serve_fake_discord):
+    limit, period = 5, 0.5
+    fake_discord = FakeDiscord(latency=LATENCY, rate_limit=(limit, period))
+
+    games = asyncio.run(run_stress_test(bot_module, fake_discord, serve_fake_discord, num_commands=4))
+
+    for game in games:
+        assert find_conservation_violations(game) == []
+        assert command_log.run[game.id] == command_log.queued[game.id]
+    assert fake_discord.num_rate_limited == 0
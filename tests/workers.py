@@ -0,0 +1,97 @@
+"""
+Processes the tests start against a local fake of Discord's gateway, each connecting to it as the bot would.
+
+Usage:
+python tests/workers.py memory <api url> --lean|--full <number of players>
+python tests/workers.py shard <api url> <state folder> <the bot's own arguments, e.g. --shard-ids 0 1 --shard-count 4>
+"""
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+# the bot's modules import each other from the bot folder, which is where it's run from,
+# and the tests' own modules are imported from the repo's root
+REPO_FOLDER = os.path.realpath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:0] = [os.path.join(REPO_FOLDER, 'bot'), REPO_FOLDER]
+
+import disnake
+from disnake.http import Route
+
+import lib.game_state
+from lib.attachments import ATTACHMENT_REGISTRY
+from lib.gateway import get_gateway_options
+from lib.member_cache import PLAYER_CACHE
+from models import MemberInfo, OneWithDeathGame
+from tests.fake_gateway import PLAYER_ID, get_channel_id
+
+
+def run_memory_client(api_url: str, lean: bool, num_players: int):
+    """
+    A client with the bot's gateway options, which fetches the players of one game the way a command for it does,
+    then reports its members and memory to the server's channel and exits.
+
+    Memory is what tracemalloc sees allocated, so it's the client's own caches rather than the interpreter and libraries
+    every process has anyway
+    """
+    tracemalloc.start()
+    Route.BASE = api_url
+    client = disnake.AutoShardedClient(shard_ids=[0], shard_count=1, guild_ready_timeout=0.5, **get_gateway_options(lean))
+
+    @client.event
+    async def on_ready():
+        guild = client.guilds[0]
+        # disnake can be ready before the last of the members it requested have arrived
+        deadline = time.monotonic() + 30
+        while not lean and not guild.chunked and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        gc.collect()
+        ready_bytes, _ = tracemalloc.get_traced_memory()
+
+        members = [MemberInfo(id=PLAYER_ID + i, name=f"member{PLAYER_ID + i}", mention=f"<@{PLAYER_ID + i}>") for i in range(num_players)]
+        game = OneWithDeathGame(id='owd-memory', members=members, deck=None, text_channel=get_channel_id(guild.id), voice_channel=get_channel_id(guild.id))
+        await PLAYER_CACHE.fetch_players(guild, game)
+        gc.collect()
+        players_bytes, _ = tracemalloc.get_traced_memory()
+
+        await guild.text_channels[0].send(
+            f"memory members={len(guild.members)} players={sum(PLAYER_CACHE.get(guild, member.id) is not None for member in members)} "
+            f"ready_kb={ready_bytes // 1024} players_kb={players_bytes // 1024} fetches={PLAYER_CACHE.num_fetches}"
+        )
+        await client.close()
+
+    client.run('gateway-memory')
+
+
+def run_shard_worker(api_url: str, state_folder: str, bot_args: list[str]):
+    """
+    The bot itself, run from the folder with its API key the same way the shard supervisor runs it, only with its state
+    kept in the given folder and Discord swapped for the fake
+    """
+    # the bot reads its API key as it's imported, from the folder it's run from
+    import bot
+
+    Route.BASE = api_url
+    lib.game_state.GAME_STATE_FILE = os.path.join(state_folder, 'game_state.json')
+    lib.game_state.GAME_STATE_FOLDER = os.path.join(state_folder, 'games')
+    ATTACHMENT_REGISTRY.urls_file = os.path.join(state_folder, 'attachment_urls.json')
+    ATTACHMENT_REGISTRY.urls = {}
+
+    sys.argv = [bot.__file__, *bot_args]
+    bot.main()
+
+
+def main():
+    mode, *args = sys.argv[1:]
+    if mode == 'memory':
+        api_url, gateway, num_players = args
+        run_memory_client(api_url, gateway == '--lean', int(num_players))
+    elif mode == 'shard':
+        api_url, state_folder, *bot_args = args
+        run_shard_worker(api_url, state_folder, bot_args)
+
+
+if __name__ == '__main__':
+    main()